@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import statistics
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Request bodies above this size start hitting the RPC gateway's limits
+DEFAULT_MAX_BYTES = int(os.getenv("RPC_MAX_BODY_BYTES", 1_000_000))
+DEFAULT_TARGET_LATENCY = 2.0  # seconds per RPC
+
+def json_size(record: Any) -> int:
+    """Encoded size of one record as it travels in a JSON request body."""
+    values = list(record.values()) if isinstance(record, dict) else record
+    return len(json.dumps(values, default=str))
+
+class PlannedBatch(NamedTuple):
+    """One insert batch, its encoded size and the row target it was cut under."""
+    records: List[Any]
+    nbytes: int
+    target_rows: int
+
+class BatchPlanner:
+    """Splits records into insert batches capped by both row count and encoded bytes.
+
+    The row target adapts to feedback: it grows while RPCs are fast and succeed, shrinks when they
+    run slower than ``target_latency``, and halves on errors. Batches are cut lazily, so each one
+    uses the target left by the batches observed before it; a load's batch sizes are logged when it
+    finishes, so the run log shows how they evolved. Give every table (or writer) its own planner,
+    since the target is tuned to one stream of batches.
+    """
+
+    def __init__(self, name: str, initial_rows: int = 500, min_rows: int = 10, max_rows: int = 5000,
+                 max_bytes: int = DEFAULT_MAX_BYTES, target_latency: float = DEFAULT_TARGET_LATENCY):
+        self.name = name
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self.target_rows = max(min_rows, min(initial_rows, max_rows))
+        self._lock = threading.Lock()
+        self._batch_rows: List[int] = []
+        self._batch_bytes: List[int] = []
+        self._latencies: List[float] = []
+        self._errors = 0
+
+    def batches(self, records: Iterable[Any], size_of: Callable[[Any], int] = json_size) -> Iterator[PlannedBatch]:
+        """Cut records into batches under the row target current at each cut and the byte cap."""
+        first_target = self.target_rows
+        rows, largest = [], 0
+        batch, batch_bytes, target_rows = [], 0, first_target
+        for record in records:
+            size = size_of(record)
+            if batch and (len(batch) >= target_rows or batch_bytes + size > self.max_bytes):
+                rows.append(len(batch))
+                largest = max(largest, batch_bytes)
+                yield PlannedBatch(batch, batch_bytes, target_rows)
+                batch, batch_bytes = [], 0
+            if not batch:
+                target_rows = self.target_rows
+            batch.append(record)
+            batch_bytes += size
+        if batch:
+            rows.append(len(batch))
+            largest = max(largest, batch_bytes)
+            yield PlannedBatch(batch, batch_bytes, target_rows)
+
+        if rows:
+            logger.info(f"{self.name}: {len(rows)} batches of {min(rows)}-{max(rows)} rows, largest {largest} "
+                        f"bytes (target {first_target} -> {self.target_rows} rows)")
+
+    def observe(self, batch: PlannedBatch, latency: float, ok: bool) -> None:
+        """Feed back the outcome of one batch."""
+        rows = len(batch.records)
+        with self._lock:
+            self._batch_rows.append(rows)
+            self._batch_bytes.append(batch.nbytes)
+            self._latencies.append(latency)
+            if not ok:
+                self._errors += 1
+                self.target_rows = max(self.min_rows, self.target_rows // 2)
+            elif latency > self.target_latency:
+                self.target_rows = max(self.min_rows, int(self.target_rows * 0.8))
+            elif rows >= batch.target_rows:
+                # Grow additively on full-size batches that came back fast; short tail batches say nothing
+                self.target_rows = min(self.max_rows, self.target_rows + max(1, batch.target_rows // 20))
+
+    def summary(self) -> Dict[str, Any]:
+        """Batch sizes, latencies and errors seen so far."""
+        with self._lock:
+            if not self._batch_rows:
+                return {"batches": 0, "target_rows": self.target_rows}
+            return {
+                "batches": len(self._batch_rows),
+                "errors": self._errors,
+                "target_rows": self.target_rows,
+                "median_rows": statistics.median(self._batch_rows),
+                "max_rows": max(self._batch_rows),
+                "median_bytes": statistics.median(self._batch_bytes),
+                "max_bytes": max(self._batch_bytes),
+                "median_latency": round(statistics.median(self._latencies), 3)
+            }
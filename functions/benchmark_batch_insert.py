@@ -0,0 +1,146 @@
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from pg_loader import TABLE_COLUMN_TYPES, column_arrays, unnest_insert_sql, psycopg
+from etl_processor import ENTRIES_STAGING_COLUMNS
+
+NAMES = ["Wallace, Ron", "Geddes, Steve", "O'Brien, Pat", "Mendi, Travis", "Team Hunt", "Haist, Todd"]
+SITES = ["Half Moon Bay", "Elk Grove", "Topsfield Fair", "Stillwater", "Port Elgin"]
+STATES = ["California", "Rhode Island", "Massachusetts", "Minnesota", "Ontario"]
+
+PayloadBuilder = Callable[[], List[str]]  # builds and serializes every request body of one path
+
+def synthetic_entries(count: int, seed: int = 0) -> List[Dict]:
+    """Entries shaped like the ones GPCPipeline.process_year builds."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        name = rng.choice(NAMES)
+        weight = round(rng.uniform(100, 2700), 1)
+        records.append({
+            'category': 'P',
+            'year': rng.randint(2005, 2024),
+            'place': str(i + 1),
+            'weight_lbs': weight,
+            'processed_grower_name': name,
+            'original_grower_name': name.upper(),
+            'city': "St. John's" if i % 17 == 0 else "Napa",
+            'state_prov': rng.choice(STATES),
+            'country': 'United States',
+            'gpc_site': rng.choice(SITES),
+            'seed_mother': f"{rng.randint(1000, 2700)} {rng.choice(NAMES).split(',')[0]}",
+            'pollinator_father': 'self' if i % 5 == 0 else 'open',
+            'ott': round(rng.uniform(200, 500), 1) if i % 3 else None,
+            'est_weight': round(weight * 0.95, 1) if i % 3 else None,
+            'entry_type': 'official'
+        })
+    return records
+
+def _quote(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _number(value) -> str:
+    return str(value) if value is not None else 'NULL'
+
+def legacy_render(batch: List[Dict]) -> str:
+    """The per-record f-string VALUES rendering _batch_insert used before typed array parameters."""
+    values_list = []
+    for record in batch:
+        values_list.append(
+            f"({_quote(record['category'])}, {record['year']}, {_quote(record['place'])}, "
+            f"{_number(record['weight_lbs'])}, "
+            f"{_quote(record['processed_grower_name'])}, "
+            f"{_quote(record['original_grower_name'])}, {_quote(record['city'])}, "
+            f"{_quote(record['state_prov'])}, {_quote(record['country'])}, "
+            f"{_quote(record['gpc_site'])}, "
+            f"{_quote(record['seed_mother'])}, {_quote(record['pollinator_father'])}, "
+            f"{_number(record['ott'])}, "
+            f"{_number(record['est_weight'])}, "
+            f"{_quote(record['entry_type'])})"
+        )
+    return f"""
+    INSERT INTO {{table}} (
+        {', '.join(ENTRIES_STAGING_COLUMNS)}
+    )
+    VALUES {','.join(values_list)};
+    """
+
+def batches(records: List[Dict], batch_size: int):
+    for i in range(0, len(records), batch_size):
+        yield records[i:i + batch_size]
+
+def time_it(label: str, fn, rows: int, repeat: int) -> float:
+    """Run fn `repeat` times and report the best wall time."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best:8.3f}s  {rows / best:10.0f} rows/sec")
+    return best
+
+def build_payloads(records: List[Dict], batch_size: int) -> Tuple[PayloadBuilder, PayloadBuilder]:
+    """Client-side cost of the RPC paths: building and serializing each request body."""
+    legacy = lambda: [json.dumps({'query': legacy_render(batch)}) for batch in batches(records, batch_size)]
+    sql = unnest_insert_sql('staging', 'entries_staging', ENTRIES_STAGING_COLUMNS)
+    params = lambda: [
+        json.dumps({'query': sql, 'params': column_arrays('staging', 'entries_staging', ENTRIES_STAGING_COLUMNS,
+                                                          batch, json_safe=True)})
+        for batch in batches(records, batch_size)
+    ]
+    return legacy, params
+
+def run_live(dsn: str, records: List[Dict], batch_size: int, repeat: int) -> None:
+    """Round trips against a real database, into a temporary copy of staging.entries_staging."""
+    if psycopg is None:
+        print("psycopg is not installed; skipping the database run")
+        return
+    # The temp table has the same columns, so reuse the staging column types for the unnest casts
+    TABLE_COLUMN_TYPES[("pg_temp", "entries_staging")] = TABLE_COLUMN_TYPES[("staging", "entries_staging")]
+    column_defs = ", ".join(
+        f"{column} {TABLE_COLUMN_TYPES[('staging', 'entries_staging')][column]}" for column in ENTRIES_STAGING_COLUMNS
+    )
+    prepared_sql = unnest_insert_sql('pg_temp', 'entries_staging', ENTRIES_STAGING_COLUMNS, placeholder="%s")
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"CREATE TEMP TABLE entries_staging ({column_defs})")
+
+        def rendered():
+            for batch in batches(records, batch_size):
+                conn.execute(legacy_render(batch).replace("{table}", "pg_temp.entries_staging"))
+
+        def prepared():
+            for batch in batches(records, batch_size):
+                arrays = column_arrays('pg_temp', 'entries_staging', ENTRIES_STAGING_COLUMNS, batch)
+                conn.execute(prepared_sql, arrays, prepare=True)
+
+        print(f"\nDatabase round trips ({len(records)} rows in batches of {batch_size}):")
+        old = time_it("rendered VALUES", rendered, len(records), repeat)
+        new = time_it("prepared unnest() arrays", prepared, len(records), repeat)
+        print(f"Speedup: {old / new:.1f}x")
+        conn.execute("DROP TABLE pg_temp.entries_staging")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rendered VALUES inserts with typed array parameters")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best time is reported")
+    parser.add_argument("--dsn", default=None, help="Postgres URL for a live run (uses a temporary table)")
+    args = parser.parse_args()
+
+    records = synthetic_entries(args.rows)
+    legacy, params = build_payloads(records, args.batch_size)
+
+    print(f"Building execute_sql payloads ({args.rows} rows in batches of {args.batch_size}):")
+    old = time_it("rendered VALUES (f-strings)", legacy, args.rows, args.repeat)
+    new = time_it("unnest() typed array params", params, args.rows, args.repeat)
+    print(f"Speedup: {old / new:.1f}x")
+
+    if args.dsn:
+        run_live(args.dsn, records, args.batch_size, args.repeat)
+
+if __name__ == "__main__":
+    main()
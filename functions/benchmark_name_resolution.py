@@ -0,0 +1,247 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from name_matching import apply_clusters, blocked_fuzzy_matching, cdist_fuzzy_matching, match_pairs, resolve_clusters
+from name_normalizer import clean_name, normalize_name, parse_name, split_names
+from parallel_matching import StateMatcher
+from grower_linkage import GrowerProfile, link_growers
+
+SAMPLE_PATH = Path(__file__).with_name("name_resolution_sample.csv")
+
+FIRST_NAMES = [
+    "Adam", "Amy", "Andy", "Ben", "Bob", "Brandon", "Brian", "Carl", "Chris", "Cindy", "Cory", "Dale", "Dan",
+    "Dave", "Dick", "Don", "Donna", "Doug", "Ed", "Eric", "Frank", "Gary", "Greg", "Ian", "Jack", "Jake",
+    "James", "Jane", "Jeff", "Jim", "Joe", "Joel", "John", "Karen", "Kevin", "Larry", "Linda", "Mark", "Mary",
+    "Matt", "Mike", "Nancy", "Pat", "Paul", "Pete", "Ray", "Rick", "Rob", "Ron", "Sam", "Sara", "Scott",
+    "Steve", "Sue", "Ted", "Tim", "Todd", "Tom", "Travis", "Wayne"
+]
+NICKNAMES = {
+    "Bob": "Robert", "Chris": "Christopher", "Dan": "Daniel", "Dave": "David", "Don": "Donald", "Ed": "Edward",
+    "Jim": "James", "Joe": "Joseph", "Mike": "Michael", "Matt": "Matthew", "Pete": "Peter", "Rob": "Robert",
+    "Ron": "Ronald", "Sam": "Samuel", "Steve": "Steven", "Ted": "Theodore", "Tim": "Timothy", "Tom": "Thomas"
+}
+SYLLABLES = [
+    "ba", "ber", "bro", "ca", "der", "dor", "en", "fel", "gen", "ger", "hal", "han", "hol", "in", "ka", "kam",
+    "ler", "lin", "ma", "mer", "mil", "mon", "na", "nel", "ols", "pa", "per", "ra", "rich", "ros", "sa",
+    "sen", "sher", "son", "ste", "ter", "ton", "va", "wal", "wel", "wick", "win", "wood", "zel"
+]
+STATES = [f"State {i:02d}" for i in range(60)]
+
+def load_labeled_sample(path: Path = SAMPLE_PATH) -> pd.DataFrame:
+    """Hand-labeled name variants: raw_name, state and the grower_id they belong to."""
+    return pd.read_csv(path, dtype=str)
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1:]  # dropped letter
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]  # swapped letters
+
+def _variants(first: str, last: str, rng: random.Random) -> List[str]:
+    spellings = [
+        f"{first} {last}", f"{last}, {first}", f"{last.upper()}, {first.upper()}",
+        f"{last}, {NICKNAMES.get(first, first)}", f"{last}, {first} {rng.randint(1, 3)}",
+        f"{_typo(last, rng)}, {first}", f"{first} & {rng.choice(FIRST_NAMES)} {last}"
+    ]
+    return [spellings[0]] + rng.sample(spellings[1:], rng.randint(0, 3))
+
+def synthetic_sample(unique_names: int, seed: int = 0) -> pd.DataFrame:
+    """Generated growers, each spelled one to four ways, until ``unique_names`` distinct rows exist.
+
+    Variants are the kinds seen in the results: reordered and upper-cased names, nicknames,
+    single-letter typos, place digits, couples and teams. Every variant carries its grower's id.
+    """
+    rng = random.Random(seed)
+    rows: Dict[Tuple[str, str], str] = {}
+    taken = set()  # two growers sharing a name can't be told apart, so every grower's name is unique
+    grower = 0
+    while len(rows) < unique_names:
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+        first = "Team" if rng.random() < 0.03 else rng.choice(FIRST_NAMES)
+        if (first, last) in taken:
+            continue
+        taken.add((first, last))
+        state = rng.choice(STATES)
+        grower_id = f"g{grower}"
+        grower += 1
+        if first == "Team":
+            spellings = [f"Team {last}", f"The {last} Team", f"{last} Team"][:rng.randint(1, 3)]
+        else:
+            spellings = _variants(first, last, rng)
+        for spelling in spellings:
+            rows.setdefault((spelling, state), grower_id)
+    names = list(rows.items())[:unique_names]
+    return pd.DataFrame(
+        [(raw, state, grower_id) for (raw, state), grower_id in names], columns=["raw_name", "state", "grower_id"]
+    )
+
+def resolve_names(df: pd.DataFrame, state_threshold: int, cross_threshold: int, workers: Optional[int],
+                  stage: Callable[[str, Callable], object], brute_force: bool = False) -> pd.Series:
+    """Name-only resolution of ``df.raw_name``, each step run through ``stage(label, fn)``.
+
+    By default this is preprocessor-v2's path: states matched on StateMatcher's processes and the
+    cross-state pass through blocked_fuzzy_matching. ``brute_force`` is preprocessor.py's path
+    instead, scoring every pair with cdist_fuzzy_matching both within states and across them.
+    """
+    raw = df["raw_name"]
+    uniques = raw.unique()
+    normalize_name.cache_clear()
+
+    cleaned = stage("preprocessing", lambda: {name: clean_name(name) for name in uniques})
+    parsed = stage("parsing", lambda: {name: parse_name(cleaned[name]) for name in uniques})
+    names = raw.map(parsed)
+
+    def match() -> List[Tuple[str, str]]:
+        names_by_state = pd.DataFrame({"state": df["state"], "name": names}).groupby("state")["name"].unique()
+        if brute_force:
+            pairs = [pair for state_names in names_by_state
+                     for pair in match_pairs(cdist_fuzzy_matching(state_names.tolist(), state_threshold))]
+            pairs += match_pairs(cdist_fuzzy_matching(names.unique().tolist(), cross_threshold))
+            return pairs
+        with StateMatcher(workers) as matcher:
+            pairs = matcher.match(names_by_state.to_dict(), state_threshold)
+        pairs += match_pairs(blocked_fuzzy_matching(names.unique().tolist(), cross_threshold))
+        return pairs
+    pairs = stage("matching", match)
+
+    def standardize() -> pd.Series:
+        standardized = apply_clusters(names, resolve_clusters(pairs, names.value_counts()))
+        split_names(standardized)
+        return standardized
+    return stage("standardizing", standardize)
+
+def link_names(df: pd.DataFrame, state_threshold: int, cross_threshold: int, workers: Optional[int],
+               stage: Callable[[str, Callable], object]) -> pd.Series:
+    """Grower ids from grower_linkage for ``df.raw_name``, with the same stage hooks as resolve_names."""
+    raw = df["raw_name"]
+    uniques = raw.unique()
+    cleaned = stage("preprocessing", lambda: {name: clean_name(name) for name in uniques})
+    parsed = stage("parsing", lambda: {name: parse_name(cleaned[name]) for name in uniques})
+    keys = list(zip(raw.map(parsed), df["state"], df["country"] if "country" in df else [""] * len(df)))
+
+    def link() -> pd.Series:
+        ids = link_growers(GrowerProfile(*key) for key in dict.fromkeys(keys))
+        return pd.Series([ids[key] for key in keys], index=df.index)
+    return stage("linking", link)
+
+def resolve_names_brute_force(df: pd.DataFrame, state_threshold: int, cross_threshold: int,
+                              workers: Optional[int], stage: Callable[[str, Callable], object]) -> pd.Series:
+    """preprocessor.py's resolution: resolve_names with every pair scored."""
+    return resolve_names(df, state_threshold, cross_threshold, workers, stage, brute_force=True)
+
+RESOLVERS = {"names": resolve_names, "names-brute-force": resolve_names_brute_force, "linkage": link_names}
+
+def pair_count(sizes) -> int:
+    return sum(n * (n - 1) // 2 for n in sizes)
+
+def pairwise_scores(truth: pd.Series, predicted: pd.Series) -> Dict[str, float]:
+    """Pairwise precision, recall and F1 of predicted clusters against the labels.
+
+    A pair of rows counts as a true positive when both share a predicted cluster and a label.
+    """
+    both = pair_count(Counter(zip(truth, predicted)).values())
+    predicted_pairs = pair_count(Counter(predicted).values())
+    true_pairs = pair_count(Counter(truth).values())
+    precision = both / predicted_pairs if predicted_pairs else 1.0
+    recall = both / true_pairs if true_pairs else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4),
+        "true_pairs": true_pairs, "predicted_pairs": predicted_pairs, "correct_pairs": both
+    }
+
+def merge_errors(df: pd.DataFrame, predicted: pd.Series, limit: int = 10) -> List[List[str]]:
+    """Predicted clusters that merge more than one labeled grower, largest first."""
+    clusters = pd.DataFrame({"cluster": predicted.values, "grower_id": df["grower_id"].values,
+                             "raw_name": df["raw_name"].values})
+    mixed = clusters.groupby("cluster").filter(lambda group: group["grower_id"].nunique() > 1)
+    groups = [group["raw_name"].tolist() for _, group in mixed.groupby("cluster")]
+    return sorted(groups, key=len, reverse=True)[:limit]
+
+def benchmark(df: pd.DataFrame, label: str, args, resolver: Callable = resolve_names) -> Dict:
+    """Time every stage, then rerun under tracemalloc for each stage's peak memory, and score the result."""
+    timings: Dict[str, float] = {}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = time.perf_counter() - start
+        return result
+    predicted = resolver(df, args.state_threshold, args.cross_threshold, args.workers, timed)
+
+    peaks: Dict[str, float] = {}
+    def traced(name, fn):
+        tracemalloc.reset_peak()
+        result = fn()
+        peaks[name] = tracemalloc.get_traced_memory()[1] / 1_000_000
+        return result
+    if not args.no_memory:
+        tracemalloc.start()
+        resolver(df, args.state_threshold, args.cross_threshold, args.workers, traced)
+        tracemalloc.stop()
+
+    total = sum(timings.values())
+    unique_names = df["raw_name"].nunique()
+    print(f"\n{label}: {len(df)} rows, {unique_names} unique names, {df['grower_id'].nunique()} growers")
+    for name, seconds in timings.items():
+        memory = f"{peaks[name]:8.1f} MB peak" if name in peaks else ""
+        print(f"  {name:<16} {seconds:8.3f}s  {unique_names / seconds:12.0f} names/sec  {memory}")
+    print(f"  {'total':<16} {total:8.3f}s  {unique_names / total:12.0f} names/sec")
+    scores = pairwise_scores(df["grower_id"].tolist(), predicted.tolist())
+    print(f"  precision {scores['precision']:.4f}  recall {scores['recall']:.4f}  f1 {scores['f1']:.4f}")
+    errors = merge_errors(df, predicted)
+    for group in errors[:args.show_errors]:
+        print(f"    merged {len(group)} names: {group[:8]}{' ...' if len(group) > 8 else ''}")
+    return {
+        "rows": len(df), "unique_names": unique_names, "stage_seconds": timings, "total_seconds": total,
+        "names_per_second": unique_names / total, "peak_mb": peaks, **scores, "merge_errors": errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and score grower name resolution against labeled names")
+    parser.add_argument("--sample", default=str(SAMPLE_PATH), help="Labeled CSV with raw_name, state, grower_id")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[10000],
+                        help="Unique names per synthetic run, e.g. --synthetic 10000 100000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--state-threshold", type=int, default=80)
+    parser.add_argument("--cross-threshold", type=int, default=90)
+    parser.add_argument("--resolver", choices=sorted(RESOLVERS), default="names",
+                        help="names: preprocessor-v2's name-only matching (blocked cross-state pass); "
+                             "names-brute-force: preprocessor.py's name-only matching (every pair scored); "
+                             "linkage: grower_linkage record linkage")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the per-state matching")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--show-errors", type=int, default=5, help="Wrongly merged clusters to print per run")
+    parser.add_argument("--json", metavar="PATH", help="Write every result to a JSON file")
+    parser.add_argument("--min-precision", type=float, default=None, help="Exit non-zero below this on the sample")
+    parser.add_argument("--min-recall", type=float, default=None, help="Exit non-zero below this on the sample")
+    args = parser.parse_args()
+
+    resolver = RESOLVERS[args.resolver]
+    sample = load_labeled_sample(args.sample)
+    results = {"labeled": benchmark(sample, f"Labeled sample ({args.sample}), {args.resolver}", args, resolver)}
+    for size in args.synthetic:
+        results[f"synthetic_{size}"] = benchmark(synthetic_sample(size, args.seed),
+                                                 f"Synthetic {size}, {args.resolver}", args, resolver)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2, default=str))
+    labeled = results["labeled"]
+    if args.min_precision is not None and labeled["precision"] < args.min_precision:
+        sys.exit(f"Precision {labeled['precision']} is below {args.min_precision}")
+    if args.min_recall is not None and labeled["recall"] < args.min_recall:
+        sys.exit(f"Recall {labeled['recall']} is below {args.min_recall}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from page_fetcher import PageFetcher, DEFAULT_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+from scrape_fixtures import DEFAULT_FIXTURES_DIR, ReplayServer
+from scrape_gpc_results import ScrapePipeline
+
+class OfflineScrapePipeline(ScrapePipeline):
+    """Scrape pipeline whose write stage counts rows instead of writing to Supabase."""
+
+    def __init__(self, *args, write_latency: float = 0.0, **kwargs):
+        super().__init__(None, *args, **kwargs)
+        self.write_latency = write_latency
+        self.rows = 0
+
+    async def store(self, category: str, year: int, scraped_data: Optional[Dict[str, Any]]) -> Optional[str]:
+        if self.write_latency:
+            await asyncio.sleep(self.write_latency)
+        if scraped_data:
+            self.rows += len(scraped_data["data"])
+        return None
+
+def tasks_from_manifest(manifest: Dict[str, Dict]) -> List[tuple]:
+    """Recover the (category, year) tasks from the recorded page URLs."""
+    tasks = []
+    for key in manifest:
+        query = parse_qs(urlsplit(key).query)
+        if "c" in query and "y" in query:
+            tasks.append((query["c"][0], int(query["y"][0])))
+    return sorted(tasks)
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[int(pct * (len(ordered) - 1))]
+
+async def run_once(server: ReplayServer, tasks: List[tuple], args, parse_executor) -> Dict[str, Any]:
+    """Run the full pipeline once against the replay server."""
+    results = []
+    max_concurrency = args.concurrency if args.fixed_concurrency else max(args.concurrency, args.max_concurrency)
+    async with PageFetcher(concurrency=args.concurrency, base_url=server.base_url,
+                           max_concurrency=max_concurrency, adaptive=not args.fixed_concurrency) as fetcher:
+        pipeline = OfflineScrapePipeline(
+            fetcher,
+            fetch_workers=max_concurrency,
+            parse_workers=args.parse_workers,
+            write_workers=args.write_workers,
+            queue_size=args.queue_size,
+            parse_executor=parse_executor,
+            write_latency=args.write_latency
+        )
+        start = time.perf_counter()
+        stage_timings = await pipeline.run(tasks, results.append)
+        elapsed = time.perf_counter() - start
+        fetch_stats = fetcher.stats()
+
+    latencies = [result["timings"]["total"] for result in results]
+    return {
+        "elapsed": elapsed,
+        "pages": len(results),
+        "failed": sum(1 for result in results if not result["success"] and result["error"] != "No data found"),
+        "rows": pipeline.rows,
+        "p95_latency": percentile(latencies, 0.95),
+        "stage_timings": stage_timings,
+        "fetch_stats": fetch_stats
+    }
+
+async def benchmark(args) -> None:
+    with ReplayServer(args.fixtures, latency=args.latency, jitter=args.jitter, seed=args.seed) as server:
+        tasks = tasks_from_manifest(server.manifest)
+        print(f"Replaying {len(tasks)} recorded pages from {args.fixtures} at {server.base_url}")
+        print(f"Latency {args.latency}s +/- {args.jitter}s, {args.concurrency} fetchers, "
+              f"{args.parse_workers} parsers, {args.write_workers} writers\n")
+
+        with ProcessPoolExecutor(max_workers=args.parse_workers) as parse_executor:
+            for run in range(1, args.repeat + 1):
+                stats = await run_once(server, tasks, args, parse_executor)
+                print(f"Run {run}: {stats['pages'] / stats['elapsed']:7.1f} pages/sec  "
+                      f"{stats['rows'] / stats['elapsed']:9.0f} rows/sec  "
+                      f"p95 page latency {stats['p95_latency'] * 1000:7.1f} ms  "
+                      f"({stats['pages']} pages, {stats['rows']} rows, {stats['failed']} failed, "
+                      f"{stats['elapsed']:.2f}s)")
+                print(f"    fetch concurrency settled at {stats['fetch_stats']['final_concurrency']}, "
+                      f"{stats['fetch_stats']['retries']} retries")
+                for stage in ScrapePipeline.STAGES:
+                    timing = stats["stage_timings"][stage]
+                    print(f"    {stage:<6} busy {timing['total_seconds']:7.2f}s  "
+                          f"p95 {timing['p95_seconds'] * 1000:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrape pipeline against recorded pages")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Directory written by --record")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean simulated server latency, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Uniform +/- jitter on the latency, in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the latency jitter")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--fixed-concurrency", action="store_true")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--write-workers", type=int, default=4)
+    parser.add_argument("--write-latency", type=float, default=0.0,
+                        help="Simulated per-page database write time, in seconds")
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args))
+
+if __name__ == "__main__":
+    main()
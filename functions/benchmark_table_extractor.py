@@ -0,0 +1,92 @@
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from page_cache import DEFAULT_CACHE_DIR
+from table_extractor import extract_first_table, extract_tables
+
+def legacy_parse(content: bytes):
+    """The original BeautifulSoup html.parser path used by the scrapers."""
+    soup = BeautifulSoup(content, 'html.parser')
+    table = soup.find('table')
+    if not table:
+        return None
+    headers = [th.text for th in table.find_all('th')]
+    rows = [[td.text for td in row.find_all('td')] for row in table.find_all('tr')[1:]]
+    return headers, rows
+
+# (label, page, expected) edge cases checked before timing; expected None means "same as legacy_parse"
+PARITY_CASES = [
+    ("utf-8 without a charset", "<table><tr><th>Grower</th></tr><tr><td>André Côté</td></tr></table>".encode("utf-8"), None),
+    ("meta charset latin-1", '<meta charset="iso-8859-1"><table><tr><th>Grower</th></tr>'
+     '<tr><td>André Côté</td></tr></table>'.encode("latin-1"), None),
+    ("windows-1252 without a charset", "<table><tr><th>Grower</th></tr><tr><td>Zoë “Z”</td></tr></table>".encode("cp1252"), None),
+    ("nested table", b"<table><tr><th>A</th></tr><tr><td>x<table><tr><td>in1</td></tr><tr><td>in2</td></tr>"
+     b"</table></td><td>y</td></tr><tr><td>z</td></tr></table><table><tr><td>second</td></tr></table>", None),
+    ("no table", b"<html><body><p>No results</p></body></html>", None),
+    # html.parser nests every unclosed cell inside the previous one; lxml closes them like a browser
+    ("unclosed th/td/tr", b"<table><tr><th>A<th>B<tr><td>1<td>2<tr><td>3<td>4</table>",
+     (["A", "B"], [["1", "2"], ["3", "4"]])),
+]
+
+def check_parity() -> int:
+    """Run the edge cases, print any that differ and return how many did."""
+    failures = 0
+    for label, page, expected in PARITY_CASES:
+        expected = legacy_parse(page) if expected is None else expected
+        actual = extract_first_table(page)
+        if actual != expected:
+            failures += 1
+            print(f"Parity case '{label}' differs:\n  expected {expected}\n  got      {actual}")
+    print(f"Parity cases: {len(PARITY_CASES) - failures}/{len(PARITY_CASES)} match\n")
+    return failures
+
+def load_pages(pages_dir: str) -> List[bytes]:
+    """Load every saved .html page under a directory."""
+    paths = sorted(Path(pages_dir).rglob("*.html"))
+    return [path.read_bytes() for path in paths]
+
+def time_it(label: str, fn, repeat: int) -> float:
+    """Run fn `repeat` times and return the best wall time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<32} {best:8.3f}s")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the lxml table extractor with the BeautifulSoup path")
+    parser.add_argument("--pages-dir", default=str(Path(DEFAULT_CACHE_DIR) / "objects"),
+                        help="Directory of saved result pages (defaults to the page cache)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best time is reported")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size for the parallel run")
+    args = parser.parse_args()
+
+    check_parity()
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"No saved pages found in {args.pages_dir}; run a scrape with the page cache enabled first.")
+        return
+
+    total_mb = sum(len(page) for page in pages) / 1_000_000
+    print(f"Loaded {len(pages)} pages ({total_mb:.1f} MB) from {args.pages_dir}\n")
+
+    # Check the extractor returns exactly what the old path did before timing anything
+    mismatches = sum(1 for page in pages if legacy_parse(page) != extract_first_table(page))
+    print(f"Output mismatches vs BeautifulSoup: {mismatches}\n")
+
+    legacy = time_it("BeautifulSoup html.parser", lambda: [legacy_parse(page) for page in pages], args.repeat)
+    serial = time_it("lxml extractor (serial)", lambda: [extract_first_table(page) for page in pages], args.repeat)
+    pooled = time_it("lxml extractor (process pool)", lambda: extract_tables(pages, args.workers), args.repeat)
+
+    print(f"\nSpeedup serial: {legacy / serial:.1f}x")
+    print(f"Speedup pooled: {legacy / pooled:.1f}x")
+    print(f"Pages/sec pooled: {len(pages) / pooled:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
 import pandas as pd
-from nameparser import HumanName
-from fuzzywuzzy import process, fuzz
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from tqdm import tqdm
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
-import re
 import sys
 import time
 from datetime import datetime
 import json
+import hashlib
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pg_loader import CopyLoader, column_arrays, render_sql, unnest_insert_sql
+from batch_planner import BatchPlanner, PlannedBatch
+from name_cache import NameResolutionCache, changed_resolutions
+from name_normalizer import NORMALIZER_VERSION, normalize_names
+from name_matching import CanonicalNameIndex, apply_clusters, resolve_clusters
+from parallel_matching import StateMatcher
+from grower_linkage import GrowerProfile, link_growers
+from seed_normalizer import SeedIndex
+from site_resolver import SiteProfile, SiteResolver, home_profiles, match_type
 
 # Setup logging with more restrictive configuration
 log_filename = f'etl_pipeline_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
@@ -41,16 +49,127 @@ def escape_sql_string(value):
     """Escape single quotes in SQL strings."""
     return str(value).replace("'", "''")
 
+ENTRIES_STAGING_COLUMNS = [
+    'category', 'year', 'place', 'weight_lbs', 'processed_grower_name',
+    'original_grower_name', 'city', 'state_prov', 'country', 'gpc_site',
+    'seed_mother', 'pollinator_father', 'ott', 'est_weight', 'entry_type'
+]
+
+SITES_STAGING_COLUMNS = ['year', 'gpc_site', 'city', 'state_prov', 'country']
+
+CORE_ENTRIES_COLUMNS = [
+    'category', 'year', 'place', 'weight_lbs', 'grower_name', 'original_grower_name',
+    'city', 'state_prov', 'country', 'gpc_site', 'seed_mother', 'pollinator_father',
+    'ott', 'est_weight', 'entry_type'
+]
+
+TABLE_COLUMNS = {
+    ('staging', 'entries_staging'): ENTRIES_STAGING_COLUMNS,
+    ('staging', 'sites_staging'): SITES_STAGING_COLUMNS,
+    ('core', 'entries'): CORE_ENTRIES_COLUMNS
+}
+
+def table_columns(schema: str, table_name: str) -> List[str]:
+    """Columns written by the bulk insert paths for a table."""
+    return TABLE_COLUMNS.get((schema, table_name), ENTRIES_STAGING_COLUMNS)
+
+# Bump whenever the matching rules in process_year change; cached resolutions from other
+# versions are then ignored
+NAME_RULES_VERSION = f"etl-3.{NORMALIZER_VERSION}"
+
+GROWER_ID_BATCH = 2000  # profiles per grower_id update statement
+SEED_BATCH = 2000  # seeds or seed spellings per insert statement
+SITE_BATCH = 2000  # sites or site spellings per insert statement
+
+ENTRIES_STAGING_KEY = ['category', 'year', 'processed_grower_name', 'gpc_site', 'weight_lbs']
+
+# Staging loads upsert on their natural keys, so reprocessing a unit never duplicates rows
+CONFLICT_CLAUSES = {
+    ('staging', 'entries_staging'): (
+        f"ON CONFLICT ({', '.join(ENTRIES_STAGING_KEY)}) DO UPDATE SET " +
+        ", ".join(f"{column} = EXCLUDED.{column}"
+                  for column in ENTRIES_STAGING_COLUMNS if column not in ENTRIES_STAGING_KEY)
+    ),
+    ('staging', 'sites_staging'): "ON CONFLICT DO NOTHING"
+}
+
+# Columns the database fills in on insert; they change on every re-scrape without the data changing
+RAW_BOOKKEEPING_COLUMNS = {'id', 'created_at'}
+
+def raw_content_hash(df: pd.DataFrame) -> str:
+    """Order-independent hash of the data columns of a raw table's rows."""
+    columns = sorted(column for column in df.columns if column not in RAW_BOOKKEEPING_COLUMNS)
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy(copy=True)
+    row_hashes.sort()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+def error_code(error: Exception) -> Optional[str]:
+    """SQLSTATE of a database error from either psycopg or the PostgREST RPC, if it has one."""
+    code = getattr(error, 'sqlstate', None) or getattr(error, 'code', None)
+    return code if isinstance(code, str) else None
+
+def is_data_error(error: Exception) -> bool:
+    """Whether an insert failed because of the rows themselves rather than the connection.
+
+    Data exceptions (22), integrity violations (23), syntax/type errors (42) and a batch that
+    upserts the same key twice (21000, ON CONFLICT cardinality violation) fail the same way on
+    every retry.
+    """
+    code = error_code(error)
+    return bool(code) and (code == '21000' or code[:2] in ('22', '23', '42'))
+
+def is_signature_error(error: Exception) -> bool:
+    """Whether the execute_sql RPC was rejected for its arguments, i.e. it has no ``params`` argument.
+
+    PostgREST answers PGRST202 when no function matches the argument names, PGRST203 when several
+    overloads do, and passes on 42883 (undefined_function) from Postgres.
+    """
+    return error_code(error) in ('PGRST202', 'PGRST203', '42883')
+
 class GPCPipeline:
-    def __init__(self, supabase: Client):
-        """Initialize the ETL processor with Supabase client."""
+    def __init__(self, supabase: Client, copy_loader: Optional[CopyLoader] = None, reset_staging: bool = True,
+                 insert_workers: int = 4, name_cache: Optional[NameResolutionCache] = None,
+                 incremental: bool = False, match_workers: Optional[int] = None):
+        """Initialize the ETL processor with Supabase client.
+
+        When a CopyLoader is given, bulk inserts stream over a direct Postgres connection
+        with COPY instead of going through the execute_sql RPC. ``reset_staging=False`` keeps
+        the existing staging tables, e.g. when replaying dead letters. ``insert_workers`` batches
+        are kept in flight at once over the shared client. With a ``name_cache`` only grower names
+        not resolved by an earlier run are normalized and fuzzy matched; ``incremental`` also freezes
+        the cached clusters and places new names by index lookup instead of re-matching each state.
+        States are fuzzy matched on ``match_workers`` processes (default: one per CPU).
+        """
         self.supabase = supabase
-        self.batch_size = 500  # Increased from 50 to 500
+        self.copy_loader = copy_loader
+        self.name_cache = name_cache
+        self.name_index = None
+        self.state_matcher = StateMatcher(match_workers)
+        if incremental:
+            if name_cache is None:
+                raise ValueError("Incremental name matching needs a name cache")
+            self.name_index = CanonicalNameIndex.from_cache(name_cache)
+            logger.info(f"Incremental name matching against {len(self.name_index)} canonical names")
+        self.insert_workers = insert_workers
+        self._insert_executor = ThreadPoolExecutor(max_workers=insert_workers, thread_name_prefix="insert")
+        self.load_stats = {}
+        self.journal = {}
+        self.skipped_units = []
+        self.batch_size = 500  # Starting batch size; each table's BatchPlanner adapts it
+        self.batch_planners = {}
         self.max_retries = 3
         self.retry_delay = 2  # seconds
+        self.dead_letter_path = f'failed_records_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jsonl'
+        self.rpc_params = True  # cleared once execute_sql turns out not to take a params argument
         self._verify_database_access()
-        self._ensure_staging_tables()
+        if reset_staging:
+            self._ensure_staging_tables()
         
+    def close(self) -> None:
+        """Stop the insert and matching workers."""
+        self._insert_executor.shutdown(wait=True)
+        self.state_matcher.close()
+
     def _verify_database_access(self) -> None:
         """Verify database access."""
         try:
@@ -67,25 +186,32 @@ class GPCPipeline:
                 logger.error(f"Error message: {e.message}")
             raise Exception("Failed to verify database access. Please check your credentials and database setup.")
 
-    def _ensure_staging_tables(self) -> None:
-        """Ensure staging tables exist with correct schema."""
+    def _ensure_staging_tables(self, reset: bool = True) -> None:
+        """Ensure staging tables exist with correct schema.
+
+        ``reset`` drops the staging tables and the run journal first; without it existing rows are
+        kept so a resumed run can pick up where the last one stopped.
+        """
         try:
-            # Drop any existing views first
-            drop_views_sql = """
-            DROP VIEW IF EXISTS staging.name_changes CASCADE;
-            DROP VIEW IF EXISTS staging.site_changes CASCADE;
-            DROP VIEW IF EXISTS staging.data_quality_view CASCADE;
-            """
-            self.supabase.rpc('execute_sql', {'query': drop_views_sql}).execute()
-            
-            # Drop and recreate entries_staging table with CASCADE
-            drop_entries_sql = """
-            DROP TABLE IF EXISTS staging.entries_staging CASCADE;
-            """
-            self.supabase.rpc('execute_sql', {'query': drop_entries_sql}).execute()
+            if reset:
+                # Drop any existing views first
+                drop_views_sql = """
+                DROP VIEW IF EXISTS staging.name_changes CASCADE;
+                DROP VIEW IF EXISTS staging.site_changes CASCADE;
+                DROP VIEW IF EXISTS staging.data_quality_view CASCADE;
+                """
+                self.supabase.rpc('execute_sql', {'query': drop_views_sql}).execute()
+                
+                # Drop and recreate the staging tables with CASCADE; the journal goes with them
+                drop_entries_sql = """
+                DROP TABLE IF EXISTS staging.entries_staging CASCADE;
+                DROP TABLE IF EXISTS staging.sites_staging CASCADE;
+                DROP TABLE IF EXISTS staging.etl_run_journal;
+                """
+                self.supabase.rpc('execute_sql', {'query': drop_entries_sql}).execute()
             
             create_entries_sql = """
-            CREATE TABLE staging.entries_staging (
+            CREATE TABLE IF NOT EXISTS staging.entries_staging (
                 entry_id SERIAL PRIMARY KEY,
                 category CHAR(1),
                 year INTEGER,
@@ -93,6 +219,7 @@ class GPCPipeline:
                 weight_lbs NUMERIC,
                 original_grower_name TEXT,
                 processed_grower_name TEXT,
+                grower_id TEXT,
                 city TEXT,
                 state_prov TEXT,
                 country TEXT,
@@ -105,12 +232,52 @@ class GPCPipeline:
                 data_quality_score INTEGER,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
             );
+            -- NULLS NOT DISTINCT (PostgreSQL 15+) lets rows with a missing site or weight conflict too;
+            -- without it they would be duplicated on every reload, so refuse older servers outright
+            DO $$
+            BEGIN
+                IF current_setting('server_version_num')::INTEGER < 150000 THEN
+                    RAISE EXCEPTION 'staging.entries_staging needs PostgreSQL 15 or later (NULLS NOT DISTINCT)';
+                END IF;
+            END $$;
+            CREATE UNIQUE INDEX IF NOT EXISTS entries_staging_natural_key
+                ON staging.entries_staging (category, year, processed_grower_name, gpc_site, weight_lbs)
+                NULLS NOT DISTINCT;
+            ALTER TABLE staging.entries_staging ADD COLUMN IF NOT EXISTS grower_id TEXT;
             """
             self.supabase.rpc('execute_sql', {'query': create_entries_sql}).execute()
 
+            create_sites_sql = """
+            CREATE TABLE IF NOT EXISTS staging.sites_staging (
+                site_id SERIAL PRIMARY KEY,
+                year INTEGER,
+                gpc_site TEXT,
+                city TEXT,
+                state_prov TEXT,
+                country TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS sites_staging_natural_key
+                ON staging.sites_staging (year, gpc_site, city, state_prov, country);
+            """
+            self.supabase.rpc('execute_sql', {'query': create_sites_sql}).execute()
+
+            # One row per fully loaded (category, year); --resume skips units whose raw data is unchanged
+            create_journal_sql = """
+            CREATE TABLE IF NOT EXISTS staging.etl_run_journal (
+                category CHAR(1),
+                year INTEGER,
+                row_count INTEGER,
+                content_hash TEXT,
+                completed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (category, year)
+            );
+            """
+            self.supabase.rpc('execute_sql', {'query': create_journal_sql}).execute()
+
             # Create name_changes as a view instead of a table
             create_name_changes_sql = """
-            CREATE VIEW staging.name_changes AS
+            CREATE OR REPLACE VIEW staging.name_changes AS
             SELECT 
                 ROW_NUMBER() OVER () as change_id,
                 original_grower_name as original_name,
@@ -132,27 +299,11 @@ class GPCPipeline:
             """
             self.supabase.rpc('execute_sql', {'query': create_name_changes_sql}).execute()
 
-            # Create site_standardization as a view
-            create_site_std_sql = """
-            CREATE VIEW staging.site_standardization AS
-            SELECT 
-                ROW_NUMBER() OVER () as site_id,
-                gpc_site as original_site,
-                gpc_site as standardized_site,
-                city,
-                state_prov,
-                country,
-                1.0 as confidence_score,
-                MIN(created_at) as first_seen_at
-            FROM staging.entries_staging
-            WHERE gpc_site IS NOT NULL
-            GROUP BY gpc_site, city, state_prov, country;
-            """
-            self.supabase.rpc('execute_sql', {'query': create_site_std_sql}).execute()
+            # staging.site_standardization is a view over core.site_names; see _ensure_core_tables
 
             # Create data_quality_issues as a view
             create_quality_issues_sql = """
-            CREATE VIEW staging.data_quality_issues AS
+            CREATE OR REPLACE VIEW staging.data_quality_issues AS
             WITH quality_checks AS (
                 SELECT 
                     entry_id,
@@ -253,137 +404,165 @@ class GPCPipeline:
         except (ValueError, TypeError):
             return None
 
-    def _process_name(self, name: str) -> str:
-        """Process grower name with improved handling."""
-        if pd.isna(name):
-            return "Unknown"
-        
-        name = str(name).strip()
-        # Remove special characters and extra spaces
-        name = re.sub(r'[&/\-]+', ' ', name)
-        name = re.sub(r'\s+', ' ', name)
-        name = re.sub(r'\d+', '', name)
-        
-        # Handle team names
-        if "team" in name.lower():
-            name = re.sub(r'\bteam\b|\bthe\b', '', name, flags=re.I).strip()
-            return f"Team {name.title()}"
-        
-        # Parse individual names
-        try:
-            human_name = HumanName(name)
-            if human_name.last:
-                return f"{human_name.last.title()}, {human_name.first.title()}".strip()
-        except Exception:
-            pass
-        
-        return name.title().strip()
+    def _batch_insert(self, table_name: str, records: List[Dict], schema: str = 'staging') -> Dict[str, int]:
+        """Insert records in batches with improved error handling.
 
-    def _batch_insert(self, table_name: str, records: List[Dict], schema: str = 'staging') -> None:
-        """Insert records in batches with improved error handling."""
+        Up to ``insert_workers`` batches are in flight at once. Each further batch is cut only when
+        one finishes, so its size reflects the planner feedback from the batches before it. The call
+        returns once every batch has finished, with the number of rows inserted and failed.
+        """
         if not records:
             logger.warning(f"No records to insert into {schema}.{table_name}")
-            return
+            return {'inserted': 0, 'failed': 0}
 
-        successful_inserts = 0
-        failed_batches = []
-
-        # Construct the SQL with the values directly
-        for i in range(0, len(records), self.batch_size):
-            batch = records[i:i + self.batch_size]
-            
-            # Convert batch to SQL values
-            values_list = []
-            for record in batch:
-                if table_name == 'sites_staging':
-                    values = (
-                        f"({record['year']}, "
-                        f"'{record['gpc_site'].replace("'", "''")}', '{record['city'].replace("'", "''")}', "
-                        f"'{record['state_prov'].replace("'", "''")}', '{record['country'].replace("'", "''")}')"
-                    )
-                    values_list.append(values)
-                else:
-                    values = (
-                        f"('{record['category'].replace("'", "''")}', {record['year']}, '{record['place'].replace("'", "''")}', "
-                        f"{record['weight_lbs'] if record['weight_lbs'] is not None else 'NULL'}, "
-                        f"'{record['processed_grower_name'].replace("'", "''")}', "
-                        f"'{record['original_grower_name'].replace("'", "''")}', '{record['city'].replace("'", "''")}', "
-                        f"'{record['state_prov'].replace("'", "''")}', '{record['country'].replace("'", "''")}', "
-                        f"'{record['gpc_site'].replace("'", "''")}', "
-                        f"'{record['seed_mother'].replace("'", "''")}', '{record['pollinator_father'].replace("'", "''")}', "
-                        f"{record['ott'] if record['ott'] is not None else 'NULL'}, "
-                        f"{record['est_weight'] if record['est_weight'] is not None else 'NULL'}, "
-                        f"'{record['entry_type'].replace("'", "''")}')"
-                    )
-                    values_list.append(values)
+        if self.copy_loader is not None and self._copy_insert(table_name, records, schema):
+            return {'inserted': len(records), 'failed': 0}
 
-            # Construct appropriate SQL based on table
-            if table_name == 'sites_staging':
-                sql = f"""
-                INSERT INTO {schema}.{table_name} (
-                    year, gpc_site, city, state_prov, country
-                )
-                VALUES {','.join(values_list)};
-                """
-            else:
-                sql = f"""
-                INSERT INTO {schema}.{table_name} (
-                    category, year, place, weight_lbs, processed_grower_name,
-                    original_grower_name, city, state_prov, country, gpc_site,
-                    seed_mother, pollinator_father, ott, est_weight, entry_type
-                )
-                VALUES {','.join(values_list)};
-                """
-            
-            for attempt in range(self.max_retries):
-                try:
-                    # Use execute_sql with 'query' parameter
-                    self.supabase.rpc('execute_sql', {'query': sql}).execute()
-                    successful_inserts += len(batch)
-                    # Only log batch completions for large batches or final batches
-                    if len(batch) >= 500 or i + len(batch) >= len(records):
-                        logger.info(f"Successfully inserted batch of {len(batch)} records into {schema}.{table_name}")
-                    break
-                except Exception as e:
-                    error_msg = str(e)
-                    if attempt == self.max_retries - 1:
-                        logger.error(f"Failed to insert batch after {self.max_retries} attempts")
-                        failed_batches.append((i, batch))
-                        # Log the actual data that failed
-                        logger.error(f"Failed SQL: {sql}")
-                        logger.error(f"Failed batch sample: {json.dumps(batch[0], indent=2, default=str)}")
-                        self._save_failed_records([(i, batch)], f"{schema}_{table_name}")
-                    else:
-                        time.sleep(self.retry_delay)
-
-        if failed_batches:
-            total_failed = sum(len(batch) for _, batch in failed_batches)
-            logger.error(f"Failed to insert {total_failed} records into {schema}.{table_name}")
+        successful_inserts = 0
+        dead_letters = []
+
+        # The statement text is the same for every batch; only the typed array parameters change
+        columns = table_columns(schema, table_name)
+        conflict = CONFLICT_CLAUSES.get((schema, table_name), "")
+        sql = unnest_insert_sql(schema, table_name, columns, conflict=conflict)
+
+        planner = self._batch_planner(schema, table_name)
+        in_flight = set()
+        batches = 0
+        for batch in planner.batches(records):
+            if len(in_flight) >= self.insert_workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                successful_inserts += sum(future.result() for future in done)
+            in_flight.add(self._insert_executor.submit(
+                self._insert_planned, planner, schema, table_name, columns, batch, sql, dead_letters
+            ))
+            batches += 1
+        successful_inserts += sum(future.result() for future in wait(in_flight).done)
+
+        if dead_letters:
+            logger.error(f"Failed to insert {len(dead_letters)} records into {schema}.{table_name}")
+            self._save_dead_letters(schema, table_name, dead_letters)
 
         # Only log final completion message
         if successful_inserts > 0:
-            logger.info(f"Completed inserting {successful_inserts} records into {schema}.{table_name}")
+            logger.info(f"Completed inserting {successful_inserts} records into {schema}.{table_name} "
+                        f"({batches} batches)")
+
+        return {'inserted': successful_inserts, 'failed': len(dead_letters)}
+
+    def _batch_planner(self, schema: str, table_name: str) -> BatchPlanner:
+        key = f"{schema}.{table_name}"
+        if key not in self.batch_planners:
+            self.batch_planners[key] = BatchPlanner(key, initial_rows=self.batch_size)
+        return self.batch_planners[key]
+
+    def _insert_planned(self, planner: BatchPlanner, schema: str, table_name: str, columns: List[str],
+                        batch: PlannedBatch, sql: str, dead_letters: List[Tuple[Dict, Exception]]) -> int:
+        """Insert one planned batch and report its latency and outcome back to the planner."""
+        start = time.perf_counter()
+        inserted = self._insert_bisecting(schema, table_name, columns, batch.records, sql, dead_letters)
+        planner.observe(batch, time.perf_counter() - start, inserted == len(batch.records))
+        return inserted
+
+    def _insert_bisecting(self, schema: str, table_name: str, columns: List[str], batch: List[Dict],
+                          sql: str, dead_letters: List[Tuple[Dict, Exception]]) -> int:
+        """Insert a batch, splitting it in half on data errors until the bad rows are isolated.
+
+        Each half commits on its own, so good rows land as soon as their half succeeds. Rows that
+        fail alone, and whole batches that still fail after transient retries, go to dead_letters.
+        Returns the number of rows inserted.
+        """
+        error = self._try_insert(schema, table_name, columns, batch, sql)
+        if error is None:
+            return len(batch)
+        if len(batch) == 1 or not is_data_error(error):
+            logger.warning(f"Dead-lettering {len(batch)} records for {schema}.{table_name}: {str(error)}")
+            dead_letters.extend((record, error) for record in batch)
+            return 0
+        mid = len(batch) // 2
+        return (self._insert_bisecting(schema, table_name, columns, batch[:mid], sql, dead_letters) +
+                self._insert_bisecting(schema, table_name, columns, batch[mid:], sql, dead_letters))
+
+    def _try_insert(self, schema: str, table_name: str, columns: List[str], batch: List[Dict],
+                    sql: str) -> Optional[Exception]:
+        """Insert one batch, retrying only transient errors; returns the final error, if any."""
+        for attempt in range(self.max_retries):
+            try:
+                self._insert_rows(schema, table_name, columns, batch, sql)
+                return None
+            except Exception as e:
+                # A bad value fails the same way every time, so don't sleep on it
+                if is_data_error(e) or attempt == self.max_retries - 1:
+                    return e
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    def _insert_rows(self, schema: str, table_name: str, columns: List[str], batch: List[Dict], sql: str) -> None:
+        """Insert one batch as typed arrays: prepared on a direct connection, else through execute_sql params."""
+        if self.copy_loader is not None:
+            self.copy_loader.insert_records(schema, table_name, columns, batch,
+                                            CONFLICT_CLAUSES.get((schema, table_name), ""))
+            return
+        self._execute_sql(sql, column_arrays(schema, table_name, columns, batch, json_safe=True))
 
-    def _save_failed_records(self, failed_batches: List[tuple], table_name: str) -> None:
-        """Save failed records to a file for later analysis."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"failed_records_{table_name}_{timestamp}.json"
-        
-        failed_records = []
-        for batch_index, batch in failed_batches:
-            for record in batch:
-                failed_records.append({
-                    'batch_index': batch_index,
-                    'record': record
-                })
-            
+    def _execute_sql(self, query: str, params: List[Any]) -> Any:
+        """Run a parameterized statement through the execute_sql RPC.
+
+        ``params`` go as the RPC's ``params`` argument. A deployment whose execute_sql only takes
+        ``query`` rejects that call before running anything, so the statement is sent again with
+        the parameters rendered as SQL literals, and later calls go straight to the rendered form.
+        """
+        if self.rpc_params:
+            try:
+                return self.supabase.rpc('execute_sql', {'query': query, 'params': params}).execute()
+            except Exception as e:
+                if not is_signature_error(e):
+                    raise
+                logger.warning(f"execute_sql does not take params ({str(e)}); sending rendered SQL instead")
+                self.rpc_params = False
+        return self.supabase.rpc('execute_sql', {'query': render_sql(query, params)}).execute()
+
+    def _copy_insert(self, table_name: str, records: List[Dict], schema: str = 'staging') -> bool:
+        """Stream records with COPY; returns False so the caller can fall back to the RPC path."""
+        columns = table_columns(schema, table_name)
+        try:
+            count = self.copy_loader.copy_records(schema, table_name, columns, records)
+            logger.info(f"Completed copying {count} records into {schema}.{table_name}")
+            return True
+        except Exception as e:
+            logger.error(f"COPY into {schema}.{table_name} failed, falling back to batched inserts: {str(e)}")
+            return False
+
+    def _save_dead_letters(self, schema: str, table_name: str, failures: List[Tuple[Dict, Exception]]) -> None:
+        """Append rows that could not be inserted to the run's dead-letter file (one JSON object per line)."""
+        failed_at = datetime.now().isoformat()
         try:
-            with open(filename, 'w') as f:
-                json.dump(failed_records, f, indent=2, default=str)
-            logger.info(f"Saved failed records to {filename}")
+            with open(self.dead_letter_path, 'a') as f:
+                for record, error in failures:
+                    f.write(json.dumps({
+                        'schema': schema,
+                        'table': table_name,
+                        'record': record,
+                        'error': str(error),
+                        'sqlstate': error_code(error),
+                        'failed_at': failed_at
+                    }, default=str) + '\n')
+            logger.info(f"Saved {len(failures)} failed records to {self.dead_letter_path}")
         except Exception as e:
             logger.error(f"Failed to save failed records: {str(e)}")
 
+    def replay_dead_letters(self, path: str) -> None:
+        """Retry the rows in a dead-letter file; rows that fail again go to this run's file."""
+        grouped = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    grouped.setdefault((entry['schema'], entry['table']), []).append(entry['record'])
+
+        for (schema, table_name), records in grouped.items():
+            logger.info(f"Replaying {len(records)} dead-lettered records into {schema}.{table_name}")
+            self._batch_insert(table_name, records, schema)
+
     def process_year(self, year: int, category: str) -> None:
         """Process data for a specific year and category."""
         try:
@@ -394,32 +573,58 @@ class GPCPipeline:
             if df is None or len(df) == 0:
                 return
             
+            # A unit already in the journal with the same raw content was fully loaded before
+            content_hash = raw_content_hash(df)
+            if self.journal.get((category, year)) == content_hash:
+                logger.info(f"Skipping year {year} category {category}: already loaded")
+                self.skipped_units.append((category, year))
+                return
+            
             # Initialize counters
             name_changes = 0
             total_name_standardizations = 0
             
+            # Names resolved by an earlier run skip normalization and matching
+            name_keys = list(zip(df['grower_name'].astype(str), df['state_prov'].astype(str)))
+            cached = self.name_cache.lookup(set(name_keys)) if self.name_cache is not None else {}
+            is_new = pd.Series([key not in cached for key in name_keys], index=df.index)
+            
             # Process names - now with aggregated logging
-            df['processed_grower_name'] = df['grower_name'].apply(self._process_name)
+            df['processed_grower_name'] = [cached[key].canonical_name if key in cached else None for key in name_keys]
+            df.loc[is_new, 'processed_grower_name'] = normalize_names(df.loc[is_new, 'grower_name'])
             name_changes = sum(df['processed_grower_name'] != df['grower_name'])
-
-            # Process by state/province for better matching
-            states = df['state_prov'].unique()
-            
-            for state in states:
-                state_mask = df['state_prov'] == state
-                state_names = df.loc[state_mask, 'processed_grower_name'].unique()
-                
-                # Perform fuzzy matching within state
-                for name1 in state_names:
-                    matches = process.extract(name1, state_names, scorer=fuzz.token_sort_ratio)
-                    similar_names = [match[0] for match in matches if match[1] > 85 and match[0] != name1]
-                    
-                    if similar_names:
-                        # Use the alphabetically first name as the standard
-                        standard_name = min([name1] + similar_names)
-                        mask = df['processed_grower_name'].isin(similar_names)
-                        total_name_standardizations += sum(mask)
-                        df.loc[mask, 'processed_grower_name'] = standard_name
+            normalized_names = df['processed_grower_name'].tolist()
+            name_counts = df['processed_grower_name'].value_counts()
+            matched_pairs = []
+            match_scores = {}
+
+            if self.name_index is not None:
+                # Place only the new names among the frozen canonical names of their state
+                new_keys = list(zip(df.loc[is_new, 'processed_grower_name'], df.loc[is_new, 'state_prov'].astype(str)))
+                placed = self.name_index.resolve(new_keys, threshold=85, counts=name_counts)
+                df.loc[is_new, 'processed_grower_name'] = [placed[key][0] for key in new_keys]
+                match_scores.update({name: score for (name, _), (_, score) in placed.items()})
+            else:
+                # Match within each state/province, states in parallel; keep the pairs involving
+                # a name not resolved before
+                names_by_state = df.groupby('state_prov')['processed_grower_name'].unique().to_dict()
+                new_names = set(df.loc[is_new, 'processed_grower_name'])
+                matched_pairs = [
+                    (a, b) for a, b in self.state_matcher.match(names_by_state, threshold=85)
+                    if a in new_names or b in new_names
+                ]
+
+            # Matched names form clusters; every row takes its cluster's most frequent name
+            canonical_names = resolve_clusters(matched_pairs, name_counts)
+            standardized = apply_clusters(df['processed_grower_name'], canonical_names)
+            total_name_standardizations = int((standardized != normalized_names).sum())
+            df['processed_grower_name'] = standardized
+
+            # Remember every resolution that is new or changed this run
+            if self.name_cache is not None:
+                self.name_cache.store(changed_resolutions(
+                    name_keys, normalized_names, df['processed_grower_name'], cached, match_scores
+                ))
 
             # Prepare entries for staging
             entries = []
@@ -504,14 +709,21 @@ class GPCPipeline:
                 logger.info(f"- Unique sites: {len(sites_list)}")
                 logger.info(f"- Name changes: {name_changes}")
                 logger.info(f"- Name standardizations: {total_name_standardizations}")
+                logger.info(f"- Names resolved from cache: {int((~is_new).sum())}")
 
-            # Insert entries into staging
+            # Insert entries and sites into staging; both finish before the year is counted
+            stats = {}
             if entries:
-                self._batch_insert('entries_staging', entries)
-
-            # Insert sites into staging
+                stats['entries_staging'] = self._batch_insert('entries_staging', entries)
             if sites_list:
-                self._batch_insert('sites_staging', sites_list)
+                stats['sites_staging'] = self._batch_insert('sites_staging', sites_list)
+            self.load_stats[(category, year)] = stats
+
+            failed = sum(table_stats['failed'] for table_stats in stats.values())
+            if failed:
+                logger.warning(f"Year {year} Category {category}: {failed} records dead-lettered")
+            else:
+                self._record_unit(category, year, len(entries), content_hash)
 
         except Exception as e:
             logger.error(f"Error processing year {year} category {category}: {str(e)}")
@@ -519,6 +731,27 @@ class GPCPipeline:
                 logger.error(f"Error message: {e.message}")
             raise
 
+    def load_journal(self) -> None:
+        """Load the completed units recorded by earlier runs."""
+        result = self.supabase.rpc('execute_sql', {
+            'query': "SELECT category, year, content_hash FROM staging.etl_run_journal;"
+        }).execute()
+        self.journal = {(row['category'], row['year']): row['content_hash'] for row in result.data or []}
+        logger.info(f"Run journal has {len(self.journal)} completed category/years")
+
+    def _record_unit(self, category: str, year: int, row_count: int, content_hash: str) -> None:
+        """Journal a fully loaded (category, year)."""
+        sql = """
+        INSERT INTO staging.etl_run_journal (category, year, row_count, content_hash)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (category, year) DO UPDATE SET
+            row_count = EXCLUDED.row_count,
+            content_hash = EXCLUDED.content_hash,
+            completed_at = CURRENT_TIMESTAMP;
+        """
+        self._execute_sql(sql, [category, year, row_count, content_hash])
+        self.journal[(category, year)] = content_hash
+
     def process_data(self, df, category):
         """Process the raw data and return entries and sites dataframes."""
         # Process entries
@@ -534,66 +767,50 @@ class GPCPipeline:
         return entries, sites
 
     def insert_entries_batch(self, entries_batch, year):
-        """Insert a batch of entries into the staging table."""
-        values = []
-        for _, row in entries_batch.iterrows():
-            entry_values = f"({year}, "
-            entry_values += f"'{escape_sql_string(str(row['Place']))}', "
-            entry_values += f"{row['Weight']} as weight, "
-            entry_values += f"'{escape_sql_string(row['Processed Name'])}', "
-            entry_values += f"'{escape_sql_string(row['City'])}', "
-            entry_values += f"'{escape_sql_string(row['State/Prov'])}', "
-            entry_values += f"'{escape_sql_string(row['Country'])}', "
-            entry_values += f"'{escape_sql_string(row['GPC Site'])}', "
-            entry_values += f"'{escape_sql_string(str(row['Seed Mother']))}', "
-            entry_values += f"'{escape_sql_string(str(row['Pollinator/Father']))}', "
-            entry_values += f"{row['OTT'] if pd.notna(row['OTT']) else 'NULL'}, "
-            entry_values += f"{row['Est Weight'] if pd.notna(row['Est Weight']) else 'NULL'}, "
-            entry_values += f"'{escape_sql_string(row['entry_type'])}', "
-            entry_values += f"'{escape_sql_string(row['category'])}')"
-            values.append(entry_values)
-        
-        values_str = ', '.join(values)
-        
-        insert_query = f"""
-        INSERT INTO staging.entries_staging 
-        (year, place, weight, grower_name, city, state_prov, country, gpc_site, 
-         seed_mother, pollinator_father, ott, est_weight, entry_type, category)
-        VALUES {values_str};
+        """Insert a batch of preprocessed entries (process_data's frame) into the staging table.
+
+        The rows go through _batch_insert, so they are upserted, bisected on bad rows and streamed
+        with COPY when a direct connection is configured, like every other staging load.
         """
-        
-        try:
-            self.supabase.rpc('execute_sql', {'query': insert_query}).execute()
-            logger.info(f"Successfully inserted batch of {len(entries_batch)} records into staging.entries_staging")
-        except Exception as e:
-            logger.error(f"Error inserting entries batch: {str(e)}")
-            raise
+        records = [
+            {
+                'category': row['category'],
+                'year': year,
+                'place': str(row['Place']),
+                'weight_lbs': row['Weight'],
+                'processed_grower_name': row['Processed Name'],
+                'original_grower_name': row.get('Grower Name', row['Processed Name']),
+                'city': row['City'],
+                'state_prov': row['State/Prov'],
+                'country': row['Country'],
+                'gpc_site': row['GPC Site'],
+                'seed_mother': str(row['Seed Mother']),
+                'pollinator_father': str(row['Pollinator/Father']),
+                'ott': row['OTT'],
+                'est_weight': row['Est Weight'],
+                'entry_type': row['entry_type']
+            }
+            for _, row in entries_batch.iterrows()
+        ]
+        stats = self._batch_insert('entries_staging', records)
+        logger.info(f"Successfully inserted batch of {stats['inserted']} records into staging.entries_staging")
+        return stats
 
     def insert_sites_batch(self, sites_batch, year):
-        """Insert a batch of sites into the staging table."""
-        values = []
-        for _, row in sites_batch.iterrows():
-            site_values = f"({year}, "
-            site_values += f"'{escape_sql_string(row['site_name'])}', "
-            site_values += f"'{escape_sql_string(row['City'])}', "
-            site_values += f"'{escape_sql_string(row['State/Prov'])}', "
-            site_values += f"'{escape_sql_string(row['Country'])}')"
-            values.append(site_values)
-        
-        values_str = ', '.join(values)
-        
-        insert_query = f"""
-        INSERT INTO staging.sites_staging 
-        (year, site_name, city, state_prov, country)
-        VALUES {values_str};
-        """
-        
-        try:
-            self.supabase.rpc('execute_sql', {'query': insert_query}).execute()
-            logger.info(f"Successfully inserted batch of {len(sites_batch)} records into staging.sites_staging")
-        except Exception as e:
-            logger.error(f"Error inserting sites batch: {str(e)}")
-            raise
+        """Insert a batch of sites (process_data's frame) into the staging table through _batch_insert."""
+        records = [
+            {
+                'year': year,
+                'gpc_site': row['site_name'],
+                'city': row['City'],
+                'state_prov': row['State/Prov'],
+                'country': row['Country']
+            }
+            for _, row in sites_batch.iterrows()
+        ]
+        stats = self._batch_insert('sites_staging', records)
+        logger.info(f"Successfully inserted batch of {stats['inserted']} records into staging.sites_staging")
+        return stats
 
     def _ensure_core_tables(self) -> None:
         """Ensure core tables exist with correct schema."""
@@ -618,6 +835,7 @@ class GPCPipeline:
                 place TEXT,
                 weight_lbs NUMERIC,
                 grower_name TEXT,
+                grower_id TEXT,
                 original_grower_name TEXT,
                 city TEXT,
                 state_prov TEXT,
@@ -625,6 +843,9 @@ class GPCPipeline:
                 gpc_site TEXT,
                 seed_mother TEXT,
                 pollinator_father TEXT,
+                seed_mother_id INTEGER,
+                pollinator_father_id INTEGER,
+                site_id INTEGER,
                 ott NUMERIC,
                 est_weight NUMERIC,
                 entry_type TEXT,
@@ -634,11 +855,73 @@ class GPCPipeline:
             """
             self.supabase.rpc('execute_sql', {'query': create_entries_sql}).execute()
             
+            # Canonical seed dictionary and the raw spellings that resolve to each seed
+            create_seeds_sql = """
+            DROP TABLE IF EXISTS core.seed_names CASCADE;
+            DROP TABLE IF EXISTS core.seeds CASCADE;
+            CREATE TABLE core.seeds (
+                seed_id INTEGER PRIMARY KEY,
+                seed_name TEXT NOT NULL,
+                weight_lbs INTEGER,
+                grower TEXT,
+                year INTEGER
+            );
+            CREATE TABLE core.seed_names (
+                raw_name TEXT PRIMARY KEY,
+                seed_id INTEGER NOT NULL REFERENCES core.seeds (seed_id)
+            );
+            """
+            self.supabase.rpc('execute_sql', {'query': create_seeds_sql}).execute()
+            
+            # Consolidated sites, the raw site names that resolve to each and how they were matched
+            create_sites_sql = """
+            DROP TABLE IF EXISTS core.site_names CASCADE;
+            DROP TABLE IF EXISTS core.sites CASCADE;
+            CREATE TABLE core.sites (
+                site_id INTEGER PRIMARY KEY,
+                site_name TEXT NOT NULL,
+                state_prov TEXT,
+                country TEXT,
+                first_year INTEGER,
+                last_year INTEGER
+            );
+            -- Keyed by where the growers weighing under a name come from, so same-named sites stay apart
+            CREATE TABLE core.site_names (
+                raw_name TEXT,
+                state_prov TEXT,
+                country TEXT,
+                site_id INTEGER NOT NULL REFERENCES core.sites (site_id),
+                match_type TEXT,
+                confidence_score NUMERIC,
+                PRIMARY KEY (raw_name, state_prov, country)
+            );
+            CREATE OR REPLACE VIEW staging.site_standardization AS
+            SELECT 
+                s.site_id,
+                n.raw_name as original_site,
+                n.state_prov as original_state_prov,
+                n.country as original_country,
+                s.site_name as standardized_site,
+                s.state_prov,
+                s.country,
+                n.match_type,
+                n.confidence_score,
+                s.first_year,
+                s.last_year
+            FROM core.site_names n
+            JOIN core.sites s ON s.site_id = n.site_id;
+            """
+            self.supabase.rpc('execute_sql', {'query': create_sites_sql}).execute()
+            
             # Add indexes for common queries
             indexes_sql = """
             CREATE INDEX IF NOT EXISTS entries_category_year_idx ON core.entries (category, year);
             CREATE INDEX IF NOT EXISTS entries_grower_name_idx ON core.entries (grower_name);
+            CREATE INDEX IF NOT EXISTS entries_grower_id_idx ON core.entries (grower_id);
+            CREATE INDEX IF NOT EXISTS entries_seed_mother_id_idx ON core.entries (seed_mother_id);
+            CREATE INDEX IF NOT EXISTS entries_pollinator_father_id_idx ON core.entries (pollinator_father_id);
             CREATE INDEX IF NOT EXISTS entries_gpc_site_idx ON core.entries (gpc_site);
+            CREATE INDEX IF NOT EXISTS entries_site_id_idx ON core.entries (site_id);
             CREATE INDEX IF NOT EXISTS entries_weight_idx ON core.entries (weight_lbs DESC);
             """
             self.supabase.rpc('execute_sql', {'query': indexes_sql}).execute()
@@ -659,10 +942,7 @@ class GPCPipeline:
         );
         """
         try:
-            self.supabase.rpc('execute_sql', {
-                'query': sql,
-                'params': [original_name, processed_name, confidence, change_type]
-            }).execute()
+            self._execute_sql(sql, [original_name, processed_name, confidence, change_type])
         except Exception as e:
             logger.warning(f"Failed to track name change: {str(e)}")
 
@@ -678,10 +958,7 @@ class GPCPipeline:
         );
         """
         try:
-            self.supabase.rpc('execute_sql', {
-                'query': sql,
-                'params': [entry_id, issue_type, field, original, corrected, confidence]
-            }).execute()
+            self._execute_sql(sql, [entry_id, issue_type, field, original, corrected, confidence])
         except Exception as e:
             logger.warning(f"Failed to track quality issue: {str(e)}")
 
@@ -931,7 +1208,7 @@ class GPCPipeline:
                 CREATE MATERIALIZED VIEW analytics.site_records AS
                 WITH ranked_entries AS (
                     SELECT 
-                        gpc_site,
+                        site_id,
                         category,
                         weight_lbs,
                         grower_name,
@@ -939,16 +1216,27 @@ class GPCPipeline:
                         state_prov,
                         country,
                         ROW_NUMBER() OVER (
-                            PARTITION BY gpc_site, category 
+                            PARTITION BY site_id, category 
                             ORDER BY weight_lbs DESC
                         ) as rank
                     FROM core.entries
                     WHERE entry_type NOT IN ('DMG', 'EXH')
+                    AND site_id IS NOT NULL
                 )
-                SELECT *
-                FROM ranked_entries
-                WHERE rank = 1
-                ORDER BY gpc_site, category;
+                SELECT 
+                    r.site_id,
+                    s.site_name as gpc_site,
+                    r.category,
+                    r.weight_lbs,
+                    r.grower_name,
+                    r.year,
+                    r.state_prov,
+                    r.country,
+                    r.rank
+                FROM ranked_entries r
+                JOIN core.sites s ON s.site_id = r.site_id
+                WHERE r.rank = 1
+                ORDER BY s.site_name, r.category;
                 """
                 self.supabase.rpc('execute_sql', {'query': site_records_sql}).execute()
                 logger.info("Created site_records materialized view")
@@ -968,7 +1256,7 @@ class GPCPipeline:
                         MAX(weight_lbs) as personal_best,
                         COUNT(*) as total_entries,
                         COUNT(DISTINCT year) as years_competed,
-                        COUNT(DISTINCT gpc_site) as sites_competed
+                        COUNT(DISTINCT site_id) as sites_competed
                     FROM core.entries
                     WHERE entry_type NOT IN ('DMG', 'EXH')
                     GROUP BY grower_name, category
@@ -1103,9 +1391,10 @@ class GPCPipeline:
                 DROP MATERIALIZED VIEW IF EXISTS analytics.seed_performance_2024;
                 CREATE MATERIALIZED VIEW analytics.seed_performance_2024 AS
                 WITH parent_performance AS (
-                    -- Calculate historical performance of each parent genetics
+                    -- Calculate historical performance of each parent genetics, keyed on the
+                    -- canonical seed so every spelling of a seed counts toward one lineage
                     SELECT 
-                        seed_mother as seed_name,
+                        seed_mother_id as seed_id,
                         AVG(weight_lbs) as historical_avg_weight,
                         MAX(weight_lbs) as historical_max_weight,
                         AVG(CASE 
@@ -1116,15 +1405,15 @@ class GPCPipeline:
                     FROM core.entries
                     WHERE year < 2024 
                     AND category = 'P'
-                    AND seed_mother != 'Unknown'
+                    AND seed_mother_id IS NOT NULL
                     AND est_weight > 0
-                    GROUP BY seed_mother
+                    GROUP BY seed_mother_id
                     HAVING COUNT(*) >= 3
 
                     UNION ALL
 
                     SELECT 
-                        pollinator_father as seed_name,
+                        pollinator_father_id as seed_id,
                         AVG(weight_lbs) as historical_avg_weight,
                         MAX(weight_lbs) as historical_max_weight,
                         AVG(CASE 
@@ -1135,9 +1424,9 @@ class GPCPipeline:
                     FROM core.entries
                     WHERE year < 2024
                     AND category = 'P'
-                    AND pollinator_father != 'Unknown'
+                    AND pollinator_father_id IS NOT NULL
                     AND est_weight > 0
-                    GROUP BY pollinator_father
+                    GROUP BY pollinator_father_id
                     HAVING COUNT(*) >= 3
                 ),
                 current_year_performance AS (
@@ -1151,21 +1440,23 @@ class GPCPipeline:
                         END as current_pct_over_estimate,
                         e.grower_name,
                         e.gpc_site,
-                        m.seed_name as mother,
+                        ms.seed_name as mother,
                         m.historical_avg_weight as mother_avg_weight,
                         m.historical_max_weight as mother_max_weight,
                         m.historical_pct_over_estimate as mother_pct_over_estimate,
-                        f.seed_name as father,
+                        fs.seed_name as father,
                         f.historical_avg_weight as father_avg_weight,
                         f.historical_max_weight as father_max_weight,
                         f.historical_pct_over_estimate as father_pct_over_estimate
                     FROM core.entries e
-                    LEFT JOIN parent_performance m ON e.seed_mother = m.seed_name
-                    LEFT JOIN parent_performance f ON e.pollinator_father = f.seed_name
+                    LEFT JOIN parent_performance m ON e.seed_mother_id = m.seed_id
+                    LEFT JOIN core.seeds ms ON ms.seed_id = m.seed_id
+                    LEFT JOIN parent_performance f ON e.pollinator_father_id = f.seed_id
+                    LEFT JOIN core.seeds fs ON fs.seed_id = f.seed_id
                     WHERE e.year = 2024
                     AND e.category = 'P'
                     AND e.est_weight > 0
-                    AND (e.seed_mother != 'Unknown' OR e.pollinator_father != 'Unknown')
+                    AND (e.seed_mother_id IS NOT NULL OR e.pollinator_father_id IS NOT NULL)
                 )
                 SELECT 
                     current_weight as weight_lbs,
@@ -1256,21 +1547,9 @@ class GPCPipeline:
 
             -- Lifetime summary
             CREATE MATERIALIZED VIEW analytics.site_entries_summary AS
-            WITH normalized_entries AS (
-                SELECT 
-                    REGEXP_REPLACE(TRIM(gpc_site), '\s+', ' ', 'g') as gpc_site,
-                    COALESCE(NULLIF(state_prov, ''), country) as location,
-                    category,
-                    entry_type,
-                    weight_lbs,
-                    year
-                FROM core.entries
-                WHERE entry_type IS NOT NULL
-            ),
-            category_counts AS (
+            WITH category_counts AS (
                 SELECT 
-                    gpc_site,
-                    location,
+                    site_id,
                     COUNT(CASE WHEN category = 'P' THEN 1 END) as pumpkin_count,
                     COUNT(CASE WHEN category = 'S' THEN 1 END) as squash_count,
                     COUNT(CASE WHEN category = 'L' THEN 1 END) as long_gourd_count,
@@ -1282,13 +1561,16 @@ class GPCPipeline:
                     COUNT(*) as total_entries,
                     MAX(weight_lbs) as heaviest_entry,
                     COUNT(DISTINCT year) as years_active
-                FROM normalized_entries
-                GROUP BY gpc_site, location
+                FROM core.entries
+                WHERE entry_type IS NOT NULL
+                AND site_id IS NOT NULL
+                GROUP BY site_id
             )
             SELECT 
-                ROW_NUMBER() OVER (ORDER BY total_entries DESC, gpc_site) as rank,
-                gpc_site as site,
-                location,
+                ROW_NUMBER() OVER (ORDER BY total_entries DESC, s.site_name) as rank,
+                c.site_id,
+                s.site_name as site,
+                COALESCE(NULLIF(s.state_prov, 'Unknown'), s.country) as location,
                 pumpkin_count as pumpkin,
                 squash_count as squash,
                 long_gourd_count as long_gourd,
@@ -1300,9 +1582,10 @@ class GPCPipeline:
                 total_entries as total,
                 heaviest_entry as heaviest,
                 years_active
-            FROM category_counts
+            FROM category_counts c
+            JOIN core.sites s ON s.site_id = c.site_id
             WHERE total_entries > 0
-            ORDER BY total_entries DESC, gpc_site;
+            ORDER BY total_entries DESC, s.site_name;
 
             -- Create index for better query performance
             CREATE INDEX IF NOT EXISTS idx_site_entries_summary_total 
@@ -1310,10 +1593,9 @@ class GPCPipeline:
 
             -- Yearly analysis with year-over-year changes
             CREATE MATERIALIZED VIEW analytics.yearly_site_analysis AS
-            WITH yearly_stats AS (
+            WITH site_years AS (
                 SELECT 
-                    REGEXP_REPLACE(TRIM(gpc_site), '\s+', ' ', 'g') as gpc_site,
-                    COALESCE(NULLIF(state_prov, ''), country) as location,
+                    site_id,
                     year,
                     COUNT(*) as entries,
                     AVG(weight_lbs) as avg_weight,
@@ -1321,18 +1603,33 @@ class GPCPipeline:
                     COUNT(DISTINCT category) as categories_participated
                 FROM core.entries
                 WHERE entry_type IS NOT NULL
-                GROUP BY gpc_site, COALESCE(NULLIF(state_prov, ''), country), year
+                AND site_id IS NOT NULL
+                GROUP BY site_id, year
+            ),
+            yearly_stats AS (
+                SELECT 
+                    y.site_id,
+                    s.site_name as gpc_site,
+                    COALESCE(NULLIF(s.state_prov, 'Unknown'), s.country) as location,
+                    y.year,
+                    y.entries,
+                    y.avg_weight,
+                    y.max_weight,
+                    y.categories_participated
+                FROM site_years y
+                JOIN core.sites s ON s.site_id = y.site_id
             ),
             year_over_year AS (
                 SELECT 
                     y.*,
-                    LAG(entries) OVER (PARTITION BY gpc_site ORDER BY year) as prev_year_entries,
-                    LAG(avg_weight) OVER (PARTITION BY gpc_site ORDER BY year) as prev_year_avg,
-                    LAG(max_weight) OVER (PARTITION BY gpc_site ORDER BY year) as prev_year_max
+                    LAG(entries) OVER (PARTITION BY site_id ORDER BY year) as prev_year_entries,
+                    LAG(avg_weight) OVER (PARTITION BY site_id ORDER BY year) as prev_year_avg,
+                    LAG(max_weight) OVER (PARTITION BY site_id ORDER BY year) as prev_year_max
                 FROM yearly_stats y
             ),
             site_metrics AS (
                 SELECT 
+                    site_id,
                     gpc_site,
                     location,
                     year,
@@ -1351,8 +1648,8 @@ class GPCPipeline:
                             ROUND(((max_weight - prev_year_max) / prev_year_max * 100)::numeric, 1)
                         ELSE NULL 
                     END as weight_improvement_pct,
-                    AVG(entries) OVER (PARTITION BY gpc_site) as avg_yearly_entries,
-                    STDDEV(entries) OVER (PARTITION BY gpc_site) as stddev_entries
+                    AVG(entries) OVER (PARTITION BY site_id) as avg_yearly_entries,
+                    STDDEV(entries) OVER (PARTITION BY site_id) as stddev_entries
                 FROM year_over_year
             )
             SELECT 
@@ -1380,33 +1677,197 @@ class GPCPipeline:
                 logger.error(f"Error message: {e.message}")
             raise
 
+    def link_growers(self) -> Dict[str, float]:
+        """Give every staged entry a grower_id from record linkage over the full history.
+
+        Each (processed name, state, country) becomes a GrowerProfile with the cities, sites and
+        years it appears with; grower_linkage clusters the profiles and the cluster ids are written
+        back to staging.entries_staging. Returns the linker's blocking and timing stats.
+        """
+        profiles_sql = """
+        SELECT
+            processed_grower_name AS name,
+            COALESCE(state_prov, 'Unknown') AS state_prov,
+            COALESCE(country, 'Unknown') AS country,
+            array_agg(DISTINCT city) FILTER (WHERE city IS NOT NULL AND city <> 'Unknown') AS cities,
+            array_agg(DISTINCT gpc_site) FILTER (WHERE gpc_site IS NOT NULL AND gpc_site <> 'Unknown') AS sites,
+            array_agg(DISTINCT year) AS years
+        FROM staging.entries_staging
+        WHERE processed_grower_name IS NOT NULL
+        GROUP BY 1, 2, 3;
+        """
+        rows = self.supabase.rpc('execute_sql', {'query': profiles_sql}).execute().data or []
+        profiles = [
+            GrowerProfile(row['name'], row['state_prov'], row['country'], frozenset(row['cities'] or ()),
+                          frozenset(row['sites'] or ()), frozenset(row['years'] or ()))
+            for row in rows
+        ]
+        stats = {}
+        ids = list(link_growers(profiles, stats=stats).items())
+
+        update_sql = """
+        UPDATE staging.entries_staging e SET grower_id = m.grower_id
+        FROM unnest($1::text[], $2::text[], $3::text[], $4::text[]) AS m(name, state_prov, country, grower_id)
+        WHERE e.processed_grower_name = m.name
+            AND COALESCE(e.state_prov, 'Unknown') = m.state_prov
+            AND COALESCE(e.country, 'Unknown') = m.country;
+        """
+        for i in range(0, len(ids), GROWER_ID_BATCH):
+            batch = ids[i:i + GROWER_ID_BATCH]
+            self._execute_sql(update_sql, [
+                [key[0] for key, _ in batch], [key[1] for key, _ in batch],
+                [key[2] for key, _ in batch], [grower for _, grower in batch]
+            ])
+
+        growers = len({grower for _, grower in ids})
+        logger.info(f"Linked {len(profiles)} grower profiles into {growers} growers "
+                    f"({stats.get('candidate_pairs', 0)} candidate pairs scored in {stats.get('seconds', 0)}s)")
+        return stats
+
+    def load_seeds(self) -> int:
+        """Fill core.seeds and core.seed_names from every parent name in staging.
+
+        Spellings of one seed ("2009 Wallace", "2009.5 Wallace", "2009 wallace") resolve to one
+        integer seed_id through seed_normalizer, which process_staging_to_core then writes onto
+        each entry. Returns the number of canonical seeds.
+        """
+        names_sql = """
+        SELECT raw_name, COUNT(*) AS entries
+        FROM (
+            SELECT seed_mother AS raw_name FROM staging.entries_staging
+            UNION ALL
+            SELECT pollinator_father FROM staging.entries_staging
+        ) parents
+        WHERE raw_name IS NOT NULL
+        GROUP BY raw_name;
+        """
+        rows = self.supabase.rpc('execute_sql', {'query': names_sql}).execute().data or []
+        index = SeedIndex()
+        ids = list(index.resolve({row['raw_name']: row['entries'] for row in rows}).items())
+
+        seeds_sql = """
+        INSERT INTO core.seeds (seed_id, seed_name, weight_lbs, grower, year)
+        SELECT * FROM unnest($1::int4[], $2::text[], $3::int4[], $4::text[], $5::int4[]);
+        """
+        for i in range(0, len(index.seeds), SEED_BATCH):
+            batch = index.seeds[i:i + SEED_BATCH]
+            self._execute_sql(seeds_sql, [
+                [seed.seed_id for seed in batch], [seed.name for seed in batch],
+                [seed.parsed.weight for seed in batch], [seed.parsed.grower for seed in batch],
+                [seed.parsed.year for seed in batch]
+            ])
+
+        names_insert_sql = """
+        INSERT INTO core.seed_names (raw_name, seed_id)
+        SELECT * FROM unnest($1::text[], $2::int4[]);
+        """
+        for i in range(0, len(ids), SEED_BATCH):
+            batch = ids[i:i + SEED_BATCH]
+            self._execute_sql(names_insert_sql, [[name for name, _ in batch], [seed_id for _, seed_id in batch]])
+
+        logger.info(f"Resolved {len(ids)} seed spellings to {len(index.seeds)} canonical seeds")
+        return len(index.seeds)
+
+    def load_sites(self) -> int:
+        """Fill core.sites and core.site_names by consolidating every site name in staging.
+
+        Each site name is profiled per state and country its growers come from; home_profiles
+        decides which of those locations are sites of their own and folds the rest into them.
+        site_resolver then clusters spelling variants and renames within each state, using the
+        seasons each name ran and the grower_ids weighed there, so link_growers must run first.
+        Returns the number of consolidated sites.
+        """
+        profiles_sql = """
+        SELECT
+            gpc_site AS name,
+            COALESCE(state_prov, 'Unknown') AS state_prov,
+            COALESCE(country, 'Unknown') AS country,
+            array_agg(DISTINCT year) AS years,
+            array_agg(DISTINCT grower_id) FILTER (WHERE grower_id IS NOT NULL) AS growers,
+            COUNT(*) AS entries
+        FROM staging.entries_staging
+        WHERE gpc_site IS NOT NULL AND gpc_site <> 'Unknown'
+        GROUP BY 1, 2, 3;
+        """
+        rows = self.supabase.rpc('execute_sql', {'query': profiles_sql}).execute().data or []
+        profiles = [
+            SiteProfile(row['name'], row['state_prov'], row['country'], frozenset(row['years'] or ()),
+                        frozenset(row['growers'] or ()), row['entries'])
+            for row in rows
+        ]
+        homes = home_profiles(profiles)
+        sites = SiteResolver({id(home): home for home in homes.values()}.values()).sites()
+        site_of = {id(profile): site for site in sites for profile in site.members}
+
+        sites_sql = """
+        INSERT INTO core.sites (site_id, site_name, state_prov, country, first_year, last_year)
+        SELECT * FROM unnest($1::int4[], $2::text[], $3::text[], $4::text[], $5::int4[], $6::int4[]);
+        """
+        for i in range(0, len(sites), SITE_BATCH):
+            batch = sites[i:i + SITE_BATCH]
+            self._execute_sql(sites_sql, [
+                [site.site_id for site in batch], [site.name for site in batch],
+                [site.state for site in batch], [site.country for site in batch],
+                [site.first_year for site in batch], [site.last_year for site in batch]
+            ])
+
+        names = [(*key, site_of[id(home)].site_id, *match_type(site_of[id(home)], home))
+                 for key, home in homes.items() if id(home) in site_of]
+        names_insert_sql = """
+        INSERT INTO core.site_names (raw_name, state_prov, country, site_id, match_type, confidence_score)
+        SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::int4[], $5::text[], $6::numeric[]);
+        """
+        for i in range(0, len(names), SITE_BATCH):
+            batch = names[i:i + SITE_BATCH]
+            self._execute_sql(names_insert_sql, [list(column) for column in zip(*batch)])
+
+        renames = sum(1 for *_, kind, _ in names if kind == 'RENAME')
+        logger.info(f"Consolidated {len(names)} site names into {len(sites)} sites ({renames} renames)")
+        return len(sites)
+
     def process_staging_to_core(self) -> None:
         """Process data from staging to core tables."""
         try:
+            # Resolve grower, seed and site identities across the full history before copying to core.
+            # Sites use the grower ids, so growers are linked first
+            self.link_growers()
+            self.load_seeds()
+            self.load_sites()
+            
             # Insert from staging to core
             insert_sql = """
             INSERT INTO core.entries (
-                category, year, place, weight_lbs, grower_name, original_grower_name,
+                category, year, place, weight_lbs, grower_name, grower_id, original_grower_name,
                 city, state_prov, country, gpc_site, seed_mother, pollinator_father,
-                ott, est_weight, entry_type
+                seed_mother_id, pollinator_father_id, site_id, ott, est_weight, entry_type
             )
             SELECT 
-                category,
-                year,
-                place,
-                weight_lbs,
-                processed_grower_name as grower_name,
-                original_grower_name,
-                city,
-                state_prov,
-                country,
-                gpc_site,
-                seed_mother,
-                pollinator_father,
-                ott,
-                est_weight,
-                entry_type
-            FROM staging.entries_staging;
+                s.category,
+                s.year,
+                s.place,
+                s.weight_lbs,
+                s.processed_grower_name as grower_name,
+                s.grower_id,
+                s.original_grower_name,
+                s.city,
+                s.state_prov,
+                s.country,
+                s.gpc_site,
+                s.seed_mother,
+                s.pollinator_father,
+                m.seed_id as seed_mother_id,
+                f.seed_id as pollinator_father_id,
+                n.site_id,
+                s.ott,
+                s.est_weight,
+                s.entry_type
+            FROM staging.entries_staging s
+            LEFT JOIN core.seed_names m ON m.raw_name = s.seed_mother
+            LEFT JOIN core.seed_names f ON f.raw_name = s.pollinator_father
+            LEFT JOIN core.site_names n
+                ON n.raw_name = s.gpc_site
+                AND n.state_prov = COALESCE(s.state_prov, 'Unknown')
+                AND n.country = COALESCE(s.country, 'Unknown');
             """
             self.supabase.rpc('execute_sql', {'query': insert_sql}).execute()
             logger.info("Successfully processed staging data to core.entries table")
@@ -1484,8 +1945,26 @@ class GPCPipeline:
                 logger.error(f"Error message: {e.message}")
             raise
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process raw GPC results into staging and core tables")
+    parser.add_argument("--replay-dead-letters", metavar="PATH",
+                        help="Retry the rows in a failed_records_*.jsonl file instead of running the pipeline")
+    parser.add_argument("--insert-workers", type=int, default=4, help="Insert batches kept in flight at once")
+    parser.add_argument("--no-name-cache", action="store_true",
+                        help="Resolve every grower name from scratch instead of reusing earlier runs")
+    parser.add_argument("--match-workers", type=int, default=None,
+                        help="Processes used to fuzzy match states in parallel (default: one per CPU)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep cached name clusters fixed and only place new names among them")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep existing staging data and skip category/years already in the run journal")
+    return parser.parse_args()
+
 def main():
     """Main execution function with improved error handling."""
+    args = parse_args()
+    if args.incremental and args.no_name_cache:
+        sys.exit("--incremental needs the name cache")
     load_dotenv()
     
     # Validate environment variables
@@ -1497,10 +1976,28 @@ def main():
 
     try:
         supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-        pipeline = GPCPipeline(supabase)
+        copy_loader = CopyLoader.from_env(max_connections=args.insert_workers)
+        if copy_loader is not None:
+            logger.info(f"Bulk loading with COPY ({copy_loader.copy_format}) over a direct database connection")
         
-        # Ensure staging tables exist
-        pipeline._ensure_staging_tables()
+        name_cache = None if args.no_name_cache else NameResolutionCache(NAME_RULES_VERSION)
+        
+        if args.replay_dead_letters:
+            # Replays insert into the existing staging tables, so they must not be reset
+            pipeline = GPCPipeline(supabase, copy_loader=copy_loader, reset_staging=False,
+                                   insert_workers=args.insert_workers)
+            pipeline.replay_dead_letters(args.replay_dead_letters)
+            pipeline.close()
+            return
+        
+        pipeline = GPCPipeline(supabase, copy_loader=copy_loader, reset_staging=not args.resume,
+                               insert_workers=args.insert_workers, name_cache=name_cache,
+                               incremental=args.incremental, match_workers=args.match_workers)
+        
+        if args.resume:
+            # Keep what earlier runs loaded; upserts make redoing a half-finished unit safe
+            pipeline._ensure_staging_tables(reset=False)
+            pipeline.load_journal()
         
         # Define categories and years
         categories = ["P", "S", "L", "W", "T", "F", "B", "M"]
@@ -1534,6 +2031,18 @@ def main():
             logger.error("Skipping core table processing due to staging errors")
             sys.exit(1)
 
+        inserted = sum(t['inserted'] for stats in pipeline.load_stats.values() for t in stats.values())
+        failed = sum(t['failed'] for stats in pipeline.load_stats.values() for t in stats.values())
+        logger.info(f"Loaded {inserted} staging records across {len(pipeline.load_stats)} category/years, "
+                    f"{failed} dead-lettered to {pipeline.dead_letter_path}, "
+                    f"{len(pipeline.skipped_units)} skipped as already loaded")
+        if name_cache is not None:
+            logger.info(f"Name cache holds {len(name_cache)} resolutions (rules {NAME_RULES_VERSION})")
+            name_cache.close()
+        for name, planner in pipeline.batch_planners.items():
+            logger.info(f"Batch sizes for {name}: {planner.summary()}")
+        pipeline.close()
+
     except Exception as e:
         logger.error(f"Critical error in ETL pipeline: {str(e)}")
         sys.exit(1)
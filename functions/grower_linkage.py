@@ -0,0 +1,208 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from rapidfuzz import fuzz
+from rapidfuzz.utils import default_process
+
+from name_matching import DisjointSet, soundex, token_sort_key
+from name_normalizer import split_name
+
+ProfileKey = Tuple[str, str, str]  # (processed grower name, state/province, country)
+
+LINK_THRESHOLD = 0.8
+MIN_LAST_NAME_SIMILARITY = 0.8
+MIN_FIRST_NAME_SIMILARITY = 0.85
+MAX_COUNTRY_BLOCK = 500  # country-wide blocks bigger than this are left to the state-scoped keys
+YEAR_GAP_DECAY = 10  # years between active spans at which the history signal reaches zero
+
+# Short and alternate given names, compared as the name they stand for
+FIRST_NAME_ALIASES = {
+    "andy": "andrew", "ben": "benjamin", "beni": "benjamin", "benny": "benjamin", "bill": "william",
+    "bob": "robert", "chris": "christopher", "dan": "daniel", "dave": "david", "dick": "richard",
+    "don": "donald", "doug": "douglas", "ed": "edward", "greg": "gregory", "jim": "james", "jimmy": "james",
+    "joe": "joseph", "jon": "john", "ken": "kenneth", "larry": "lawrence", "matt": "matthew",
+    "mike": "michael", "pat": "patrick", "pete": "peter", "rick": "richard", "rob": "robert", "ron": "ronald",
+    "sam": "samuel", "stephen": "steven", "steve": "steven", "sue": "susan", "ted": "theodore",
+    "tim": "timothy", "tom": "thomas", "tony": "anthony", "will": "william"
+}
+
+# Share of the link score carried by each attribute
+WEIGHTS = {"name": 0.6, "location": 0.2, "sites": 0.1, "cities": 0.05, "years": 0.05}
+
+@dataclass
+class GrowerProfile:
+    """Everything known about one (name, state, country) across the full results history."""
+    name: str
+    state: str
+    country: str
+    cities: FrozenSet[str] = frozenset()
+    sites: FrozenSet[str] = frozenset()
+    years: FrozenSet[int] = frozenset()
+    entries: int = 1
+    full: str = field(init=False)
+    last: str = field(init=False)
+    first: str = field(init=False)
+
+    def __post_init__(self):
+        last, first = split_name(self.name)
+        self.full = token_sort_key(self.name)
+        self.last = token_sort_key(last)
+        # Word order matters here ("Ron And Jean" still starts with Ron), so the tokens aren't sorted;
+        # like token_sort_key, a name with nothing ASCII in it keeps its own characters
+        tokens = (default_process(first.encode("ascii", "ignore").decode()).split()
+                  or default_process(first).split())
+        if tokens:
+            tokens[0] = FIRST_NAME_ALIASES.get(tokens[0], tokens[0])
+        self.first = " ".join(tokens)
+
+    @property
+    def key(self) -> ProfileKey:
+        return self.name, self.state, self.country
+
+def grower_id(anchor: ProfileKey) -> str:
+    """Stable id of the cluster anchored at ``anchor``."""
+    return hashlib.sha1("|".join(anchor).encode("utf-8")).hexdigest()[:16]
+
+def jaccard(a: FrozenSet, b: FrozenSet) -> Optional[float]:
+    """Overlap of two attribute sets, or None when either is unknown."""
+    if not a or not b:
+        return None
+    return len(a & b) / len(a | b)
+
+def first_name_similarity(a: str, b: str) -> float:
+    """1.0 for equal first names, nicknames that prefix the full name (Steve/Steven) and couples."""
+    if not a or not b:
+        return 1.0 if a == b else 0.7
+    if a.startswith(b) or b.startswith(a):
+        return 1.0
+    return fuzz.ratio(a, b) / 100
+
+def years_similarity(a: FrozenSet[int], b: FrozenSet[int]) -> Optional[float]:
+    """1.0 when the active spans overlap or touch, fading to 0 as the gap between them grows."""
+    if not a or not b:
+        return None
+    gap = max(min(a) - max(b), min(b) - max(a), 0)
+    return max(0.0, 1 - max(gap - 1, 0) / YEAR_GAP_DECAY)
+
+def link_score(a: GrowerProfile, b: GrowerProfile) -> float:
+    """Weighted similarity of two profiles in [0, 1]; 0 when the names rule a match out.
+
+    A name with no letters or digits left after normalization (an empty key) matches nothing.
+    Attributes unknown on either side (no cities, sites or years) drop out and the remaining
+    weights are rescaled, so missing history neither helps nor hurts a pair.
+    """
+    if not a.full or not b.full:
+        return 0.0
+    if a.full == b.full:
+        # Same words in another order, e.g. a first and last name parsed the wrong way round
+        last = first = 1.0
+    elif not a.last or not b.last:
+        return 0.0
+    else:
+        last = fuzz.ratio(a.last, b.last) / 100
+        first = first_name_similarity(a.first, b.first)
+    if last < MIN_LAST_NAME_SIMILARITY or first < MIN_FIRST_NAME_SIMILARITY:
+        return 0.0
+    sites = jaccard(a.sites, b.sites)
+    if a.state != b.state and sites is None:
+        # Nothing but the name connects growers in different states
+        return 0.0
+    if a.country != b.country:
+        location = 0.0
+    else:
+        location = 1.0 if a.state == b.state else 0.3
+    signals = {
+        "name": 0.6 * last + 0.4 * first,
+        "location": location,
+        "sites": sites,
+        "cities": jaccard(a.cities, b.cities),
+        "years": years_similarity(a.years, b.years)
+    }
+    known = {name: value for name, value in signals.items() if value is not None}
+    return sum(WEIGHTS[name] * value for name, value in known.items()) / sum(WEIGHTS[name] for name in known)
+
+class GrowerLinker:
+    """Record linkage of grower profiles on name, location, site history and active years.
+
+    Candidate pairs come from location-aware blocking keys: the Soundex of the last name plus the
+    first initial within the country (for blocks up to ``MAX_COUNTRY_BLOCK``), the first and last
+    three letters of the last name within the state, which catch typos that change the Soundex,
+    and the token-sorted full name within the state, which catches names parsed in the wrong
+    order. Keys built from an empty name part are left out, so names without letters don't all
+    share a block. Only pairs sharing a block are scored, and pairs scoring at least ``threshold``
+    are merged with union-find.
+    """
+
+    def __init__(self, profiles: Iterable[GrowerProfile], threshold: float = LINK_THRESHOLD):
+        self.profiles = list(profiles)
+        self.threshold = threshold
+        self.blocks: Dict[str, List[int]] = {}
+        for i, profile in enumerate(self.profiles):
+            for key in self.blocking_keys(profile):
+                self.blocks.setdefault(key, []).append(i)
+        self.stats: Dict[str, float] = {}
+
+    @staticmethod
+    def blocking_keys(profile: GrowerProfile) -> List[str]:
+        last = profile.last.replace(" ", "")
+        keys = []
+        # Soundex only codes Latin letters; without a code the key would be shared country-wide
+        if soundex(last):
+            keys.append(f"c:{profile.country}:{soundex(last)}:{profile.first[:1]}")
+        if profile.full:
+            keys.append(f"n:{profile.state}:{profile.full}")
+        if last:
+            keys += [f"s:{profile.state}:{last[:3]}", f"e:{profile.state}:{last[-3:]}"]
+        return keys
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        pairs = set()
+        for key, members in self.blocks.items():
+            if key.startswith("c:") and len(members) > MAX_COUNTRY_BLOCK:
+                continue
+            pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+        return pairs
+
+    def clusters(self) -> List[List[GrowerProfile]]:
+        """Profiles grouped by the grower they belong to."""
+        start = time.perf_counter()
+        candidates = self.candidate_pairs()
+        linked = DisjointSet()
+        for i in range(len(self.profiles)):
+            linked.find(i)
+        links = 0
+        for a, b in candidates:
+            if link_score(self.profiles[a], self.profiles[b]) >= self.threshold:
+                linked.union(a, b)
+                links += 1
+        total_pairs = len(self.profiles) * (len(self.profiles) - 1) // 2
+        self.stats = {
+            "profiles": len(self.profiles), "candidate_pairs": len(candidates), "links": links,
+            "comparisons_avoided": round(1 - len(candidates) / total_pairs, 5) if total_pairs else 0.0,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        return [[self.profiles[i] for i in members] for members in linked.groups().values()]
+
+    def grower_ids(self) -> Dict[ProfileKey, str]:
+        """Stable grower id for every profile.
+
+        A cluster's id is derived from its earliest-active profile, so seasons added later keep
+        the ids of the growers they join; only a merge of two existing clusters retires one id.
+        """
+        ids = {}
+        for members in self.clusters():
+            anchor = min(members, key=lambda p: (min(p.years) if p.years else 9999, p.key))
+            cluster = grower_id(anchor.key)
+            ids.update({profile.key: cluster for profile in members})
+        return ids
+
+def link_growers(profiles: Iterable[GrowerProfile], threshold: float = LINK_THRESHOLD,
+                 stats: Optional[Dict[str, float]] = None) -> Dict[ProfileKey, str]:
+    """Grower id for each profile; pass a dict as ``stats`` to get the blocking and timing numbers."""
+    linker = GrowerLinker(profiles, threshold)
+    ids = linker.grower_ids()
+    if stats is not None:
+        stats.update(linker.stats)
+    return ids
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from rapidfuzz import fuzz
+
+from name_matching import token_sort_key
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "NAME_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".name_cache", "names.sqlite3")
+)
+
+NameKey = Tuple[str, str]  # (raw grower name, state/province)
+
+def cluster_id(canonical_name: str) -> str:
+    """Stable id for every raw name that resolves to the same canonical name."""
+    return hashlib.sha1(canonical_name.encode("utf-8")).hexdigest()[:16]
+
+@dataclass
+class Resolution:
+    canonical_name: str
+    cluster_id: str
+    score: float
+
+class NameResolutionCache:
+    """On-disk map from (raw grower name, state) to its resolved canonical name.
+
+    Entries are scoped by ``rules_version``. Bump the version whenever the normalization or
+    matching rules change; entries written under other versions are ignored (and can be pruned),
+    so every name is resolved again under the new rules.
+    """
+
+    def __init__(self, rules_version: str, path: str = DEFAULT_CACHE_PATH):
+        self.rules_version = rules_version
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS resolutions (
+                rules_version TEXT NOT NULL,
+                raw_name TEXT NOT NULL,
+                state TEXT NOT NULL,
+                canonical_name TEXT NOT NULL,
+                cluster_id TEXT NOT NULL,
+                score REAL NOT NULL,
+                resolved_at REAL NOT NULL,
+                PRIMARY KEY (rules_version, raw_name, state)
+            )
+        """)
+        self._db.commit()
+        # Names repeat across every category and year of a run, so the current version is kept in memory
+        self._resolutions: Dict[NameKey, Resolution] = {
+            (raw, state): Resolution(canonical, cluster, score)
+            for raw, state, canonical, cluster, score in self._db.execute(
+                "SELECT raw_name, state, canonical_name, cluster_id, score FROM resolutions WHERE rules_version = ?",
+                (rules_version,)
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self._resolutions)
+
+    def canonical_names(self) -> Dict[str, Counter]:
+        """Canonical names under the current rules per state, with how many raw names resolve to each."""
+        names: Dict[str, Counter] = {}
+        for (_, state), resolution in self._resolutions.items():
+            names.setdefault(state, Counter())[resolution.canonical_name] += 1
+        return names
+
+    def close(self) -> None:
+        """Close the database."""
+        self._db.close()
+
+    def lookup(self, keys: Iterable[NameKey]) -> Dict[NameKey, Resolution]:
+        """Resolutions recorded under the current rules for any of the given keys."""
+        found = {}
+        for raw, state in keys:
+            key = (str(raw), str(state))
+            if key in self._resolutions:
+                found[key] = self._resolutions[key]
+        return found
+
+    def store(self, resolutions: Dict[NameKey, Tuple[str, float]]) -> None:
+        """Record (canonical name, match score) for each key, replacing earlier resolutions."""
+        now = time.time()
+        for (raw, state), (canonical, score) in resolutions.items():
+            self._resolutions[(str(raw), str(state))] = Resolution(canonical, cluster_id(canonical), float(score))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO resolutions "
+            "(rules_version, raw_name, state, canonical_name, cluster_id, score, resolved_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (self.rules_version, str(raw), str(state), canonical, cluster_id(canonical), float(score), now)
+                for (raw, state), (canonical, score) in resolutions.items()
+            ]
+        )
+        self._db.commit()
+
+    def prune(self) -> int:
+        """Delete entries written under other rules versions; returns how many were removed."""
+        cursor = self._db.execute("DELETE FROM resolutions WHERE rules_version != ?", (self.rules_version,))
+        self._db.commit()
+        return cursor.rowcount
+
+def changed_resolutions(keys: Iterable[NameKey], normalized: Iterable[str], final: Iterable[str],
+                        cached: Dict[NameKey, Resolution],
+                        scores: Optional[Dict[str, float]] = None) -> Dict[NameKey, Tuple[str, float]]:
+    """Resolutions worth storing: keys never resolved before, or whose canonical name changed.
+
+    ``normalized`` is each row's name before fuzzy matching and ``final`` after it. The match score
+    comes from ``scores`` (keyed by normalized name) when given, else it is recomputed.
+    """
+    resolutions = {}
+    for key, before, after in zip(keys, normalized, final):
+        if key in cached and cached[key].canonical_name == after:
+            continue
+        if scores is not None and before in scores:
+            score = scores[before]
+        elif before == after:
+            score = 100.0
+        else:
+            score = fuzz.ratio(token_sort_key(before), token_sort_key(after))
+        resolutions[key] = (after, score)
+    return resolutions
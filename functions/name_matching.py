@@ -0,0 +1,416 @@
+import argparse
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# Cap on scores held at once: one block of rows against every candidate, as float32
+MAX_BLOCK_CELLS = 16_000_000
+
+def token_sort_key(name: str) -> str:
+    """Normalize a name the way fuzzywuzzy's token_sort_ratio does before comparing.
+
+    Non-ASCII characters are dropped, everything else that isn't a letter or digit becomes a space,
+    and the lowercased tokens are sorted. token_sort_ratio is then a plain ratio of two keys, so
+    each name is normalized once instead of once per pair. A name with no ASCII letters or digits
+    keeps its own characters rather than collapsing to an empty key; the key is empty only when the
+    name has no letters or digits at all, and the matchers below never match empty keys.
+    """
+    ascii_name = str(name).encode("ascii", "ignore").decode()
+    key = default_process(ascii_name)
+    if not key.strip():
+        key = default_process(str(name))
+    return " ".join(sorted(key.split()))
+
+def iter_fuzzy_matches(names: Sequence[str], threshold: int = 80, symmetric: bool = False,
+                       workers: int = -1) -> Iterator[Tuple[int, int, float]]:
+    """Yield (i, j, score) for every pair of names scoring above ``threshold``.
+
+    Scores match fuzzywuzzy's token_sort_ratio, rounded the same way before the ``> threshold``
+    test. Names are scored a block of rows at a time with rapidfuzz.process.cdist on ``workers``
+    threads, so only one block of the score matrix exists at a time. Without ``symmetric`` only
+    pairs with j > i are produced, as in the pairwise token_sort_ratio loop it replaces; with it both
+    directions are. Names with an empty key match nothing (rapidfuzz would score two empty keys 100).
+    """
+    keys = [token_sort_key(name) for name in names]
+    # Positions of the names that have a key; scores are computed over these and mapped back
+    positions = [i for i, key in enumerate(keys) if key]
+    keys = [keys[i] for i in positions]
+    n = len(keys)
+    if n < 2:
+        return
+    block_rows = max(1, MAX_BLOCK_CELLS // n)
+    # Anything that could round to above the threshold; the exact test is applied afterwards
+    score_cutoff = threshold + 0.5
+
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        offset = 0 if symmetric else start
+        scores = process.cdist(keys[start:stop], keys[offset:], scorer=fuzz.ratio, processor=None,
+                               score_cutoff=score_cutoff, dtype=np.float32, workers=workers)
+        rows, cols = np.nonzero(np.round(scores) > threshold)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            i, j = start + row, offset + col
+            if j != i and (symmetric or j > i):
+                yield positions[i], positions[j], float(scores[row, col])
+
+def cdist_fuzzy_matching(names: List[str], threshold: int = 80, symmetric: bool = False,
+                         workers: int = -1) -> Dict[str, List[str]]:
+    """Pairwise token_sort_ratio matching built on iter_fuzzy_matches.
+
+    Returns the same matches_dict: each name maps to the names after it (or, with ``symmetric``,
+    all other names) that score above ``threshold``, in list order.
+    """
+    matches_dict = {}
+    for i, j, _ in iter_fuzzy_matches(names, threshold, symmetric, workers):
+        matches_dict.setdefault(names[i], []).append(names[j])
+    return matches_dict
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"), **dict.fromkeys("CGJKQSXZ", "2"), **dict.fromkeys("DT", "3"),
+    "L": "4", **dict.fromkeys("MN", "5"), "R": "6"
+}
+RARE_NGRAMS = 3  # n-gram buckets per name, rarest first
+CDIST_MIN_BUCKET = 32  # buckets at least this big are scored with one cdist call
+MAX_TOKEN_BUCKET = 200  # tokens shared by more names than this (common first names) aren't a useful block
+NGRAM_SIZE = 3
+INDEX_CANDIDATES = 64  # indexed names sharing the most n-grams with a query that are actually scored
+
+def soundex(word: str) -> str:
+    """American Soundex code of a word, e.g. Smith and Smyth -> S530."""
+    letters = [c for c in str(word).upper() if "A" <= c <= "Z"]
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+        # H and W don't separate letters with the same code; vowels do
+        if letter not in "HW":
+            previous = digit
+    return (code + "000")[:4]
+
+def phonetic_key(name: str) -> str:
+    """Soundex of the last name plus the first initial ("Last, First" names, or the last word otherwise)."""
+    if "," in name:
+        last, first = name.split(",", 1)
+    else:
+        parts = name.split()
+        last, first = (parts[-1], " ".join(parts[:-1])) if parts else ("", "")
+    first = first.strip()
+    return f"{soundex(last)}:{first[:1].upper()}"
+
+def ngrams(key: str, size: int = NGRAM_SIZE) -> List[str]:
+    padded = f" {key} "
+    return sorted({padded[i:i + size] for i in range(max(1, len(padded) - size + 1))})
+
+class BlockingIndex:
+    """Candidate generation for fuzzy name matching without comparing every pair.
+
+    Names are grouped by their token-sorted canonical key first; names sharing a key are exact
+    matches and merge by hash join. One representative per key is then bucketed by a phonetic key
+    (Soundex of the last name plus first initial), by each of its tokens that isn't too common, and
+    by its rarest character n-grams; only pairs that share a bucket are scored. Names whose key is
+    empty are left out of every group and bucket, so they match nothing.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self.keys = [token_sort_key(name) for name in self.names]
+        self.groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(self.keys):
+            if key:
+                self.groups.setdefault(key, []).append(i)
+        self.group_keys = list(self.groups)
+
+        group_ngrams = [ngrams(key) for key in self.group_keys]
+        group_tokens = [sorted(set(key.split())) for key in self.group_keys]
+        ngram_frequency = Counter(gram for grams in group_ngrams for gram in grams)
+        token_frequency = Counter(token for tokens in group_tokens for token in tokens)
+
+        self.buckets: Dict[str, List[int]] = {}
+        for g, key in enumerate(self.group_keys):
+            representative = self.names[self.groups[key][0]]
+            rare = sorted(group_ngrams[g], key=lambda gram: (ngram_frequency[gram], gram))[:RARE_NGRAMS]
+            blocking_keys = [f"p:{phonetic_key(representative)}"]
+            blocking_keys += [f"t:{token}" for token in group_tokens[g] if token_frequency[token] <= MAX_TOKEN_BUCKET]
+            blocking_keys += [f"g:{gram}" for gram in rare]
+            for bucket in blocking_keys:
+                self.buckets.setdefault(bucket, []).append(g)
+
+    def candidate_pairs(self) -> int:
+        """Number of pairs the buckets send to scoring (a pair sharing two buckets counts twice)."""
+        return sum(len(members) * (len(members) - 1) // 2 for members in self.buckets.values())
+
+    def matching_groups(self, threshold: int, workers: int = -1) -> set:
+        """Pairs of group ids (a < b) that share a bucket and score above ``threshold``."""
+        score_cutoff = threshold + 0.5
+        matched = set()
+        small_pairs = set()
+        for members in self.buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) < CDIST_MIN_BUCKET:
+                small_pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+                continue
+            # Large buckets are scored as a block in native code; members are in ascending order
+            keys = [self.group_keys[g] for g in members]
+            scores = process.cdist(keys, keys, scorer=fuzz.ratio, processor=None, score_cutoff=score_cutoff,
+                                   dtype=np.float32, workers=workers)
+            rows, cols = np.nonzero(np.round(scores) > threshold)
+            matched.update((members[r], members[c]) for r, c in zip(rows.tolist(), cols.tolist()) if r < c)
+
+        for a, b in small_pairs - matched:
+            score = fuzz.ratio(self.group_keys[a], self.group_keys[b], score_cutoff=score_cutoff)
+            if round(score) > threshold:
+                matched.add((a, b))
+        return matched
+
+    def matches(self, threshold: int = 90, workers: int = -1) -> Dict[str, List[str]]:
+        """matches_dict in the same shape as cdist_fuzzy_matching (later names, in list order)."""
+        pairs = set()
+        # Hash join: every name sharing a canonical key is an exact match
+        for members in self.groups.values():
+            pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+        for a, b in self.matching_groups(threshold, workers):
+            for i in self.groups[self.group_keys[a]]:
+                for j in self.groups[self.group_keys[b]]:
+                    pairs.add((min(i, j), max(i, j)))
+
+        matches_dict = {}
+        for i, j in sorted(pairs):
+            matches_dict.setdefault(self.names[i], []).append(self.names[j])
+        return matches_dict
+
+def blocked_fuzzy_matching(names: List[str], threshold: int = 90, workers: int = -1) -> Dict[str, List[str]]:
+    """Blocked counterpart of cdist_fuzzy_matching for large name lists."""
+    return BlockingIndex(names).matches(threshold, workers)
+
+def blocking_recall_report(names: List[str], threshold: int = 90, workers: int = -1) -> Dict[str, Any]:
+    """Compare the blocked matcher with the brute-force one: pairs found, pairs missed, timings."""
+    start = time.perf_counter()
+    brute = cdist_fuzzy_matching(names, threshold, workers=workers)
+    brute_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = BlockingIndex(names)
+    candidates = index.candidate_pairs()
+    blocked = index.matches(threshold, workers)
+    blocked_seconds = time.perf_counter() - start
+
+    brute_pairs = {(a, b) for a, matches in brute.items() for b in matches}
+    blocked_pairs = {(a, b) for a, matches in blocked.items() for b in matches}
+    missed = sorted(brute_pairs - blocked_pairs)
+    total_pairs = len(names) * (len(names) - 1) // 2
+    return {
+        "names": len(names),
+        "threshold": threshold,
+        "brute_force_pairs": len(brute_pairs),
+        "blocked_pairs": len(blocked_pairs),
+        "missed_pairs": len(missed),
+        "recall": round(1 - len(missed) / len(brute_pairs), 5) if brute_pairs else 1.0,
+        "extra_pairs": len(blocked_pairs - brute_pairs),
+        "candidate_pairs": candidates,
+        "comparisons_avoided": round(1 - candidates / total_pairs, 5) if total_pairs else 0.0,
+        "brute_force_seconds": round(brute_seconds, 3),
+        "blocked_seconds": round(blocked_seconds, 3),
+        "missed_examples": missed[:20]
+    }
+
+class DisjointSet:
+    """Union-find over hashable items, with union by size and path halving."""
+
+    def __init__(self):
+        self.parent: Dict[Hashable, Hashable] = {}
+        self.size: Dict[Hashable, int] = {}
+
+    def find(self, item: Hashable) -> Hashable:
+        parent = self.parent
+        if item not in parent:
+            parent[item] = item
+            self.size[item] = 1
+            return item
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: Hashable, b: Hashable) -> Hashable:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        """Members of every set, keyed by its root."""
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return groups
+
+def match_pairs(matches_dict: Dict[str, List[str]]) -> Iterator[Tuple[str, str]]:
+    """Flatten a matches_dict into (name, match) pairs."""
+    for name, matches in matches_dict.items():
+        for match in matches:
+            yield name, match
+
+def resolve_clusters(pairs: Iterable[Tuple[str, str]], counts: Mapping[str, int]) -> Dict[str, str]:
+    """Map every matched name to the canonical name of its cluster.
+
+    Matched pairs are first merged transitively into connected groups. Transitive merging alone
+    chains names that were never matched to each other (Gary -> Garry -> Larry Miller), so each
+    group is then split around canonical names: members are taken most frequent first by
+    ``counts`` (ties to the lexicographically smallest), and each joins the most frequent canonical
+    name it was matched to directly, or becomes a canonical name itself when it has none. Every
+    name therefore resolves to a name it actually matched, and the result doesn't depend on the
+    order pairs arrive in.
+    """
+    clusters = DisjointSet()
+    linked: Dict[str, set] = {}
+    for a, b in pairs:
+        clusters.union(a, b)
+        linked.setdefault(a, set()).add(b)
+        linked.setdefault(b, set()).add(a)
+    canonical = {}
+    for members in clusters.groups().values():
+        centers = []
+        for member in sorted(members, key=lambda member: (-counts.get(member, 0), member)):
+            center = next((center for center in centers if center in linked[member]), None)
+            if center is None:
+                centers.append(member)
+                center = member
+            canonical[member] = center
+    return canonical
+
+def apply_clusters(names: pd.Series, canonical: Mapping[str, str]) -> pd.Series:
+    """Replace every clustered name with its canonical name in one pass; other names are kept."""
+    mapped = names.map(canonical)
+    return mapped.where(mapped.notna(), names)
+
+class NgramIndex:
+    """Inverted index from character n-grams to names, for nearest-name lookups.
+
+    A query only scores the ``INDEX_CANDIDATES`` indexed names sharing the most n-grams with it,
+    found through the postings of its own n-grams rather than a scan of every name.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.keys: List[str] = []
+        self.exact: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str) -> None:
+        key = token_sort_key(name)
+        if not key or key in self.exact:
+            return
+        i = len(self.names)
+        self.names.append(name)
+        self.keys.append(key)
+        self.exact[key] = i
+        for gram in ngrams(key):
+            self.postings.setdefault(gram, []).append(i)
+
+    def best_match(self, name: str, threshold: int) -> Optional[Tuple[str, float]]:
+        """Indexed name most similar to ``name`` scoring above ``threshold``, with its score."""
+        key = token_sort_key(name)
+        if not key:
+            return None
+        if key in self.exact:
+            return self.names[self.exact[key]], 100.0
+        shared = Counter(i for gram in ngrams(key) for i in self.postings.get(gram, ()))
+        if not shared:
+            return None
+        candidates = [i for i, _ in shared.most_common(INDEX_CANDIDATES)]
+        result = process.extractOne(key, [self.keys[i] for i in candidates], scorer=fuzz.ratio, processor=None,
+                                    score_cutoff=threshold + 0.5)
+        if result is None or round(result[1]) <= threshold:
+            return None
+        return self.names[candidates[result[2]]], float(result[1])
+
+class CanonicalNameIndex:
+    """Canonical grower names partitioned by state, for placing new names without re-clustering.
+
+    Built from the canonical names an earlier run resolved (see NameResolutionCache), so the
+    historical clusters stay frozen: new names either join the best indexed cluster in their state
+    (or, with a cross-state threshold, in any state) or start clusters of their own.
+    """
+
+    def __init__(self, names_by_state: Mapping[str, Mapping[str, int]]):
+        self.partitions: Dict[str, NgramIndex] = {}
+        self.all_states = NgramIndex()
+        for state, counts in names_by_state.items():
+            # Most frequent first, so an exact key match lands on the most used spelling
+            for name in sorted(counts, key=lambda name: (-counts[name], name)):
+                self.add(name, state)
+
+    @classmethod
+    def from_cache(cls, name_cache) -> "CanonicalNameIndex":
+        return cls(name_cache.canonical_names())
+
+    def __len__(self) -> int:
+        return len(self.all_states)
+
+    def add(self, name: str, state: str) -> None:
+        self.partitions.setdefault(state, NgramIndex()).add(name)
+        self.all_states.add(name)
+
+    def best_match(self, name: str, state: Optional[str], threshold: int) -> Optional[Tuple[str, float]]:
+        """Best indexed match in ``state``, or across all states when ``state`` is None."""
+        index = self.all_states if state is None else self.partitions.get(state)
+        return index.best_match(name, threshold) if index is not None else None
+
+    def resolve(self, keys: Iterable[Tuple[str, str]], threshold: int, counts: Mapping[str, int],
+                cross_state_threshold: Optional[int] = None) -> Dict[Tuple[str, str], Tuple[str, float]]:
+        """Canonical name and match score for each new (normalized name, state).
+
+        Names without an indexed match are clustered among themselves per state with
+        resolve_clusters (by ``counts``); each of those clusters becomes a new canonical name and is
+        added to the index.
+        """
+        resolved = {}
+        unmatched: Dict[str, List[str]] = {}
+        for name, state in dict.fromkeys(keys):
+            match = self.best_match(name, state, threshold)
+            if match is None and cross_state_threshold is not None:
+                match = self.best_match(name, None, cross_state_threshold)
+            if match is not None:
+                resolved[(name, state)] = match
+            else:
+                unmatched.setdefault(state, []).append(name)
+
+        for state, names in unmatched.items():
+            canonical = resolve_clusters(match_pairs(cdist_fuzzy_matching(names, threshold)), counts)
+            for name in names:
+                target = canonical.get(name, name)
+                score = 100.0 if target == name else fuzz.ratio(token_sort_key(name), token_sort_key(target))
+                resolved[(name, state)] = (target, score)
+                self.add(target, state)
+        return resolved
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the recall of blocked name matching against brute force")
+    parser.add_argument("csv", help="CSV with a column of names, e.g. preprocessed-bigpumpkins.csv")
+    parser.add_argument("--column", default="Processed Name")
+    parser.add_argument("--threshold", type=int, default=90)
+    args = parser.parse_args()
+
+    names = pd.read_csv(args.csv, usecols=[args.column])[args.column].dropna().astype(str).unique().tolist()
+    print(json.dumps(blocking_recall_report(names, args.threshold), indent=2))
+
+if __name__ == "__main__":
+    main()
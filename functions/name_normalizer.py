@@ -0,0 +1,85 @@
+import re
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from nameparser import HumanName
+
+# Part of every pipeline's NAME_RULES_VERSION; bump it when the rules below change
+NORMALIZER_VERSION = "1"
+
+UNKNOWN_NAME = "Unknown"
+NAME_CACHE_SIZE = 65536  # unique raw names kept memoized; the full results history has a few thousand
+
+_SEPARATORS = re.compile(r'[/\-]+')
+_DIGITS = re.compile(r'\d+')
+_WHITESPACE = re.compile(r'\s+')
+_TEAM = re.compile(r'\bteam\b', re.I)
+_TEAM_WORDS = re.compile(r'\b(?:team|the)\b', re.I)
+
+def clean_name(name: str) -> str:
+    """Spell out "&", turn "/" and "-" into spaces, drop digits and collapse whitespace."""
+    name = name.replace("&", " and ")
+    name = _SEPARATORS.sub(" ", name)
+    name = _DIGITS.sub("", name)
+    return _WHITESPACE.sub(" ", name).strip()
+
+def team_name(name: str) -> str:
+    """Team form of a name: "Team " followed by the name without "team", "the" or commas."""
+    name = _WHITESPACE.sub(" ", _TEAM_WORDS.sub("", name))
+    parts = [part.strip() for part in name.split(",") if part.strip()]
+    return "Team " + " ".join(parts) if parts else f"Team {UNKNOWN_NAME}"
+
+def person_name(name: str) -> str:
+    """Reorder a person's name as "Last, First" when HumanName finds a last name."""
+    try:
+        human_name = HumanName(name)
+    except Exception:
+        return name
+    if not human_name.last:
+        return name
+    return f"{human_name.last}, {human_name.first}".strip()
+
+def parse_name(name: str) -> str:
+    """Title-cased team or "Last, First" form of a name already run through clean_name."""
+    if not name:
+        return UNKNOWN_NAME
+    if _TEAM.search(name):
+        return team_name(name).title()
+    return person_name(name).title()
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def normalize_name(name: str) -> str:
+    """Canonical, title-cased form of one raw grower name."""
+    return parse_name(clean_name(name))
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def split_name(name: str) -> Tuple[str, str]:
+    """(last name, first name) of a normalized name; team names keep everything in the last name."""
+    if "Team" in name:
+        return name.strip().title(), ""
+    last, _, first = name.partition(",")
+    return last.strip().title(), first.strip().title()
+
+def _map_unique(values: pd.Series, fn, missing) -> np.ndarray:
+    # factorize codes missing values as -1, which picks the trailing `missing` entry
+    codes, uniques = pd.factorize(values)
+    results = [fn(str(value)) for value in uniques]
+    results.append(missing)
+    table = np.empty(len(results), dtype=object)
+    for i, result in enumerate(results):
+        table[i] = result
+    return table[codes]
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """normalize_name over a column, computed once per unique value and mapped back to the rows."""
+    return pd.Series(_map_unique(names, normalize_name, UNKNOWN_NAME), index=names.index, name=names.name)
+
+def split_names(names: pd.Series) -> pd.DataFrame:
+    """'Last Name' and 'First Name' columns for a column of normalized names."""
+    parts = _map_unique(names, split_name, (UNKNOWN_NAME, ""))
+    return pd.DataFrame(
+        {'Last Name': [last for last, _ in parts], 'First Name': [first for _, first in parts]},
+        index=names.index
+    )
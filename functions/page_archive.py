@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_ARCHIVE_DIR = os.getenv("SCRAPE_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".page_archive"))
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+@dataclass
+class ArchivedPage:
+    id: int
+    url: str
+    category: Optional[str]
+    year: Optional[int]
+    fetched_at: float
+    sha256: str
+    segment: str
+    offset: int
+    length: int
+    encoding: Optional[str] = None  # charset the server declared when the page was fetched
+
+def category_year_from_url(url: str) -> Tuple[Optional[str], Optional[int]]:
+    """Read the category (c) and year (y) query parameters of a results URL."""
+    query = parse_qs(urlsplit(url).query)
+    category = query.get("c", [None])[0]
+    year = query.get("y", [None])[0]
+    return category, int(year) if year and year.isdigit() else None
+
+class PageArchive:
+    """Append-only archive of raw fetched pages: gzip segments on disk plus a SQLite index.
+
+    Every fetch gets an index row (URL, fetch time, hash); bodies are stored once per hash, each as
+    its own gzip member so a single page can be read back with one seek. Appends are serialized
+    with a lock, so they can run on worker threads.
+    """
+
+    def __init__(self, archive_dir: str = DEFAULT_ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.archive_dir / "index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                category TEXT,
+                year INTEGER,
+                fetched_at REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                encoding TEXT
+            );
+            CREATE INDEX IF NOT EXISTS pages_url_idx ON pages (url, fetched_at);
+            CREATE INDEX IF NOT EXISTS pages_category_year_idx ON pages (category, year);
+            CREATE INDEX IF NOT EXISTS pages_sha256_idx ON pages (sha256);
+        """)
+        # Archives created before the charset was kept get the column added; their pages have none
+        if "encoding" not in {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}:
+            self._db.execute("ALTER TABLE pages ADD COLUMN encoding TEXT")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the index database."""
+        self._db.close()
+
+    def append(self, url: str, content: bytes, fetched_at: Optional[float] = None,
+               if_missing: bool = False, encoding: Optional[str] = None) -> Optional[ArchivedPage]:
+        """Archive one fetched page with the charset it was served with, so a replay decodes it the
+        same way.
+
+        With ``if_missing``, a page already archived for this URL with the same body is skipped and
+        None returned; cache hits use this so pages fetched before archiving existed get archived.
+        """
+        with self._lock:
+            return self._append(url, content, fetched_at, if_missing, encoding)
+
+    def _append(self, url: str, content: bytes, fetched_at: Optional[float], if_missing: bool,
+                encoding: Optional[str]) -> Optional[ArchivedPage]:
+        fetched_at = fetched_at or time.time()
+        digest = hashlib.sha256(content).hexdigest()
+        category, year = category_year_from_url(url)
+
+        if if_missing and self._db.execute(
+            "SELECT 1 FROM pages WHERE url = ? AND sha256 = ? LIMIT 1", (url, digest)
+        ).fetchone():
+            return None
+
+        existing = self._db.execute(
+            "SELECT segment, offset, length FROM pages WHERE sha256 = ? LIMIT 1", (digest,)
+        ).fetchone()
+        if existing:
+            segment, offset, length = existing
+        else:
+            segment, offset, length = self._write_blob(gzip.compress(content))
+
+        cursor = self._db.execute(
+            "INSERT INTO pages (url, category, year, fetched_at, sha256, segment, offset, length, encoding) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, category, year, fetched_at, digest, segment, offset, length, encoding)
+        )
+        self._db.commit()
+        return ArchivedPage(cursor.lastrowid, url, category, year, fetched_at, digest, segment, offset, length,
+                            encoding)
+
+    def read(self, page: ArchivedPage) -> bytes:
+        """Read an archived page body."""
+        with open(self.archive_dir / page.segment, 'rb') as f:
+            f.seek(page.offset)
+            return gzip.decompress(f.read(page.length))
+
+    def latest(self, category: Optional[str] = None, year: Optional[int] = None) -> Iterator[ArchivedPage]:
+        """Yield the most recent archived fetch of every URL, optionally filtered by category/year."""
+        query = """
+            SELECT id, url, category, year, fetched_at, sha256, segment, offset, length, encoding
+            FROM pages p
+            WHERE fetched_at = (SELECT MAX(fetched_at) FROM pages WHERE url = p.url)
+        """
+        params = []
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        if year is not None:
+            query += " AND year = ?"
+            params.append(year)
+        # Segment order keeps reads sequential on disk
+        query += " ORDER BY segment, offset"
+        for row in self._db.execute(query, params).fetchall():
+            yield ArchivedPage(*row)
+
+    def _write_blob(self, blob: bytes) -> Tuple[str, int, int]:
+        segment = self._current_segment(len(blob))
+        path = self.archive_dir / segment
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        return segment, offset, len(blob)
+
+    def _current_segment(self, incoming: int) -> str:
+        segments = sorted(self.archive_dir.glob("segment-*.gz"))
+        if segments and segments[-1].stat().st_size + incoming <= SEGMENT_MAX_BYTES:
+            return segments[-1].name
+        return f"segment-{len(segments) + 1:05d}.gz"
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".page_cache"))
+
+# Seconds before a cached page must be revalidated, by how old the season is.
+# The current season changes daily during weigh-off season; old seasons almost never do.
+DEFAULT_TTL_POLICY = {
+    "current": 6 * 3600,
+    "previous": 24 * 3600,
+    "historical": 30 * 24 * 3600
+}
+
+def body_hash(content: bytes) -> str:
+    """Content address used for cached page bodies."""
+    return hashlib.sha256(content).hexdigest()
+
+@dataclass
+class CacheEntry:
+    url: str
+    body_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    year: Optional[int]
+    fetched_at: float
+    checked_at: float
+    processed_hash: Optional[str]
+    encoding: Optional[str] = None  # charset the server declared for the body, if any
+
+    @property
+    def is_processed(self) -> bool:
+        """True when the cached body has already been parsed and stored downstream."""
+        return self.processed_hash == self.body_hash
+
+class PageCache:
+    """Content-addressed on-disk cache of fetched pages, keyed by URL.
+
+    Pages are shared by every scraper using the cache directory, but the processed marker is kept
+    per ``consumer``: a page stored by one scraper is still new to another.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_policy: Optional[Dict[str, int]] = None,
+                 consumer: str = "default"):
+        self.cache_dir = Path(cache_dir)
+        self.consumer = consumer
+        self.objects_dir = self.cache_dir / "objects"
+        self.rows_dir = self.cache_dir / "rows"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.rows_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_policy = {**DEFAULT_TTL_POLICY, **(ttl_policy or {})}
+
+        self._db = sqlite3.connect(str(self.cache_dir / "index.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                year INTEGER,
+                fetched_at REAL NOT NULL,
+                checked_at REAL NOT NULL,
+                encoding TEXT
+            );
+            CREATE TABLE IF NOT EXISTS processed (
+                url TEXT NOT NULL,
+                consumer TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                PRIMARY KEY (url, consumer)
+            );
+        """)
+        # Caches created before the charset was kept get the column added; their pages have none
+        if "encoding" not in {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}:
+            self._db.execute("ALTER TABLE pages ADD COLUMN encoding TEXT")
+        self._db.commit()
+
+    def close(self) -> None:
+        """Close the index database."""
+        self._db.close()
+
+    def ttl_for_year(self, year: Optional[int]) -> int:
+        """Return the revalidation TTL in seconds for a season."""
+        current_year = datetime.now().year
+        if year is None or year >= current_year:
+            return self.ttl_policy["current"]
+        if year == current_year - 1:
+            return self.ttl_policy["previous"]
+        return self.ttl_policy["historical"]
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Return the cache entry for a URL, if its body is still on disk."""
+        row = self._db.execute(
+            "SELECT p.url, p.body_hash, p.etag, p.last_modified, p.year, p.fetched_at, p.checked_at, m.body_hash, "
+            "p.encoding "
+            "FROM pages p LEFT JOIN processed m ON m.url = p.url AND m.consumer = ? "
+            "WHERE p.url = ?",
+            (self.consumer, url)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        if not self._object_path(entry.body_hash).exists():
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """True when the entry is inside its TTL and can be used without a request."""
+        return time.time() - entry.checked_at < self.ttl_for_year(entry.year)
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers for revalidation."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def read_body(self, entry: CacheEntry) -> bytes:
+        """Read a cached page body."""
+        return self._object_path(entry.body_hash).read_bytes()
+
+    def store(self, url: str, year: Optional[int], content: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None, encoding: Optional[str] = None) -> CacheEntry:
+        """Store a freshly downloaded body and its HTTP charset, keeping the processed marker if the
+        content is unchanged."""
+        digest = body_hash(content)
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+
+        previous = self.lookup(url)
+        processed_hash = previous.processed_hash if previous else None
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO pages "
+            "(url, body_hash, etag, last_modified, year, fetched_at, checked_at, encoding) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, digest, etag, last_modified, year, now, now, encoding)
+        )
+        self._db.commit()
+        return CacheEntry(url, digest, etag, last_modified, year, now, now, processed_hash, encoding)
+
+    def touch(self, entry: CacheEntry) -> CacheEntry:
+        """Record a successful revalidation (HTTP 304) of an entry."""
+        now = time.time()
+        self._db.execute("UPDATE pages SET checked_at = ? WHERE url = ?", (now, entry.url))
+        self._db.commit()
+        entry.checked_at = now
+        return entry
+
+    def mark_processed(self, url: str, digest: str) -> None:
+        """Record that this cache's consumer has parsed and stored the body with this hash."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO processed (url, consumer, body_hash) VALUES (?, ?, ?)",
+            (url, self.consumer, digest)
+        )
+        self._db.commit()
+
+    def load_rows(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return previously parsed rows for a body hash."""
+        path = self.rows_dir / f"{digest}.json"
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def store_rows(self, digest: str, parsed: Dict[str, List[Any]]) -> None:
+        """Keep parsed rows next to the body so unchanged pages never need re-parsing."""
+        path = self.rows_dir / f"{digest}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(parsed, f)
+        os.replace(tmp_path, path)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.html"
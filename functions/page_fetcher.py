@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from page_archive import PageArchive, category_year_from_url
+from page_cache import CacheEntry, PageCache
+from scrape_fixtures import FixtureRecorder
+
+BASE_URL = os.getenv("BIGPUMPKINS_BASE_URL", "http://www.bigpumpkins.com")
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 4
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+def results_url(category: str, year: int, base_url: str = BASE_URL) -> str:
+    """Build the WeighoffResultsGPC URL for a category and year."""
+    return f"{base_url}/WeighoffResultsGPC.aspx?c={category}&y={year}"
+
+class FetchError(Exception):
+    """Raised when a page could not be fetched, as opposed to a page that has no results."""
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by request latency and errors.
+
+    The limit grows by roughly one slot per window of successful requests while latency stays
+    near its baseline (a moving average of every answered request), and halves on an error or a
+    latency spike. Decreases are spaced at least
+    one baseline latency apart so a burst of failures from one overload only backs off once.
+    """
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = DEFAULT_MAX_CONCURRENCY,
+                 spike_factor: float = 2.0, decrease_factor: float = 0.5, adaptive: bool = True):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, initial)
+        self.limit = float(max(min_limit, initial))
+        self.spike_factor = spike_factor
+        self.decrease_factor = decrease_factor
+        self.adaptive = adaptive
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot under the current limit."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, ok: bool) -> None:
+        """Free a slot and adjust the limit from the request's outcome."""
+        async with self._condition:
+            self.in_flight -= 1
+            if self.adaptive:
+                self._adjust(latency, ok)
+            self._condition.notify_all()
+
+    def _adjust(self, latency: float, ok: bool) -> None:
+        spiked = self.baseline is not None and latency > self.baseline * self.spike_factor
+        if ok:
+            # Every answered request feeds the baseline, spikes included, so a lasting shift in
+            # latency becomes the new normal instead of pinning the limit at min_limit
+            self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+        if ok and not spiked:
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.increases += 1
+            return
+
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self.decreases += 1
+        logger.info(f"Backing off to {int(self.limit)} concurrent requests "
+                    f"({'error' if not ok else f'latency {latency:.2f}s'})")
+
+@dataclass
+class Page:
+    url: str
+    content: bytes
+    body_hash: Optional[str] = None
+    changed: bool = True
+    from_cache: bool = False
+    encoding: Optional[str] = None  # HTTP charset, when the response declared one
+
+class PageFetcher:
+    """Async page fetcher backed by a pooled, keep-alive HTTP client."""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 cache: Optional[PageCache] = None, recorder: Optional[FixtureRecorder] = None,
+                 base_url: str = BASE_URL, max_concurrency: Optional[int] = None,
+                 adaptive: bool = True, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 archive: Optional[PageArchive] = None):
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency or concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.recorder = recorder
+        self.archive = archive
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.limiter = AdaptiveLimiter(concurrency, max_limit=self.max_concurrency, adaptive=adaptive)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "PageFetcher":
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=60.0
+        )
+        self._client = httpx.AsyncClient(
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": "PumpkinPal-Scraper/1.0"}
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Limiter and retry counters for the scraping report."""
+        return {
+            "final_concurrency": int(self.limiter.limit),
+            "max_concurrency": self.max_concurrency,
+            "limit_increases": self.limiter.increases,
+            "limit_decreases": self.limiter.decreases,
+            "baseline_latency_seconds": round(self.limiter.baseline or 0.0, 3),
+            "retries": self.retries
+        }
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        """Fetch a URL under the adaptive limit, retrying transient failures with jittered backoff.
+
+        Raises FetchError once retries are exhausted or the server gives a non-retryable error.
+        """
+        if self._client is None:
+            raise RuntimeError("PageFetcher must be used as an async context manager")
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            start = time.monotonic()
+            response = None
+            error = None
+            try:
+                response = await self._client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                ok = response is not None and response.status_code not in RETRYABLE_STATUS_CODES
+                await self.limiter.release(time.monotonic() - start, ok)
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+                if response.status_code == 304 or response.is_success:
+                    return response
+                raise FetchError(f"HTTP {response.status_code} for {url}")
+
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            if attempt == self.max_retries:
+                raise FetchError(f"{reason} for {url} after {self.max_retries + 1} attempts")
+
+            self.retries += 1
+            delay = self._backoff(attempt, response)
+            logger.warning(f"{reason} for {url}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Exponential backoff with full jitter, honouring a numeric Retry-After."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(self.backoff_max, float(retry_after))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def fetch_page(self, url: str, year: Optional[int] = None) -> Page:
+        """Fetch a page and, in record mode, save it as a replay fixture."""
+        page = await self._fetch_page(url, year)
+        if self.recorder is not None:
+            self.recorder.record(page.url, page.content)
+        return page
+
+    async def _fetch_page(self, url: str, year: Optional[int] = None) -> Page:
+        """Fetch a page through the cache, revalidating with ETag/Last-Modified when it has expired.
+
+        ``Page.changed`` is False when the body matches what was last processed downstream,
+        whether that was decided by TTL, a 304 response, or an identical body hash.
+        """
+        if self.cache is None:
+            response = await self.get(url)
+            await self._archive(url, response.content, encoding=response.charset_encoding)
+            return Page(url=url, content=response.content, encoding=response.charset_encoding)
+
+        entry = self.cache.lookup(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            return await self._cached_page(entry)
+
+        response = await self.get(url, headers=self.cache.conditional_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            return await self._cached_page(self.cache.touch(entry))
+
+        # Servers without validators still answer 200; the body hash decides whether anything changed
+        await self._archive(url, response.content, encoding=response.charset_encoding)
+        entry = self.cache.store(
+            url,
+            year,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            encoding=response.charset_encoding
+        )
+        return Page(url=url, content=response.content, body_hash=entry.body_hash,
+                    changed=not entry.is_processed, encoding=response.charset_encoding)
+
+    async def _cached_page(self, entry: CacheEntry) -> Page:
+        content = self.cache.read_body(entry)
+        # Pages cached before the archive existed (or while it was off) still belong in it
+        await self._archive(entry.url, content, if_missing=True, encoding=entry.encoding)
+        # Decoded with the charset of the response that delivered the body, as a fresh fetch would be
+        return Page(url=entry.url, content=content, body_hash=entry.body_hash,
+                    changed=not entry.is_processed, from_cache=True, encoding=entry.encoding)
+
+    def mark_processed(self, page: Page) -> None:
+        """Record that a page has been fully stored so unchanged copies can be skipped next run."""
+        if self.cache is not None and page.body_hash:
+            self.cache.mark_processed(page.url, page.body_hash)
+
+    async def _archive(self, url: str, content: bytes, if_missing: bool = False,
+                       encoding: Optional[str] = None) -> None:
+        # The append fsyncs its segment, so it runs on a thread rather than the event loop
+        if self.archive is not None:
+            await asyncio.to_thread(self.archive.append, url, content, if_missing=if_missing, encoding=encoding)
+
+class ArchiveFetcher:
+    """Stands in for PageFetcher and serves pages from the raw-page archive instead of the network."""
+
+    def __init__(self, archive: PageArchive, base_url: str = BASE_URL):
+        self.archive = archive
+        self.base_url = base_url.rstrip("/")
+        self._pages = {}
+        for archived in archive.latest():
+            if archived.category is not None and archived.year is not None:
+                self._pages[(archived.category, archived.year)] = archived
+
+    def tasks(self) -> list:
+        """The (category, year) pairs available in the archive."""
+        return sorted(self._pages)
+
+    async def fetch_page(self, url: str, year: Optional[int] = None) -> Page:
+        """Return the latest archived copy of a results page."""
+        category, _ = category_year_from_url(url)
+        archived = self._pages.get((category, year))
+        if archived is None:
+            raise FetchError(f"{url} is not in the archive")
+        content = await asyncio.to_thread(self.archive.read, archived)
+        return Page(url=url, content=content, body_hash=archived.sha256, encoding=archived.encoding)
+
+    def mark_processed(self, page: Page) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """The same keys as PageFetcher.stats; nothing goes over the network, so nothing is limited."""
+        return {
+            "source": "archive",
+            "pages": len(self._pages),
+            "final_concurrency": 0,
+            "max_concurrency": 0,
+            "limit_increases": 0,
+            "limit_decreases": 0,
+            "baseline_latency_seconds": 0.0,
+            "retries": 0
+        }
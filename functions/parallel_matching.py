@@ -0,0 +1,117 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from name_matching import iter_fuzzy_matches
+
+logger = logging.getLogger(__name__)
+
+# States with fewer names than this are matched in the calling process; a task costs more
+MIN_POOL_BLOCK = 64
+
+class SharedNames:
+    """Names packed into shared memory: one UTF-8 buffer plus an int64 offsets array.
+
+    Worker processes attach to the two blocks by name, so a task only carries the slice of names
+    it works on, never the names themselves.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        self.count = len(encoded)
+        self._data = shared_memory.SharedMemory(create=True, size=max(1, int(offsets[-1])))
+        self._offsets = shared_memory.SharedMemory(create=True, size=offsets.nbytes)
+        self._data.buf[:int(offsets[-1])] = b"".join(encoded)
+        self._offsets.buf[:offsets.nbytes] = offsets.tobytes()
+
+    @property
+    def handle(self) -> Tuple[str, str, int]:
+        """What a worker needs to attach: (data block, offsets block, name count)."""
+        return self._data.name, self._offsets.name, self.count
+
+    def close(self) -> None:
+        """Free both blocks."""
+        for block in (self._data, self._offsets):
+            block.close()
+            block.unlink()
+
+def read_shared_names(handle: Tuple[str, str, int], start: int, stop: int) -> List[str]:
+    """Names[start:stop] from a SharedNames block, decoded in the calling process."""
+    data_name, offsets_name, count = handle
+    data = shared_memory.SharedMemory(name=data_name)
+    offsets_block = shared_memory.SharedMemory(name=offsets_name)
+    try:
+        offsets = np.frombuffer(offsets_block.buf, dtype=np.int64, count=count + 1)[start:stop + 1].copy()
+        raw = bytes(data.buf[offsets[0]:offsets[-1]])
+    finally:
+        data.close()
+        offsets_block.close()
+    local = offsets - offsets[0]
+    return [raw[local[i]:local[i + 1]].decode("utf-8") for i in range(stop - start)]
+
+def _match_block(handle: Tuple[str, str, int], start: int, stop: int, threshold: int) -> List[Tuple[int, int]]:
+    # Each worker scores its block on one thread; the pool supplies the parallelism
+    names = read_shared_names(handle, start, stop)
+    return [(start + i, start + j) for i, j, _ in iter_fuzzy_matches(names, threshold, workers=1)]
+
+class StateMatcher:
+    """Fuzzy matches each state's names on a pool of worker processes.
+
+    States are independent blocks: each one is a task over a contiguous slice of a SharedNames
+    buffer, and the matched pairs from every block come back as one list for resolve_clusters.
+    The pool is started on first use and kept until ``close``.
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        self.processes = processes or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "StateMatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def match(self, names_by_state: Mapping[str, Sequence[str]], threshold: int) -> List[Tuple[str, str]]:
+        """(name, match) pairs scoring above ``threshold`` within each state, in no particular order."""
+        names: List[str] = []
+        blocks = []
+        for state_names in names_by_state.values():
+            if len(state_names) > 1:
+                blocks.append((len(names), len(names) + len(state_names)))
+                names.extend(state_names)
+        if not blocks:
+            return []
+
+        pooled = [block for block in blocks if block[1] - block[0] >= MIN_POOL_BLOCK] if self.processes > 1 else []
+        pairs = []
+        for start, stop in set(blocks) - set(pooled):
+            pairs += [(start + i, start + j) for i, j, _ in iter_fuzzy_matches(names[start:stop], threshold)]
+
+        if pooled:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            shared = SharedNames(names)
+            try:
+                # Largest states first, so one big state doesn't start last and hold up the merge
+                pooled.sort(key=lambda block: block[0] - block[1])
+                futures = [self._pool.submit(_match_block, shared.handle, start, stop, threshold)
+                           for start, stop in pooled]
+                for future in futures:
+                    pairs += future.result()
+            finally:
+                shared.close()
+            logger.debug(f"Matched {len(pooled)} states on {self.processes} processes")
+        return [(names[i], names[j]) for i, j in pairs]
@@ -0,0 +1,255 @@
+import logging
+import math
+import numbers
+import os
+import queue
+import re
+import threading
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+try:
+    import psycopg
+except ImportError:  # The RPC path does not need it
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+COPY_FORMATS = ("binary", "csv")
+
+# Postgres types of the columns each loader writes, used to pick binary COPY encoders
+TABLE_COLUMN_TYPES = {
+    ("staging", "entries_staging"): {
+        "category": "text", "year": "int4", "place": "text", "weight_lbs": "numeric",
+        "processed_grower_name": "text", "original_grower_name": "text", "city": "text",
+        "state_prov": "text", "country": "text", "gpc_site": "text", "seed_mother": "text",
+        "pollinator_father": "text", "ott": "numeric", "est_weight": "numeric", "entry_type": "text"
+    },
+    ("staging", "sites_staging"): {
+        "year": "int4", "gpc_site": "text", "site_name": "text", "city": "text",
+        "state_prov": "text", "country": "text"
+    },
+    ("core", "entries"): {
+        "category": "text", "year": "int4", "place": "text", "weight_lbs": "numeric",
+        "grower_name": "text", "grower_id": "text", "original_grower_name": "text", "city": "text",
+        "state_prov": "text", "country": "text", "gpc_site": "text", "seed_mother": "text",
+        "pollinator_father": "text", "seed_mother_id": "int4", "pollinator_father_id": "int4",
+        "site_id": "int4", "ott": "numeric", "est_weight": "numeric", "entry_type": "text"
+    },
+    ("raw_data", "*"): {
+        "place": "text", "weight_lbs": "numeric", "grower_name": "text", "city": "text",
+        "state_prov": "text", "country": "text", "gpc_site": "text", "seed_mother": "text",
+        "pollinator_father": "text", "ott": "numeric", "est_weight": "numeric", "pct_chart": "numeric",
+        "row_key": "text", "row_hash": "text"
+    }
+}
+
+def database_url() -> Optional[str]:
+    """Direct Postgres connection string, if one is configured."""
+    return os.getenv("SUPABASE_DB_URL") or os.getenv("DATABASE_URL")
+
+def column_types(schema: str, table: str, columns: Sequence[str]) -> List[str]:
+    """Look up the Postgres type of each column, defaulting to text."""
+    types = TABLE_COLUMN_TYPES.get((schema, table)) or TABLE_COLUMN_TYPES.get((schema, "*"), {})
+    return [types.get(column, "text") for column in columns]
+
+def unnest_insert_sql(schema: str, table: str, columns: Sequence[str], placeholder: str = "$",
+                      conflict: str = "") -> str:
+    """INSERT ... SELECT FROM unnest() over one typed array parameter per column.
+
+    The statement text depends only on the table and columns, so Postgres can reuse one plan for
+    every batch. ``placeholder`` is "$" for positional ($1, $2, ...) or "%s" for psycopg;
+    ``conflict`` is an optional ON CONFLICT clause.
+    """
+    types = column_types(schema, table, columns)
+    if placeholder == "$":
+        arrays = [f"${i}::{pg_type}[]" for i, pg_type in enumerate(types, start=1)]
+    else:
+        arrays = [f"{placeholder}::{pg_type}[]" for pg_type in types]
+    sql = (f"INSERT INTO {schema}.{table} ({', '.join(columns)}) "
+           f"SELECT * FROM unnest({', '.join(arrays)})")
+    return f"{sql} {conflict}" if conflict else sql
+
+_PLACEHOLDER = re.compile(r"\$(\d+)")
+
+def _array_element(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NULL"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def sql_literal(value: Any) -> str:
+    """A parameter value as a SQL literal; lists become array literals for a ``$n::type[]`` cast."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (numbers.Real, Decimal)):
+        return "NULL" if isinstance(value, float) and math.isnan(value) else str(value)
+    if isinstance(value, (list, tuple)):
+        value = "{" + ",".join(_array_element(element) for element in value) + "}"
+    return "'" + str(value).replace("'", "''") + "'"
+
+def render_sql(query: str, params: Sequence[Any]) -> str:
+    """Substitute ``$1``, ``$2``, ... in a statement with its parameters rendered as literals.
+
+    The fallback for execute_sql deployments that only take a query string.
+    """
+    return _PLACEHOLDER.sub(lambda match: sql_literal(params[int(match.group(1)) - 1]), query)
+
+def column_arrays(schema: str, table: str, columns: Sequence[str], records: Iterable[dict],
+                  json_safe: bool = False) -> List[list]:
+    """Transpose dict records into one cleaned value list per column.
+
+    With ``json_safe`` numerics come back as floats so the arrays can travel as RPC parameters.
+    """
+    types = column_types(schema, table, columns)
+    records = records if isinstance(records, list) else list(records)
+    clean = _clean_json if json_safe else _clean
+    return [[clean(record[column], pg_type) for record in records] for column, pg_type in zip(columns, types)]
+
+def _clean(value: Any, pg_type: str) -> Any:
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if pg_type == "numeric" and isinstance(value, numbers.Real):
+        # The binary numeric encoder only takes Decimal
+        return Decimal(str(value))
+    if pg_type == "int4" and not isinstance(value, int):
+        return int(value)
+    return value
+
+def _clean_json(value: Any, pg_type: str) -> Any:
+    # Most values are already plain strings; skip the checks for them
+    if type(value) is str:
+        return value
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if pg_type == "numeric" and isinstance(value, numbers.Real):
+        return float(value)
+    if pg_type == "int4" and not isinstance(value, int):
+        return int(value)
+    return value
+
+def _csv_field(value: Any) -> str:
+    # Unquoted empty is NULL in COPY CSV, so every non-NULL text value is quoted
+    if value is None:
+        return ""
+    if isinstance(value, (numbers.Real, Decimal)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+class CopyLoader:
+    """Streams rows into Postgres with COPY ... FROM STDIN over a direct connection.
+
+    Connections are kept in a free list bounded by ``max_connections``, so concurrent writers
+    each get their own connection and transaction and wait when the pool is exhausted.
+    ``insert_records`` covers the non-COPY case with a prepared unnest() insert.
+    """
+
+    def __init__(self, dsn: str, copy_format: str = "binary", max_connections: int = 8):
+        if psycopg is None:
+            raise RuntimeError("psycopg is required for COPY loading; pip install 'psycopg[binary]'")
+        if copy_format not in COPY_FORMATS:
+            raise ValueError(f"copy_format must be one of {COPY_FORMATS}")
+        self.dsn = dsn
+        self.copy_format = copy_format
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    @classmethod
+    def from_env(cls, copy_format: Optional[str] = None, max_connections: int = 8) -> Optional["CopyLoader"]:
+        """Build a loader when SUPABASE_DB_URL/DATABASE_URL is set, else None so callers use the RPC path."""
+        dsn = database_url()
+        if not dsn:
+            return None
+        if psycopg is None:
+            logger.warning("Database URL is set but psycopg is not installed; falling back to execute_sql RPC")
+            return None
+        return cls(dsn, copy_format or os.getenv("COPY_FORMAT", "binary"), max_connections)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    def copy_rows(self, schema: str, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+        """COPY rows (sequences in `columns` order) into schema.table in one transaction."""
+        types = column_types(schema, table, columns)
+        column_list = ", ".join(columns)
+        statement = f"COPY {schema}.{table} ({column_list}) FROM STDIN (FORMAT {self.copy_format.upper()})"
+
+        count = 0
+        conn = self._acquire()
+        try:
+            with conn.transaction():
+                with conn.cursor() as cursor:
+                    with cursor.copy(statement) as copy:
+                        if self.copy_format == "binary":
+                            copy.set_types(types)
+                            for row in rows:
+                                copy.write_row([_clean(value, pg_type) for value, pg_type in zip(row, types)])
+                                count += 1
+                        else:
+                            for row in rows:
+                                copy.write(",".join(
+                                    _csv_field(_clean(value, pg_type)) for value, pg_type in zip(row, types)
+                                ) + "\n")
+                                count += 1
+        except Exception:
+            conn.close()
+            self._release(conn)
+            raise
+        self._release(conn)
+        return count
+
+    def copy_records(self, schema: str, table: str, columns: Sequence[str], records: Iterable[dict]) -> int:
+        """COPY dict records into schema.table."""
+        return self.copy_rows(schema, table, columns, ([record[column] for column in columns] for record in records))
+
+    def copy_dataframe(self, schema: str, table: str, df: pd.DataFrame,
+                       columns: Optional[Sequence[str]] = None) -> int:
+        """COPY a DataFrame straight into schema.table; DataFrame columns must match table columns."""
+        columns = list(columns or df.columns)
+        return self.copy_rows(schema, table, columns, df[columns].itertuples(index=False, name=None))
+
+    def insert_records(self, schema: str, table: str, columns: Sequence[str], records: Iterable[dict],
+                       conflict: str = "") -> int:
+        """Insert dict records with a server-side prepared unnest() statement in one transaction."""
+        arrays = column_arrays(schema, table, columns, records)
+        conn = self._acquire()
+        try:
+            with conn.transaction():
+                with conn.cursor() as cursor:
+                    cursor.execute(unnest_insert_sql(schema, table, columns, "%s", conflict), arrays, prepare=True)
+                    count = cursor.rowcount
+        except Exception:
+            conn.close()
+            self._release(conn)
+            raise
+        self._release(conn)
+        return count
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return psycopg.connect(self.dsn, autocommit=True)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn) -> None:
+        # Broken connections are dropped; their slot frees up for a new one
+        if not conn.closed:
+            self._idle.put(conn)
+        self._slots.release()
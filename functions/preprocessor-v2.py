@@ -1,14 +1,16 @@
 # Import required libraries
 import pandas as pd
-from nameparser import HumanName
-from fuzzywuzzy import process
-from fuzzywuzzy import fuzz
-from collections import Counter
-import re
-from tqdm import tqdm
 import logging
-from typing import Dict, List, Optional, Tuple
-from pathlib import Path
+import argparse
+from typing import Dict, List, Optional
+from name_matching import (CanonicalNameIndex, apply_clusters, blocked_fuzzy_matching, match_pairs,
+                           resolve_clusters)
+from name_cache import NameResolutionCache, changed_resolutions
+from parallel_matching import StateMatcher
+from name_normalizer import NORMALIZER_VERSION, normalize_names, split_names
+
+# Bump whenever the name rules or matching below change; cached resolutions are then ignored
+NAME_RULES_VERSION = f"preprocessor-v2-3.{NORMALIZER_VERSION}"
 
 # Set up logging
 logging.basicConfig(
@@ -53,100 +55,82 @@ def load_data(file_path: str) -> pd.DataFrame:
         logger.error(f"Error loading file: {str(e)}")
         raise
 
-def preprocess_name(name: str) -> str:
-    """Preprocesses a name by replacing special characters and cleaning up spaces."""
-    name = str(name)  # Ensure input is string
-    name = name.replace("&", "and").replace("/", " ").replace("-", " ").strip()
-    name = re.sub(r'\s+', ' ', name)  # Replace multiple spaces with a single space
-    name = re.sub(r'\d', '', name)  # Remove numbers
-    return name
-
-def parse_name(name: str) -> str:
-    """Parses a name into its components using the HumanName library."""
-    human_name = HumanName(name)
-    if human_name.last == '':
-        return name.strip()
-    else:
-        return f'{human_name.last}, {human_name.first}'.strip()
-
-def handle_team_names(name: str) -> str:
-    """Handles team names to ensure that 'Team' is always at the beginning."""
-    if "team" in name.lower():
-        name = re.sub(r'\bteam\b', '', name, flags=re.I).strip()
-        name = re.sub(r'\bthe\b', '', name, flags=re.I).strip()
-        
-        if ',' in name:
-            name_parts = [part.strip() for part in name.split(',') if part.strip() != '']
-            name = 'Team ' + ' '.join(name_parts) if name_parts else 'Team Unknown'
-        else:
-            name = f'Team {name}'
-        return name
-    return parse_name(name)
+def matches_involving(matches_dict: Dict[str, List[str]], names: set) -> Dict[str, List[str]]:
+    """Keep only the matches that involve at least one of ``names``."""
+    kept = {}
+    for name, matches in matches_dict.items():
+        involved = matches if name in names else [match for match in matches if match in names]
+        if involved:
+            kept[name] = involved
+    return kept
 
-def perform_fuzzy_matching(names: List[str], threshold: int = 80) -> Dict[str, List[str]]:
-    """Perform fuzzy matching with progress bar."""
-    matches_dict = {}
-    total_comparisons = len(names) * (len(names) - 1) // 2
-    
-    with tqdm(total=total_comparisons, desc="Performing fuzzy matching", disable=False) as pbar:
-        for i, name1 in enumerate(names):
-            remaining_names = names[i+1:]
-            scores = [fuzz.token_sort_ratio(name1, name2) for name2 in remaining_names]
-            matches = [name2 for name2, score in zip(remaining_names, scores) if score > threshold]
-            if matches:
-                matches_dict[name1] = matches
-            pbar.update(len(remaining_names))
-    
-    return matches_dict
+def process_dataframe(df: pd.DataFrame, name_cache: Optional[NameResolutionCache] = None,
+                      incremental: bool = False, match_workers: Optional[int] = None) -> pd.DataFrame:
+    """Main processing function for the dataframe.
 
-def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Main processing function for the dataframe."""
+    With a ``name_cache``, growers resolved by an earlier run keep their canonical name and only
+    new (grower, state) pairs are normalized and fuzzy matched. ``incremental`` goes further: the
+    cached clusters are frozen and each new name is looked up in an index of their canonical names
+    instead of matching every name of its state again. States are fuzzy matched in parallel on
+    ``match_workers`` processes (default: one per CPU).
+    """
     logger.info("Starting name preprocessing...")
     
     print("Starting preprocessing...", flush=True)
     
+    name_keys = list(zip(df['Grower Name'].astype(str), df['State/Prov'].astype(str)))
+    cached = name_cache.lookup(set(name_keys)) if name_cache is not None else {}
+    is_new = pd.Series([key not in cached for key in name_keys], index=df.index)
+    logger.info(f"{int((~is_new).sum())} of {len(df)} rows resolved from the name cache")
+    
     # Create processed name column
-    with tqdm(total=3, desc="Processing names", disable=False) as pbar:
-        df['Processed Name'] = df['Grower Name'].apply(preprocess_name)
-        pbar.update(1)
-        
-        df['Processed Name'] = df['Processed Name'].apply(handle_team_names)
-        pbar.update(1)
-        
-        df['Processed Name'] = df['Processed Name'].str.title()
-        pbar.update(1)
+    df['Processed Name'] = [cached[key].canonical_name if key in cached else None for key in name_keys]
+    df.loc[is_new, 'Processed Name'] = normalize_names(df.loc[is_new, 'Grower Name'])
+    normalized_names = df['Processed Name'].tolist()
+    
+    name_counts = df['Processed Name'].value_counts()
+    if incremental and name_cache is not None:
+        index = CanonicalNameIndex.from_cache(name_cache)
+        logger.info(f"Placing new names among {len(index)} canonical names...")
+        new_keys = list(zip(df.loc[is_new, 'Processed Name'], df.loc[is_new, 'State/Prov'].astype(str)))
+        placed = index.resolve(new_keys, threshold=80, counts=name_counts, cross_state_threshold=90)
+        df.loc[is_new, 'Processed Name'] = [placed[key][0] for key in new_keys]
+        scores = {name: score for (name, _), (_, score) in placed.items()}
+        name_cache.store(changed_resolutions(name_keys, normalized_names, df['Processed Name'], cached, scores))
+        return finish_dataframe(df)
     
     # Perform fuzzy matching by state/province
     logger.info("Starting fuzzy matching process...")
-    fuzzy_matched_names = {}
-    state_provs = df['State/Prov'].unique()
+    unresolved = set(df.loc[is_new, 'Processed Name'])
+    names_by_state = df.groupby('State/Prov')['Processed Name'].unique().to_dict()
+    with StateMatcher(match_workers) as matcher:
+        state_pairs = matcher.match(names_by_state, threshold=80)
+    matched_pairs = [(a, b) for a, b in state_pairs if a in unresolved or b in unresolved]
+    logger.info(f"Matched {len(names_by_state)} states/provinces on {matcher.processes} processes")
     
-    for state_prov in tqdm(state_provs, desc="Processing states/provinces"):
-        state_prov_df = df[df['State/Prov'] == state_prov]
-        processed_names = state_prov_df['Processed Name'].unique().tolist()
-        matches = perform_fuzzy_matching(processed_names, threshold=80)
-        fuzzy_matched_names.update(matches)
-    
-    # Cross-state matching with higher threshold
+    # Cross-state matching with higher threshold; the blocking index only scores likely pairs
     logger.info("Performing cross-state matching...")
     all_processed_names = df['Processed Name'].unique().tolist()
-    all_matches = perform_fuzzy_matching(all_processed_names, threshold=90)
-    fuzzy_matched_names.update({k: v for k, v in all_matches.items() if k not in fuzzy_matched_names})
+    all_matches = matches_involving(blocked_fuzzy_matching(all_processed_names, threshold=90), unresolved)
+    matched_pairs.extend(match_pairs(all_matches))
     
-    # Standardize names based on fuzzy matches
+    # Standardize names: matched names form clusters named after their most frequent member
     logger.info("Standardizing names...")
-    for most_common_name, matches in tqdm(fuzzy_matched_names.items(), desc="Standardizing names"):
-        df.loc[df['Processed Name'].isin(matches), 'Processed Name'] = most_common_name
+    canonical_names = resolve_clusters(matched_pairs, name_counts)
+    df['Processed Name'] = apply_clusters(df['Processed Name'], canonical_names)
+    logger.info(f"Resolved {len(canonical_names)} matched names into "
+                f"{len(set(canonical_names.values()))} clusters")
+    
+    if name_cache is not None:
+        name_cache.store(changed_resolutions(name_keys, normalized_names, df['Processed Name'], cached))
     
+    return finish_dataframe(df)
+
+def finish_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the name component and entry type columns once names are standardized."""
     # Split names into components
     logger.info("Splitting names into components...")
-    df[['Last Name', 'First Name']] = df['Processed Name'].apply(
-        lambda name: pd.Series([name, ""]) if "Team" in name else pd.Series(name.split(',', 1))
-    )
-    
-    # Clean up name columns
-    df['Last Name'] = df['Last Name'].str.strip().str.title()
-    df['First Name'] = df['First Name'].str.strip().str.title()
+    df[['Last Name', 'First Name']] = split_names(df['Processed Name'])
     
     # Add entry type
     df['entryType'] = df['Place'].apply(
@@ -157,6 +141,12 @@ def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Preprocess and standardize grower names in the results CSV")
+    parser.add_argument("--match-workers", type=int, default=None,
+                        help="Processes used to fuzzy match states in parallel (default: one per CPU)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep cached name clusters fixed and only place new names among them")
+    args = parser.parse_args()
     try:
         input_file = 'functions/bigpumpkins_2004_2024_2024-12-06.csv'
         output_file = 'functions/preprocessed-bigpumpkins.csv'
@@ -167,8 +157,11 @@ def main():
         # Load data
         df = load_data(input_file)
         
-        # Process the data
-        processed_df = process_dataframe(df)
+        # Process the data, reusing names resolved by earlier runs
+        name_cache = NameResolutionCache(NAME_RULES_VERSION)
+        processed_df = process_dataframe(df, name_cache, incremental=args.incremental,
+                                         match_workers=args.match_workers)
+        name_cache.close()
         
         # Save results
         processed_df.to_csv(output_file, index=False)
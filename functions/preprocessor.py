@@ -1,10 +1,11 @@
 # Import required libraries
 import pandas as pd
-from nameparser import HumanName
-from fuzzywuzzy import process
-from fuzzywuzzy import fuzz
-from collections import Counter
-import re
+from name_matching import apply_clusters, cdist_fuzzy_matching, match_pairs, resolve_clusters
+from name_cache import NameResolutionCache, changed_resolutions
+from name_normalizer import NORMALIZER_VERSION, normalize_names, split_names
+
+# Bump whenever the name rules or matching below change; cached resolutions are then ignored
+NAME_RULES_VERSION = f"preprocessor-3.{NORMALIZER_VERSION}"
 
 print("Starting script...")
 
@@ -12,48 +13,6 @@ print("Starting script...")
 print("Loading data...")
 pumpkins_df = pd.read_csv('functions/bigpumpkins_2004_2024_2024-12-06.csv')
 
-# Function to preprocess names
-print("Preprocessing names...")
-def preprocess_name(name):
-    """Preprocesses a name by replacing "&" with "and", "/" with " ", removing extra spaces, and removing numbers."""
-    name = name.replace("&", "and").replace("/", " ").replace("-", " ").strip()
-    name = re.sub(r'\s+', ' ', name)  # Replace multiple spaces with a single space
-    name = re.sub(r'\d', '', name)  # Remove numbers
-    return name
-
-# Function to parse names
-def parse_name(name):
-    """Parses a name into its components using the HumanName library."""
-    human_name = HumanName(name)
-    if human_name.last == '':
-        return name.strip()
-    else:
-        return f'{human_name.last}, {human_name.first}'.strip()
-
-# Function to handle team names
-print("Handling team names...")
-def handle_team_names(name):
-    """Handles team names to ensure that 'Team' is always at the beginning."""
-    if "team" in name.lower():
-        name = re.sub(r'\bteam\b', '', name, flags=re.I).strip()  # Remove 'team' from the name, ignoring case
-        name = re.sub(r'\bthe\b', '', name, flags=re.I).strip()  # Remove 'the' from the name, ignoring case
-        # Handle different formats of team names
-        if ',' in name:
-            name_parts = name.split(',')
-            for i, part in enumerate(name_parts):
-                if "team" in part.lower():
-                    name_parts[i] = ''
-            name_parts = [part.strip() for part in name_parts if part.strip() != '']
-            if len(name_parts) > 1:
-                name = 'Team ' + ' '.join(name_parts)  # Remove commas from team names
-            else:
-                name = 'Team ' + name_parts[0]
-        else:
-            name = f'Team {name}'
-        return name
-    else:
-        return parse_name(name)
-
 # Function to determine entry type
 def determine_entry_type(place):
     if place == 'DMG':
@@ -63,33 +22,32 @@ def determine_entry_type(place):
     else:
         return 'official'
 
-# Preprocess the names
-pumpkins_df['Processed Name'] = pumpkins_df['Grower Name'].apply(preprocess_name)
-
-# Handle team names
-pumpkins_df['Processed Name'] = pumpkins_df['Processed Name'].apply(handle_team_names)
+# Growers resolved by an earlier run keep their canonical name; only new ones are processed
+name_cache = NameResolutionCache(NAME_RULES_VERSION)
+name_keys = list(zip(pumpkins_df['Grower Name'].astype(str), pumpkins_df['State/Prov'].astype(str)))
+cached = name_cache.lookup(set(name_keys))
+is_new = pd.Series([key not in cached for key in name_keys], index=pumpkins_df.index)
+print(f"{int((~is_new).sum())} of {len(pumpkins_df)} rows resolved from the name cache")
+pumpkins_df['Processed Name'] = [cached[key].canonical_name if key in cached else None for key in name_keys]
 
-# Convert to title case
-print("Converting names to title case...")
-pumpkins_df['Processed Name'] = pumpkins_df['Processed Name'].str.title()
+# Normalize the names: each unique raw name is cleaned, team names get a "Team" prefix and
+# people become "Last, First", in title case
+print("Preprocessing names...")
+pumpkins_df.loc[is_new, 'Processed Name'] = normalize_names(pumpkins_df.loc[is_new, 'Grower Name'])
+normalized_names = pumpkins_df['Processed Name'].tolist()
+unresolved = set(pumpkins_df.loc[is_new, 'Processed Name'])
 
 # Split processed names into first and last names
 print("Splitting names into first and last names...")
-pumpkins_df[['Last Name', 'First Name']] = pumpkins_df['Processed Name'].apply(
-    lambda name: pd.Series([name, ""]) if "Team" in name else pd.Series(name.split(',', 1))
-)
-
-# Clean up the 'Last Name' and 'First Name' columns by removing extra spaces
-pumpkins_df['Last Name'] = pumpkins_df['Last Name'].str.strip().str.title()  # Convert to title case
-pumpkins_df['First Name'] = pumpkins_df['First Name'].str.strip().str.title()  # Convert to title case
+pumpkins_df[['Last Name', 'First Name']] = split_names(pumpkins_df['Processed Name'])
 
 # Count the frequency of each name
 print("Counting the frequency of each name...")
-name_counter = Counter(pumpkins_df['Processed Name'])
+name_counts = pumpkins_df['Processed Name'].value_counts()
 
-# Perform fuzzy matching and store results in a dictionary
+# Perform fuzzy matching, collecting every matched pair that involves a name not resolved before
 print("Performing fuzzy matching...")
-fuzzy_matched_names = {}
+matched_pairs = []
 
 # Get a list of unique processed names by state/province
 state_provs = pumpkins_df['State/Prov'].unique().tolist()
@@ -97,57 +55,27 @@ for state_prov in state_provs:
     state_prov_df = pumpkins_df[pumpkins_df['State/Prov'] == state_prov]
     processed_names = state_prov_df['Processed Name'].unique().tolist()
 
-    for name in processed_names:
-        # Initialize an empty list to store the matches for each name
-        matches = []
-
-        # Compare each name to all other names within the same state/province
-        for other_name in processed_names:
-            # If the similarity score is above 80 (lower threshold) and the names are not identical
-            if fuzz.token_sort_ratio(name, other_name) > 80 and name != other_name:
-                matches.append(other_name)
-
-        # If any matches were found, add them to the dictionary
-        if matches:
-            # Determine the most common name in the list of matches (including the current name)
-            most_common_names = [name for name, count in Counter(matches + [name]).items() if count == max(name_counter.values())]
-            most_common_name = min(most_common_names) if most_common_names else name  # Choose the lexographically smallest name or use original name if no matches
-            fuzzy_matched_names[most_common_name] = matches
+    # Score every pair within the state/province at once (lower threshold of 80)
+    state_matches = cdist_fuzzy_matching(processed_names, threshold=80)
+    matched_pairs += [(a, b) for a, b in match_pairs(state_matches) if a in unresolved or b in unresolved]
 
 # Compare each name to all other names across different states/provinces with higher threshold
 processed_names = pumpkins_df['Processed Name'].unique().tolist()
-for name in processed_names:
-    # Initialize an empty list to store the matches for each name
-    matches = []
-
-    # Compare each name to all other names
-    for other_name in processed_names:
-        # If the similarity score is above 90 (higher threshold) and the names are not identical
-        if fuzz.token_sort_ratio(name, other_name) > 90 and name != other_name:
-            matches.append(other_name)
-
-    # If any matches were found, add them to the dictionary
-    if matches and name not in fuzzy_matched_names:  # Avoid overriding the matches found with lower threshold
-        # Determine the most common name in the list of matches (including the current name)
-        most_common_names = [name for name, count in Counter(matches + [name]).items() if count == max(name_counter.values())]
-        most_common_name = min(most_common_names) if most_common_names else name  # Choose the lexographically smallest name or use original name if no matches
-        fuzzy_matched_names[most_common_name] = matches
-
-# Now we standardize the names in the original dataframe based on the fuzzy matches
+all_matches = cdist_fuzzy_matching(processed_names, threshold=90)
+matched_pairs += [(a, b) for a, b in match_pairs(all_matches) if a in unresolved or b in unresolved]
+
+# Merge the matches into clusters and give each cluster its most common name
 print("Standardizing names based on fuzzy matches...")
-for most_common_name, matches in fuzzy_matched_names.items():
-    for match in matches:
-        pumpkins_df.loc[pumpkins_df['Processed Name'] == match, 'Processed Name'] = most_common_name
+canonical_names = resolve_clusters(matched_pairs, name_counts)
+pumpkins_df['Processed Name'] = apply_clusters(pumpkins_df['Processed Name'], canonical_names)
+
+# Remember the resolutions for the next run
+name_cache.store(changed_resolutions(name_keys, normalized_names, pumpkins_df['Processed Name'], cached))
+name_cache.close()
 
 # Split updated processed names into first and last names again
 print("Splitting updated names into first and last names...")
-pumpkins_df[['Last Name', 'First Name']] = pumpkins_df['Processed Name'].apply(
-    lambda name: pd.Series([name, ""]) if "Team" in name else pd.Series(name.split(',', 1))
-)
-
-# Clean up the 'Last Name' and 'First Name' columns by removing extra spaces
-pumpkins_df['Last Name'] = pumpkins_df['Last Name'].str.strip().str.title()  # Convert to title case
-pumpkins_df['First Name'] = pumpkins_df['First Name'].str.strip().str.title()  # Convert to title case
+pumpkins_df[['Last Name', 'First Name']] = split_names(pumpkins_df['Processed Name'])
 
 # Add 'entryType' column
 pumpkins_df['entryType'] = pumpkins_df['Place'].apply(determine_entry_type)
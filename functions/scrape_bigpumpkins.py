@@ -1,50 +1,85 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import asyncio
 import pandas as pd
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+from page_fetcher import ArchiveFetcher, PageFetcher, results_url
+from page_cache import PageCache
+from page_archive import PageArchive, DEFAULT_ARCHIVE_DIR
+from scrape_fixtures import FixtureRecorder, DEFAULT_FIXTURES_DIR
+from table_extractor import extract_first_table
 
 # List of years to scrape. Note: To include 2023, the range is set to 2024 because range() excludes the end value.
 years = list(range(2005, 2025))
 
-# List to hold all the data
-all_data = []
+def parse_table(content, encoding=None):
+    """Parse the results table into headers and row lists."""
+    headers, rows = extract_first_table(content, encoding) or ([], [])
+    data = [row for row in rows if len(row) == len(headers)]
+    return {"headers": headers, "data": data}
 
-for year in years:
+async def scrape_year(fetcher, cache, parse_executor, year):
+    """Fetch one year through the page cache, re-using parsed rows when the page is unchanged."""
     # URL of the page to scrape
-    url = f"http://www.bigpumpkins.com/WeighoffResultsGPC.aspx?c=P&y={year}"
+    url = results_url("P", year, fetcher.base_url)
     
-    # Send HTTP request
-    response = requests.get(url)
+    # Send HTTP request (or revalidate the cached copy)
+    page = await fetcher.fetch_page(url, year)
     
-    # Parse HTML content
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    # Find the table
-    table = soup.find('table')
-    
-    # Extract table headers
-    headers = [th.text for th in table.find_all('th')]
-    
-    # Extract table rows
-    rows = table.find_all('tr')
-    data = []
-    for row in rows[1:]:
-        row_data = [td.text for td in row.find_all('td')]
-        if len(row_data) == len(headers):
-            data.append(row_data)
+    parsed = cache.load_rows(page.body_hash) if cache is not None else None
+    if parsed is None:
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(parse_executor, parse_table, page.content, page.encoding)
+        if cache is not None:
+            cache.store_rows(page.body_hash, parsed)
     
     # Create a dataframe
-    df = pd.DataFrame(data, columns=headers)
+    df = pd.DataFrame(parsed["data"], columns=parsed["headers"])
     df['Year'] = year  # Add the year column
     
-    # Append the dataframe to the list
-    all_data.append(df)
-
     # Print a message indicating that the year has been processed
-    print(f"Finished processing data for {year}")
+    status = "changed" if page.changed else "unchanged"
+    print(f"Finished processing data for {year} ({status})")
+    fetcher.mark_processed(page)
+    return df
+
+async def main():
+    parser = argparse.ArgumentParser(description="Scrape Atlantic Giant results to CSV")
+    parser.add_argument("--record", nargs="?", const=DEFAULT_FIXTURES_DIR, default=None, metavar="DIR",
+                        help="Save every fetched page as a replay fixture")
+    parser.add_argument("--from-archive", nargs="?", const=DEFAULT_ARCHIVE_DIR, default=None, metavar="DIR",
+                        help="Rebuild the CSV from archived pages instead of fetching")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="Do not add fetched pages to the compressed raw-page archive")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor() as parse_executor:
+        if args.from_archive:
+            archive = PageArchive(args.from_archive)
+            fetcher = ArchiveFetcher(archive)
+            archived_years = [year for category, year in fetcher.tasks() if category == "P" and year in years]
+            all_data = await asyncio.gather(
+                *(scrape_year(fetcher, None, parse_executor, year) for year in archived_years)
+            )
+            archive.close()
+        else:
+            cache = PageCache(consumer="bigpumpkins_csv")
+            archive = None if args.no_archive else PageArchive()
+            recorder = FixtureRecorder(args.record) if args.record else None
+            async with PageFetcher(cache=cache, recorder=recorder, archive=archive) as fetcher:
+                # List to hold all the data
+                all_data = await asyncio.gather(
+                    *(scrape_year(fetcher, cache, parse_executor, year) for year in years)
+                )
+            cache.close()
+            if archive is not None:
+                archive.close()
+
+    # Concatenate all the dataframes
+    all_data = pd.concat(all_data, ignore_index=True)
 
-# Concatenate all the dataframes
-all_data = pd.concat(all_data, ignore_index=True)
+    # Save the dataframe to a CSV file with today's date
+    all_data.to_csv(f'bigpumpkins_2004_2024_{datetime.date.today()}.csv', index=False)
 
-# Save the dataframe to a CSV file with today's date
-all_data.to_csv(f'bigpumpkins_2004_2024_{datetime.date.today()}.csv', index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_fixtures")
+
+def fixture_key(url: str) -> str:
+    """Key a page by path and query so fixtures replay under any host."""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+class FixtureRecorder:
+    """Saves every fetched page, plus a manifest, for later offline replay."""
+
+    def __init__(self, fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.pages_dir = self.fixtures_dir / "pages"
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.fixtures_dir / "manifest.json"
+        self.manifest = load_manifest(str(self.fixtures_dir))
+
+    def record(self, url: str, content: bytes) -> None:
+        """Save one page body and update the manifest."""
+        key = fixture_key(url)
+        filename = f"{hashlib.sha1(key.encode()).hexdigest()}.html"
+        (self.pages_dir / filename).write_bytes(content)
+        self.manifest[key] = {
+            "file": filename,
+            "bytes": len(content),
+            "recorded_at": datetime.now().isoformat()
+        }
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+def load_manifest(fixtures_dir: str) -> Dict[str, Dict]:
+    """Load the fixture manifest, or an empty one if nothing has been recorded yet."""
+    manifest_path = Path(fixtures_dir) / "manifest.json"
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+class ReplayServer:
+    """Local HTTP server that serves recorded pages back with simulated latency and jitter."""
+
+    def __init__(self, fixtures_dir: str = DEFAULT_FIXTURES_DIR, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.manifest = load_manifest(fixtures_dir)
+        if not self.manifest:
+            raise ValueError(f"No recorded fixtures found in {fixtures_dir}")
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._bodies = {
+            key: (self.fixtures_dir / "pages" / entry["file"]).read_bytes()
+            for key, entry in self.manifest.items()
+        }
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self) -> float:
+        """Pick the simulated server latency for one request."""
+        with self._random_lock:
+            offset = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + offset)
+
+    def start(self) -> "ReplayServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def serve_forever(self) -> None:
+        """Serve in the foreground until interrupted."""
+        self._server.serve_forever()
+
+    def _handler_class(self):
+        replay = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients keep connections alive the way they would against the real site
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                time.sleep(replay.delay())
+                body = replay._bodies.get(fixture_key(self.path))
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return ReplayHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded bigpumpkins.com pages locally")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Directory written by --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean added latency per request, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency, in seconds")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixtures, args.host, args.port, args.latency, args.jitter)
+    print(f"Replaying {len(server.manifest)} pages at {server.base_url} "
+          f"(latency {args.latency}s +/- {args.jitter}s)")
+    print(f"Point the scrapers at it with BIGPUMPKINS_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,33 @@ import logging
 from datetime import datetime
 import json
 import asyncio
-from typing import Dict, List, Any
+import argparse
+import hashlib
+import time
+from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 from supabase import create_client
 from postgrest import AsyncPostgrestClient
 from tqdm import tqdm
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import Executor, ProcessPoolExecutor
+from page_fetcher import (
+    ArchiveFetcher, Page, PageFetcher, FetchError, results_url, BASE_URL, DEFAULT_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+)
+from page_cache import PageCache
+from page_archive import PageArchive, DEFAULT_ARCHIVE_DIR
+from table_extractor import Table, extract_first_table
+from scrape_fixtures import FixtureRecorder, DEFAULT_FIXTURES_DIR
+from pg_loader import CopyLoader
+from batch_planner import BatchPlanner
 
 # Setup logging - only show WARNING and above for httpx
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.basicConfig(level=logging.INFO)
 
+async def execute_sql(supabase, query: str):
+    """Run a query through the execute_sql RPC without blocking the event loop."""
+    return await asyncio.to_thread(supabase.rpc('execute_sql', {'query': query}).execute)
+
 async def test_supabase_connection(supabase) -> bool:
     """Test Supabase connection and permissions."""
     try:
@@ -30,6 +45,93 @@ async def test_supabase_connection(supabase) -> bool:
         print(f"Type of error: {type(e)}")
         return False
 
+RAW_TABLE_COLUMNS = [
+    "place", "weight_lbs", "grower_name", "city", "state_prov",
+    "country", "gpc_site", "seed_mother", "pollinator_father",
+    "ott", "est_weight", "pct_chart", "row_key", "row_hash"
+]
+
+RAW_NUMERIC_COLUMNS = {"weight_lbs", "ott", "est_weight", "pct_chart"}
+
+RAW_TABLE_DDL = """
+CREATE TABLE {if_not_exists} raw_data.{table_name} (
+    id BIGSERIAL PRIMARY KEY,
+    place VARCHAR(10),
+    weight_lbs DECIMAL(10,2),
+    grower_name VARCHAR(255),
+    city VARCHAR(100),
+    state_prov VARCHAR(100),
+    country VARCHAR(100),
+    gpc_site VARCHAR(255),
+    seed_mother VARCHAR(255),
+    pollinator_father VARCHAR(255),
+    ott DECIMAL(10,1),
+    est_weight DECIMAL(10,2),
+    pct_chart DECIMAL(10,1),
+    row_key TEXT,
+    row_hash TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+ALTER TABLE raw_data.{table_name} ADD COLUMN IF NOT EXISTS row_key TEXT;
+ALTER TABLE raw_data.{table_name} ADD COLUMN IF NOT EXISTS row_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_row_key_idx ON raw_data.{table_name} (row_key);
+"""
+
+def to_number(value: str, default: Optional[float] = None) -> Optional[float]:
+    """Convert a scraped number like '1,234.5' to a float."""
+    cleaned = (value or '').replace(',', '').strip()
+    if not cleaned:
+        return default
+    try:
+        return float(cleaned)
+    except ValueError:
+        return default
+
+def sql_literal(value: Any) -> str:
+    """Render a Python value as a SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def raw_records(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convert scraped rows to raw table records with a stable row key and a content hash.
+
+    The key identifies a grower's Nth entry at a site within the page, so corrections to weight,
+    place or genetics show up as updates rather than as a delete plus an insert.
+    """
+    records = []
+    occurrences = {}
+    for row in data['data']:
+        record = {
+            "place": row['Place'],
+            "weight_lbs": to_number(row['Weight (lbs)']),
+            "grower_name": row['Grower Name'],
+            "city": row['City'],
+            "state_prov": row['State/Prov'],
+            "country": row['Country'],
+            "gpc_site": row['GPC Site'],
+            "seed_mother": row['Seed (Mother)'],
+            "pollinator_father": row['Pollinator (Father)'],
+            "ott": to_number(row['OTT'], 0),
+            "est_weight": to_number(row['Est. Weight'], 0),
+            "pct_chart": to_number(row['Pct. Chart'], 0)
+        }
+        identity = (record["grower_name"].strip().lower(), record["gpc_site"].strip().lower())
+        occurrence = occurrences.get(identity, 0)
+        occurrences[identity] = occurrence + 1
+        record["row_key"] = hashlib.sha1("\x1f".join([*identity, str(occurrence)]).encode()).hexdigest()
+        record["row_hash"] = hashlib.sha1(
+            "\x1f".join(str(record[column]) for column in RAW_TABLE_COLUMNS[:12]).encode()
+        ).hexdigest()
+        records.append(record)
+    return records
+
+def render_raw_values(record: Dict[str, Any]) -> str:
+    """Render one raw record as a VALUES tuple in RAW_TABLE_COLUMNS order."""
+    return "(" + ", ".join(sql_literal(record[column]) for column in RAW_TABLE_COLUMNS) + ")"
+
 async def create_raw_table(supabase, category: str, year: int) -> bool:
     """Create a properly structured raw data table for a specific category and year."""
     table_name = f"{category.lower()}_{year}"
@@ -38,30 +140,13 @@ async def create_raw_table(supabase, category: str, year: int) -> bool:
         # Drop the table if it exists (for testing)
         drop_query = f"DROP TABLE IF EXISTS raw_data.{table_name};"
         print(f"\nDropping table if exists: {table_name}")
-        supabase.rpc('execute_sql', {'query': drop_query}).execute()
+        await execute_sql(supabase, drop_query)
         
         # Create new table
-        create_query = f"""
-        CREATE TABLE raw_data.{table_name} (
-            id BIGSERIAL PRIMARY KEY,
-            place VARCHAR(10),
-            weight_lbs DECIMAL(10,2),
-            grower_name VARCHAR(255),
-            city VARCHAR(100),
-            state_prov VARCHAR(100),
-            country VARCHAR(100),
-            gpc_site VARCHAR(255),
-            seed_mother VARCHAR(255),
-            pollinator_father VARCHAR(255),
-            ott DECIMAL(10,1),
-            est_weight DECIMAL(10,2),
-            pct_chart DECIMAL(10,1),
-            created_at TIMESTAMPTZ DEFAULT NOW()
-        );
-        """
+        create_query = RAW_TABLE_DDL.format(if_not_exists="", table_name=table_name)
         
         print(f"Creating table: {table_name}")
-        supabase.rpc('execute_sql', {'query': create_query}).execute()
+        await execute_sql(supabase, create_query)
         print(f"Table {table_name} created successfully")
         return True
         
@@ -69,48 +154,46 @@ async def create_raw_table(supabase, category: str, year: int) -> bool:
         logging.error(f"Error creating table {table_name}: {str(e)}")
         return False
 
-async def insert_data(supabase, category: str, year: int, data: Dict[str, Any]) -> bool:
-    """Insert scraped data into structured table."""
+async def insert_data(supabase, category: str, year: int, data: Dict[str, Any],
+                      copy_loader: Optional[CopyLoader] = None, planner: Optional[BatchPlanner] = None) -> bool:
+    """Insert scraped data into structured table.
+
+    With a CopyLoader the whole page is streamed in one COPY; otherwise rows go through the
+    execute_sql RPC in batches sized by the planner.
+    """
     table_name = f"{category.lower()}_{year}"
     
     try:
         print(f"\nInserting {len(data['data'])} records into {table_name}")
         
+        if copy_loader is not None:
+            count = await asyncio.to_thread(
+                copy_loader.copy_records, 'raw_data', table_name, RAW_TABLE_COLUMNS, raw_records(data)
+            )
+            print(f"Successfully copied all {count} records into {table_name}")
+            return True
+        
         # Build a single INSERT statement with multiple VALUES
-        values_list = []
-        for row in data['data']:
-            # Clean up the weight value (remove commas)
-            weight = row['Weight (lbs)'].replace(',', '')
-            
-            values_list.append(f"""(
-                '{row['Place']}',
-                {weight},
-                '{row['Grower Name'].replace("'", "''")}',
-                '{row['City'].replace("'", "''")}',
-                '{row['State/Prov'].replace("'", "''")}',
-                '{row['Country'].replace("'", "''")}',
-                '{row['GPC Site'].replace("'", "''")}',
-                '{row['Seed (Mother)'].replace("'", "''")}',
-                '{row['Pollinator (Father)'].replace("'", "''")}',
-                {row['OTT'] or 0},
-                {row['Est. Weight'].replace(',', '') if row['Est. Weight'] else 0},
-                {row['Pct. Chart'] or 0}
-            )""")
+        values_list = [render_raw_values(record) for record in raw_records(data)]
         
-        # Create batches of 100 records each
-        batch_size = 100
-        for i in range(0, len(values_list), batch_size):
-            batch = values_list[i:i + batch_size]
+        # Batches are capped by rows and by rendered SQL size
+        planner = planner or BatchPlanner(f"raw_data.{table_name}", initial_rows=100)
+        processed = 0
+        for batch in planner.batches(values_list, size_of=len):
             query = f"""
-            INSERT INTO raw_data.{table_name} (
-                place, weight_lbs, grower_name, city, state_prov, 
-                country, gpc_site, seed_mother, pollinator_father, 
-                ott, est_weight, pct_chart
-            ) VALUES {','.join(batch)};
+            INSERT INTO raw_data.{table_name} ({', '.join(RAW_TABLE_COLUMNS)})
+            VALUES {','.join(batch.records)};
             """
             
-            supabase.rpc('execute_sql', {'query': query}).execute()
-            print(f"Processed {min(i + batch_size, len(values_list))}/{len(values_list)} records")
+            start = time.perf_counter()
+            try:
+                await execute_sql(supabase, query)
+            except Exception:
+                planner.observe(batch, time.perf_counter() - start, ok=False)
+                raise
+            planner.observe(batch, time.perf_counter() - start, ok=True)
+            processed += len(batch.records)
+            print(f"Processed {processed}/{len(values_list)} records")
             
         print(f"Successfully inserted all {len(data['data'])} records into {table_name}")
         return True
@@ -120,83 +203,384 @@ async def insert_data(supabase, category: str, year: int, data: Dict[str, Any])
         print(f"Detailed error: {str(e)}")
         return False
 
-async def scrape_data(category: str, year: int) -> Dict[str, Any]:
-    """Scrape data for a specific category and year."""
-    try:
-        # URL of the page to scrape
-        url = f"http://www.bigpumpkins.com/WeighoffResultsGPC.aspx?c={category}&y={year}"
-        
-        # Send HTTP request
-        response = requests.get(url)
-        
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the table
-        table = soup.find('table')
-        if not table:
-            return None
-            
-        # Extract table headers
-        headers = [th.text for th in table.find_all('th')]
+async def sync_raw_table(supabase, category: str, year: int, data: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Bring a raw table in line with a scraped page by applying only row-level differences.
+
+    Existing row keys and hashes are compared with the scraped page, and the resulting inserts,
+    updates and deletes are sent as one execute_sql call. The RPC runs as a single function call, so
+    the changes commit together and readers never see a missing or half-filled table. A page that
+    parsed to nothing is refused rather than synced, since it would delete every existing row.
+    """
+    if not data:
+        raise ValueError(f"No parsed rows for {category} {year}; refusing to sync an empty page")
+    table_name = f"{category.lower()}_{year}"
+    await execute_sql(supabase, RAW_TABLE_DDL.format(if_not_exists="IF NOT EXISTS", table_name=table_name))
+    
+    existing_rows = await execute_sql(supabase, f"SELECT row_key, row_hash FROM raw_data.{table_name};")
+    existing = {row['row_key']: row['row_hash'] for row in (existing_rows.data or [])}
+    records = {record['row_key']: record for record in raw_records(data)}
+    
+    inserts = [record for key, record in records.items() if key not in existing]
+    updates = [record for key, record in records.items() if key in existing and existing[key] != record['row_hash']]
+    # Rows without a key were written by the old full-refresh path and are replaced wholesale
+    deletes = [key for key in existing if key is None or key not in records]
+    changes = {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+    
+    if not (inserts or updates or deletes):
+        return changes
+    
+    statements = []
+    if deletes:
+        keyed = [key for key in deletes if key is not None]
+        conditions = []
+        if keyed:
+            conditions.append(f"row_key IN ({', '.join(sql_literal(key) for key in keyed)})")
+        if None in deletes:
+            conditions.append("row_key IS NULL")
+        statements.append(f"DELETE FROM raw_data.{table_name} WHERE {' OR '.join(conditions)};")
+    if updates:
+        # VALUES columns that are all NULL come back as text, so numeric columns are cast explicitly
+        assignments = ', '.join(
+            f"{column} = v.{column}::numeric" if column in RAW_NUMERIC_COLUMNS else f"{column} = v.{column}"
+            for column in RAW_TABLE_COLUMNS if column != "row_key"
+        )
+        statements.append(f"""
+            UPDATE raw_data.{table_name} AS t SET {assignments}
+            FROM (VALUES {', '.join(render_raw_values(record) for record in updates)})
+                AS v ({', '.join(RAW_TABLE_COLUMNS)})
+            WHERE t.row_key = v.row_key;
+        """)
+    if inserts:
+        statements.append(f"""
+            INSERT INTO raw_data.{table_name} ({', '.join(RAW_TABLE_COLUMNS)})
+            VALUES {', '.join(render_raw_values(record) for record in inserts)};
+        """)
+    
+    await execute_sql(supabase, "\n".join(statements))
+    return changes
+
+def table_to_records(table: Optional[Table]) -> Optional[Dict[str, Any]]:
+    """Turn an extracted (headers, rows) table into header-keyed records."""
+    if not table:
+        return None
         
-        # Extract table rows
-        rows = table.find_all('tr')
-        data = []
-        for row in rows[1:]:  # Skip header row
-            row_data = [td.text for td in row.find_all('td')]
-            if len(row_data) == len(headers):
-                data.append(dict(zip(headers, row_data)))
+    headers, rows = table
+    data = [dict(zip(headers, row)) for row in rows if len(row) == len(headers)]
+    
+    if not data:
+        return None
         
-        if not data:
+    return {
+        "headers": headers,
+        "data": data
+    }
+
+def parse_results_table(content: bytes, encoding: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Parse the results table out of a WeighoffResultsGPC page."""
+    return table_to_records(extract_first_table(content, encoding))
+
+async def fetch_results_page(fetcher: PageFetcher, category: str, year: int) -> Page:
+    """Fetch the results page for a category and year through the page cache.
+
+    Raises FetchError when the page could not be retrieved, which is reported separately from
+    pages that were fetched but have no results.
+    """
+    url = results_url(category, year, fetcher.base_url)
+    try:
+        return await fetcher.fetch_page(url, year)
+    except FetchError:
+        raise
+    except Exception as e:
+        raise FetchError(f"{type(e).__name__}: {str(e)}") from e
+
+async def scrape_data(page: Page, parse_executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """Parse a fetched results page."""
+    try:
+        # Parse off the event loop (in the process pool when given) so other fetches keep flowing
+        loop = asyncio.get_running_loop()
+        table = await loop.run_in_executor(parse_executor, extract_first_table, page.content, page.encoding)
+        parsed = table_to_records(table)
+        if not parsed:
             return None
             
         return {
-            "headers": headers,
-            "data": data,
-            "url": url,
+            **parsed,
+            "url": page.url,
             "scraped_at": datetime.now().isoformat()
         }
         
     except Exception as e:
-        logging.error(f"Error scraping {category} {year}: {str(e)}")
+        logging.error(f"Error parsing {page.url}: {str(e)}")
         return None
 
-async def scrape_and_store(supabase, category: str, year: int) -> Dict[str, Any]:
-    """Scrape data for a category and year, and store it in Supabase."""
-    result = {
+def new_result(category: str, year: int) -> Dict[str, Any]:
+    """Create the per-task entry used in the scraping report."""
+    return {
         "category": category,
         "year": year,
         "success": False,
+        "unchanged": False,
         "error": None,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "timings": {}
     }
-    
-    try:
-        # Create the table first
-        if not await create_raw_table(supabase, category, year):
-            result["error"] = "Failed to create table"
-            return result
-            
-        # Scrape the data
-        scraped_data = await scrape_data(category, year)
+
+def summarize_stage(durations: List[float], workers: int) -> Dict[str, Any]:
+    """Summarize one stage's per-task durations for the report."""
+    ordered = sorted(durations)
+    return {
+        "workers": workers,
+        "tasks": len(ordered),
+        "total_seconds": round(sum(ordered), 3),
+        "mean_seconds": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p95_seconds": round(ordered[int(0.95 * (len(ordered) - 1))], 3) if ordered else 0.0,
+        "max_seconds": round(ordered[-1], 3) if ordered else 0.0
+    }
+
+class ScrapePipeline:
+    """Bounded-queue fetch → parse → write pipeline over (category, year) tasks.
+
+    Each stage has its own worker count, and the queues between stages are bounded so a slow
+    database stalls fetching instead of piling parsed pages up in memory.
+    """
+
+    STAGES = ("fetch", "parse", "write")
+
+    def __init__(self, supabase, fetcher: PageFetcher, fetch_workers: int, parse_workers: int,
+                 write_workers: int, queue_size: int, force: bool = False,
+                 parse_executor: Optional[Executor] = None, incremental: bool = False,
+                 copy_loader: Optional[CopyLoader] = None):
+        self.supabase = supabase
+        self.fetcher = fetcher
+        self.workers = {"fetch": fetch_workers, "parse": parse_workers, "write": write_workers}
+        self.queue_size = queue_size
+        self.force = force
+        self.parse_executor = parse_executor
+        self.incremental = incremental
+        self.copy_loader = copy_loader
+        self.batch_planners: List[BatchPlanner] = []  # one per write worker; see _write_worker
+        self.row_changes = {}
+        self.durations = {stage: [] for stage in self.STAGES}
+        self.queue_waits = {"parse": [], "write": []}
+
+    async def store(self, category: str, year: int, scraped_data: Optional[Dict[str, Any]],
+                    planner: Optional[BatchPlanner] = None) -> Optional[str]:
+        """Write one parsed page to its raw table, in batches sized by ``planner``; returns an error
+        string on failure."""
+        if self.incremental:
+            # An empty or unparseable page must not wipe the rows scraped on earlier runs
+            if not scraped_data:
+                return "No data parsed; raw table left unchanged"
+            try:
+                self.row_changes[(category, year)] = await sync_raw_table(self.supabase, category, year, scraped_data)
+            except Exception as e:
+                logging.error(f"Error syncing raw_data.{category.lower()}_{year}: {str(e)}")
+                return "Failed to sync table"
+            return None
         
+        # Create the table (empty years still get one so downstream reads succeed)
+        if not await create_raw_table(self.supabase, category, year):
+            return "Failed to create table"
         if not scraped_data:
-            result["error"] = "No data found"
-            return result
-        
-        # Insert the scraped data
-        if await insert_data(supabase, category, year, scraped_data):
-            result["success"] = True
-        else:
-            result["error"] = "Failed to insert data"
-            
-    except Exception as e:
-        result["error"] = str(e)
-        
-    return result
+            return None
+        if not await insert_data(self.supabase, category, year, scraped_data, self.copy_loader, planner):
+            return "Failed to insert data"
+        return None
+
+    async def run(self, tasks: List[tuple], on_result) -> Dict[str, Any]:
+        """Run every task through the pipeline, calling ``on_result`` as each one finishes."""
+        task_queue = asyncio.Queue()
+        parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue = asyncio.Queue(maxsize=self.queue_size)
+        for task in tasks:
+            task_queue.put_nowait(task)
+
+        fetchers = [asyncio.create_task(self._fetch_worker(task_queue, parse_queue, on_result))
+                    for _ in range(self.workers["fetch"])]
+        parsers = [asyncio.create_task(self._parse_worker(parse_queue, write_queue, on_result))
+                   for _ in range(self.workers["parse"])]
+        writers = [asyncio.create_task(self._write_worker(write_queue, on_result))
+                   for _ in range(self.workers["write"])]
+
+        # Drain stage by stage: a stage only stops once everything upstream has finished
+        await asyncio.gather(*fetchers)
+        for _ in parsers:
+            await parse_queue.put(None)
+        await asyncio.gather(*parsers)
+        for _ in writers:
+            await write_queue.put(None)
+        await asyncio.gather(*writers)
+
+        timings = {stage: summarize_stage(self.durations[stage], self.workers[stage]) for stage in self.STAGES}
+        for stage, waits in self.queue_waits.items():
+            timings[stage]["queue_wait_seconds"] = round(sum(waits), 3)
+        timings["queue_size"] = self.queue_size
+        return timings
+
+    async def _fetch_worker(self, task_queue: asyncio.Queue, parse_queue: asyncio.Queue, on_result) -> None:
+        while True:
+            try:
+                category, year = task_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            result = new_result(category, year)
+            start = time.perf_counter()
+            result["started_at"] = start
+            try:
+                page = await fetch_results_page(self.fetcher, category, year)
+            except FetchError as e:
+                logging.error(f"Error fetching {category} {year}: {str(e)}")
+                page = None
+                result["error"] = f"Fetch failed: {str(e)}"
+            result["timings"]["fetch"] = round(time.perf_counter() - start, 3)
+            self.durations["fetch"].append(result["timings"]["fetch"])
+
+            if page is None:
+                self._finish(result, on_result)
+            elif not page.changed and not self.force:
+                # Unchanged pages never reach the parse or write stages
+                result["success"] = True
+                result["unchanged"] = True
+                self._finish(result, on_result)
+            else:
+                # Blocks when parsers fall behind, which is the backpressure on fetching
+                await parse_queue.put((result, page, time.perf_counter()))
+
+    async def _parse_worker(self, parse_queue: asyncio.Queue, write_queue: asyncio.Queue, on_result) -> None:
+        while True:
+            item = await parse_queue.get()
+            if item is None:
+                return
+            result, page, queued_at = item
+            self.queue_waits["parse"].append(time.perf_counter() - queued_at)
+
+            start = time.perf_counter()
+            scraped_data = await scrape_data(page, self.parse_executor)
+            result["timings"]["parse"] = round(time.perf_counter() - start, 3)
+            self.durations["parse"].append(result["timings"]["parse"])
+
+            await write_queue.put((result, page, scraped_data, time.perf_counter()))
+
+    async def _write_worker(self, write_queue: asyncio.Queue, on_result) -> None:
+        # Each writer tunes its own batch sizes, so concurrent writers don't steer each other's targets
+        planner = BatchPlanner(f"raw_data writer {len(self.batch_planners) + 1}", initial_rows=100)
+        self.batch_planners.append(planner)
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            result, page, scraped_data, queued_at = item
+            self.queue_waits["write"].append(time.perf_counter() - queued_at)
+
+            start = time.perf_counter()
+            try:
+                error = await self.store(result["category"], result["year"], scraped_data, planner)
+            except Exception as e:
+                error = str(e)
+            result["timings"]["write"] = round(time.perf_counter() - start, 3)
+            self.durations["write"].append(result["timings"]["write"])
+            if (result["category"], result["year"]) in self.row_changes:
+                result["row_changes"] = self.row_changes.pop((result["category"], result["year"]))
+
+            if error:
+                result["error"] = error
+            elif scraped_data:
+                # Only a page that parsed and stored is skipped next run; anything else is retried
+                self.fetcher.mark_processed(page)
+                result["success"] = True
+            else:
+                result["error"] = "No data found"
+            self._finish(result, on_result)
+
+    def _finish(self, result: Dict[str, Any], on_result) -> None:
+        # End-to-end latency for the page, including time spent waiting in queues
+        result["timings"]["total"] = round(time.perf_counter() - result.pop("started_at"), 3)
+        on_result(result)
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line options for the scraper."""
+    parser = argparse.ArgumentParser(description="Scrape GPC weigh-off results into Supabase")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("SCRAPE_CONCURRENCY", DEFAULT_CONCURRENCY)),
+        help="Initial number of pages fetched at once"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=int(os.getenv("SCRAPE_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        help="Ceiling for the adaptive fetch concurrency"
+    )
+    parser.add_argument(
+        "--fixed-concurrency",
+        action="store_true",
+        help="Keep fetch concurrency at --concurrency instead of adapting it"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk page cache and download every page"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-parse and re-store pages even when they are unchanged since the last run"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Parse workers; also sizes the parser process pool (defaults to one per CPU)"
+    )
+    parser.add_argument(
+        "--write-workers",
+        type=int,
+        default=4,
+        help="Concurrent raw-table writers"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="Maximum pages waiting between pipeline stages"
+    )
+    parser.add_argument(
+        "--base-url",
+        default=BASE_URL,
+        help="Site to scrape; point at scrape_fixtures.py to replay recorded pages"
+    )
+    parser.add_argument(
+        "--record",
+        nargs="?",
+        const=DEFAULT_FIXTURES_DIR,
+        default=None,
+        metavar="DIR",
+        help="Save every fetched page as a replay fixture"
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Do not add fetched pages to the compressed raw-page archive"
+    )
+    parser.add_argument(
+        "--from-archive",
+        nargs="?",
+        const=DEFAULT_ARCHIVE_DIR,
+        default=None,
+        metavar="DIR",
+        help="Rebuild raw tables from archived pages instead of fetching"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Apply row-level inserts/updates/deletes instead of dropping and recreating raw tables"
+    )
+    return parser.parse_args()
 
 async def main():
+    args = parse_args()
     load_dotenv()
     
     supabase_url = os.getenv("SUPABASE_URL")
@@ -219,6 +603,11 @@ async def main():
         
     print("\nConnection and permissions verified. Starting scrape...")
     
+    # Bulk loads use COPY over a direct connection when a database URL is configured
+    copy_loader = CopyLoader.from_env()
+    if copy_loader is not None:
+        print(f"Writing raw tables with COPY ({copy_loader.copy_format})")
+    
     # Define categories and years
     categories = ["P", "S", "L", "W", "T", "F", "B", "M"]
     years = range(2005, 2025)
@@ -231,22 +620,72 @@ async def main():
         "start_time": datetime.now().isoformat(),
         "successful_scrapes": [],
         "failed_scrapes": [],
-        "empty_results": []
+        "empty_results": [],
+        "unchanged_results": []
     }
     
-    # Process all combinations with progress bar
-    with tqdm(total=len(tasks), desc="Scraping progress") as pbar:
-        for category_code, year in tasks:
-            result = await scrape_and_store(supabase, category_code, year)
-            
-            if result["success"]:
-                results["successful_scrapes"].append(result)
-            elif result["error"] == "No data found":
-                results["empty_results"].append(result)
-            else:
-                results["failed_scrapes"].append(result)
-                
-            pbar.update(1)
+    def record_result(result: Dict[str, Any], pbar: tqdm) -> None:
+        if result["unchanged"]:
+            results["unchanged_results"].append(result)
+        elif result["success"]:
+            results["successful_scrapes"].append(result)
+        elif result["error"] == "No data found":
+            results["empty_results"].append(result)
+        else:
+            results["failed_scrapes"].append(result)
+        pbar.update(1)
+    
+    # Fetch, parse and write overlap; bounded queues between the stages keep memory flat
+    parse_workers = args.parse_workers or os.cpu_count() or 1
+    max_concurrency = args.concurrency if args.fixed_concurrency else max(args.concurrency, args.max_concurrency)
+    
+    async def run_pipeline(fetcher, fetch_workers: int, force: bool) -> None:
+        pipeline = ScrapePipeline(
+            supabase,
+            fetcher,
+            fetch_workers=fetch_workers,
+            parse_workers=parse_workers,
+            write_workers=args.write_workers,
+            queue_size=args.queue_size,
+            force=force,
+            parse_executor=parse_executor,
+            incremental=args.incremental,
+            copy_loader=copy_loader
+        )
+        with tqdm(total=len(tasks), desc="Scraping progress") as pbar:
+            results["stage_timings"] = await pipeline.run(tasks, lambda result: record_result(result, pbar))
+        results["fetch_stats"] = fetcher.stats()
+        results["batch_sizes"] = {planner.name: planner.summary() for planner in pipeline.batch_planners}
+    
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_executor:
+        if args.from_archive:
+            # Rebuild raw tables from archived pages at disk speed, without touching the network
+            archive = PageArchive(args.from_archive)
+            archive_fetcher = ArchiveFetcher(archive, base_url=args.base_url)
+            archived_tasks = set(archive_fetcher.tasks())
+            tasks = [task for task in tasks if task in archived_tasks]
+            print(f"Reparsing {len(tasks)} archived pages with {parse_workers} parsers, "
+                  f"{args.write_workers} writers")
+            await run_pipeline(archive_fetcher, parse_workers, force=True)
+            archive.close()
+        else:
+            print(f"Running with {args.concurrency}-{max_concurrency} fetchers, {parse_workers} parsers, "
+                  f"{args.write_workers} writers")
+            cache = None if args.no_cache else PageCache(consumer="gpc_raw_tables")
+            archive = None if args.no_archive else PageArchive()
+            recorder = FixtureRecorder(args.record) if args.record else None
+            async with PageFetcher(concurrency=args.concurrency, cache=cache, recorder=recorder,
+                                   base_url=args.base_url, max_concurrency=max_concurrency,
+                                   adaptive=not args.fixed_concurrency, archive=archive) as fetcher:
+                # One fetch worker per possible slot; the adaptive limiter decides how many are active
+                await run_pipeline(fetcher, max_concurrency, force=args.force)
+            if cache is not None:
+                cache.close()
+            if archive is not None:
+                archive.close()
+    
+    if copy_loader is not None:
+        copy_loader.close()
     
     # Add summary statistics
     results["end_time"] = datetime.now().isoformat()
@@ -255,6 +694,7 @@ async def main():
     results["total_successful"] = len(results["successful_scrapes"])
     results["total_failed"] = len(results["failed_scrapes"])
     results["total_empty"] = len(results["empty_results"])
+    results["total_unchanged"] = len(results["unchanged_results"])
     
     # Save detailed report
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -267,6 +707,15 @@ async def main():
     print(f"Successful scrapes: {results['total_successful']}")
     print(f"Failed scrapes: {results['total_failed']}")
     print(f"Empty results: {results['total_empty']}")
+    print(f"Unchanged (skipped): {results['total_unchanged']}")
+    if results['fetch_stats'].get('source') == 'archive':
+        print(f"Pages read from the archive: {results['fetch_stats']['pages']}")
+    else:
+        print(f"Fetch concurrency settled at {results['fetch_stats']['final_concurrency']} "
+              f"({results['fetch_stats']['retries']} retries)")
+    for stage in ScrapePipeline.STAGES:
+        timing = results["stage_timings"][stage]
+        print(f"{stage.title()} stage: {timing['total_seconds']}s busy across {timing['workers']} workers")
     print(f"Detailed report saved to: {report_filename}")
 
 if __name__ == "__main__":
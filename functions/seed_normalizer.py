@@ -0,0 +1,143 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from name_normalizer import NAME_CACHE_SIZE
+
+SEED_MATCH_THRESHOLD = 85  # grower-token similarity for the fuzzy fallback within a weight block
+
+# Parent fields that name no lineage at all
+NO_SEED = frozenset({"", "unknown", "open", "open pollinated", "op", "self", "selfed", "sib", "sibbed",
+                     "none", "na", "n a", "x"})
+
+_WEIGHT = re.compile(r"^(\d{3,4})(?:[.,]\d+)?\b")
+_THOUSANDS = re.compile(r"^(\d{1,2}),(\d{3})\b")  # "1,234 smith": a separator, not a decimal comma
+_YEAR = re.compile(r"^(?:19[89]\d|20[0-4]\d)$")
+_SHORT_YEAR = re.compile(r"^'(\d{2})$")
+_TOKEN = re.compile(r"'?\d+(?:\.\d+)?|[a-z]+")
+_CROSS = re.compile(r"\s+x\s+")
+
+@dataclass(frozen=True)
+class SeedName:
+    """A parent seed parsed into its weight, grower and (when given) year tokens.
+
+    Seeds are named after the pumpkin they came from, "<weight> <grower>" with an optional year,
+    so "2009 Wallace", "2009.5 Wallace" and "2009 wallace" all parse to weight 2009, grower
+    "wallace". Anything that doesn't fit that shape keeps its cleaned text as the grower and
+    no weight.
+    """
+    weight: Optional[int]
+    grower: str
+    year: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        if self.weight is None:
+            return f"t:{self.grower}"
+        return f"{self.weight}:{self.grower}" + (f":{self.year}" if self.year else "")
+
+def _year(token: str) -> Optional[int]:
+    if _YEAR.match(token):
+        return int(token)
+    short = _SHORT_YEAR.match(token)
+    if short:
+        year = int(short.group(1))
+        return 2000 + year if year < 50 else 1900 + year
+    return None
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def parse_seed(name: str) -> Optional[SeedName]:
+    """Weight, grower and year of a raw seed name, or None for open, self, sib and unknown parents.
+
+    >>> parse_seed("2009 Wallace")
+    SeedName(weight=2009, grower='wallace', year=None)
+    >>> parse_seed("1,234 Smith '08")
+    SeedName(weight=1234, grower='smith', year=2008)
+    >>> parse_seed("2,009.5 Wallace") == parse_seed("2009,5 wallace")
+    True
+    """
+    text = " ".join(name.lower().replace("’", "'").split())
+    text = _THOUSANDS.sub(r"\1\2", text)
+    tokens = _TOKEN.findall(text)
+    if " ".join(tokens) in NO_SEED:
+        return None
+    weight = _WEIGHT.match(text)
+    if not weight or _CROSS.search(text):
+        # Not "<weight> <grower>" (or a whole cross in one field): match on the cleaned text only
+        return SeedName(None, " ".join(tokens))
+    year = None
+    grower = []
+    for token in tokens[1:]:
+        token_year = _year(token)
+        if token_year and year is None:
+            year = token_year
+        elif token[0].isalpha():
+            grower.append(token)
+    return SeedName(int(weight.group(1)), " ".join(grower), year)
+
+@dataclass
+class Seed:
+    """One canonical seed: its integer id, display name and parsed parts."""
+    seed_id: int
+    name: str
+    parsed: SeedName
+
+class SeedIndex:
+    """Canonical seed dictionary keyed on (weight, grower), with years kept apart when both are known.
+
+    Lookups try the exact weight and grower first, then fuzzy match the grower tokens against the
+    seeds of the same weight, so "2009 Walace" finds "2009 Wallace" without ever comparing seeds
+    of different weights. Names that match nothing become new seeds with the next integer id.
+    """
+
+    def __init__(self, threshold: int = SEED_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.seeds: List[Seed] = []
+        self._by_key: Dict[Tuple[Optional[int], str], List[Seed]] = {}
+        self._growers: Dict[Optional[int], List[str]] = {}  # weight -> grower tokens indexed at it
+
+    def _compatible(self, weight: Optional[int], grower: str, year: Optional[int]) -> Optional[Seed]:
+        for seed in self._by_key.get((weight, grower), ()):
+            if year is None or seed.parsed.year is None or seed.parsed.year == year:
+                return seed
+        return None
+
+    def find(self, parsed: SeedName) -> Optional[Seed]:
+        """Indexed seed ``parsed`` belongs to, if any."""
+        seed = self._compatible(parsed.weight, parsed.grower, parsed.year)
+        if seed is not None or parsed.weight is None or not parsed.grower:
+            return seed
+        for grower, _, _ in process.extract(parsed.grower, self._growers.get(parsed.weight, []),
+                                            scorer=fuzz.ratio, score_cutoff=self.threshold, limit=None):
+            seed = self._compatible(parsed.weight, grower, parsed.year)
+            if seed is not None:
+                return seed
+        return None
+
+    def add(self, name: str, parsed: SeedName) -> Seed:
+        """Index a new canonical seed displayed as ``name``."""
+        seed = Seed(len(self.seeds) + 1, name, parsed)
+        self.seeds.append(seed)
+        key = (parsed.weight, parsed.grower)
+        if key not in self._by_key:
+            self._growers.setdefault(parsed.weight, []).append(parsed.grower)
+        self._by_key.setdefault(key, []).append(seed)
+        return seed
+
+    def resolve(self, counts: Mapping[str, int]) -> Dict[str, int]:
+        """Seed id for each raw name that names a lineage.
+
+        Names are placed most common first, so the usual spelling of a seed becomes its display
+        name and the id order is the same on every run over the same data.
+        """
+        ids = {}
+        for name in sorted(counts, key=lambda name: (-counts[name], name)):
+            parsed = parse_seed(name)
+            if parsed is None:
+                continue
+            seed = self.find(parsed) or self.add(" ".join(name.split()), parsed)
+            ids[name] = seed.seed_id
+        return ids
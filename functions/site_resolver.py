@@ -0,0 +1,202 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from rapidfuzz import fuzz
+from rapidfuzz.utils import default_process
+
+from name_matching import DisjointSet
+
+SITE_MATCH_THRESHOLD = 90  # token-sorted similarity of two site keys in the same state
+RENAME_MAX_GAP = 2  # years a site can sit out between its last season under one name and its first under the next
+RENAME_MIN_GROWER_OVERLAP = 0.5  # share of the smaller site's growers a renamed site must keep
+RENAME_MIN_SHARED_GROWERS = 2
+SITE_HOME_MIN_SHARE = 0.3  # share of a raw name's entries one grower location needs to count as a site of its own
+
+UNKNOWN_SITE = "Unknown"
+
+SiteNameKey = Tuple[str, str, str]  # (raw site name, state/province, country)
+
+# Spellings of the same word in site names, replaced before comparing
+_SITE_WORDS = {
+    "fest": "festival", "assn": "association", "assoc": "association", "co": "county", "cty": "county",
+    "mt": "mount", "st": "saint", "ste": "sainte", "ft": "fort", "intl": "international", "n": "north",
+    "s": "south", "e": "east", "w": "west", "weighoff": "weigh off", "weighin": "weigh off"
+}
+# Words that come and go in a site's name without making it another site
+_SITE_NOISE = frozenset({"the", "annual", "and", "of", "at", "gpc", "official", "weigh", "off"})
+_ORDINAL = re.compile(r"^\d+(?:st|nd|rd|th)$")
+_NUMBER = re.compile(r"^\d+$")
+
+def site_key(name: str) -> str:
+    """Comparison form of a site name: lowercase words, abbreviations spelled out, noise, ordinals and
+    years dropped, sorted.
+
+    "The 12th Annual Elk Grove Pumpkin Fest" and "Elk Grove Pumpkin Festival" share a key.
+    """
+    words = []
+    for word in default_process(name.replace("&", " and ").replace("-", "")).split():
+        words.extend(_SITE_WORDS.get(word, word).split())
+    kept = [word for word in words
+            if word not in _SITE_NOISE and not _ORDINAL.match(word) and not _NUMBER.match(word)]
+    return " ".join(sorted(kept or words))
+
+@dataclass
+class SiteProfile:
+    """One raw site name with where its growers come from, the seasons it ran and who weighed there."""
+    name: str
+    state: str
+    country: str
+    years: FrozenSet[int] = frozenset()
+    growers: FrozenSet[str] = frozenset()
+    entries: int = 1
+    key: str = field(init=False)
+    spelling: int = field(default=-1, init=False, compare=False)  # spelling group, set by SiteResolver.clusters
+
+    def __post_init__(self):
+        self.key = site_key(self.name)
+
+    @property
+    def location(self) -> Tuple[str, str]:
+        return self.country, self.state
+
+    @property
+    def name_key(self) -> SiteNameKey:
+        return self.name, self.state, self.country
+
+def home_profiles(profiles: Iterable[SiteProfile]) -> Dict[SiteNameKey, SiteProfile]:
+    """The profile each raw (name, state, country) resolves through.
+
+    Results only say where growers come from, so a raw name is profiled once per grower location.
+    A name's most common location, and any other holding at least ``SITE_HOME_MIN_SHARE`` of its
+    entries, is a home: a site by that name in that state, so same-named sites in different states
+    stay apart. The remaining locations are growers travelling to a home; each joins the home that
+    ran in the most of the same seasons and adds its seasons, growers and entries to it.
+    """
+    by_name: Dict[str, List[SiteProfile]] = {}
+    for profile in profiles:
+        by_name.setdefault(profile.name, []).append(profile)
+    homes = {}
+    for name, group in by_name.items():
+        total = sum(profile.entries for profile in group)
+        ranked = sorted(group, key=lambda p: (-p.entries, p.state, p.country))
+        home_locations = [profile for n, profile in enumerate(ranked)
+                          if n == 0 or profile.entries >= SITE_HOME_MIN_SHARE * total]
+        merged = {home.location: SiteProfile(name, home.state, home.country, home.years, home.growers, home.entries)
+                  for home in home_locations}
+        for profile in ranked:
+            if profile.location not in merged:
+                nearest = max(home_locations, key=lambda home: (len(home.years & profile.years), home.entries))
+                home = merged[nearest.location]
+                home.years |= profile.years
+                home.growers |= profile.growers
+                home.entries += profile.entries
+                homes[profile.name_key] = home
+            else:
+                homes[profile.name_key] = merged[profile.location]
+    return homes
+
+def is_rename(a: List[SiteProfile], b: List[SiteProfile]) -> bool:
+    """Whether one group of site names took over from the other: seasons that don't overlap, a gap
+    of at most ``RENAME_MAX_GAP`` years between them and a shared core of growers."""
+    years_a = {year for profile in a for year in profile.years}
+    years_b = {year for profile in b for year in profile.years}
+    growers_a = {grower for profile in a for grower in profile.growers}
+    growers_b = {grower for profile in b for grower in profile.growers}
+    if not years_a or not years_b or not growers_a or not growers_b:
+        return False
+    first, second = (years_a, years_b) if max(years_a) < max(years_b) else (years_b, years_a)
+    if max(first) >= min(second) or min(second) - max(first) > RENAME_MAX_GAP:
+        return False
+    shared = len(growers_a & growers_b)
+    return (shared >= RENAME_MIN_SHARED_GROWERS
+            and shared / min(len(growers_a), len(growers_b)) >= RENAME_MIN_GROWER_OVERLAP)
+
+@dataclass
+class Site:
+    """One consolidated site: its integer id, display name and the raw names that resolve to it."""
+    site_id: int
+    name: str
+    state: str
+    country: str
+    first_year: Optional[int]
+    last_year: Optional[int]
+    members: List[SiteProfile]
+    canonical: Optional[SiteProfile] = None  # the member whose name the site is displayed under
+
+class SiteResolver:
+    """Clusters raw site names within each (country, state) into sites.
+
+    Two names join when their site keys are equal or at least ``threshold`` similar, or when one
+    reads as a rename of the other (is_rename), which keeps a site's history continuous when it
+    changes its name. A site is displayed under its most recent name.
+    """
+
+    def __init__(self, profiles: Iterable[SiteProfile], threshold: int = SITE_MATCH_THRESHOLD):
+        self.profiles = [profile for profile in profiles if profile.name != UNKNOWN_SITE]
+        self.threshold = threshold
+
+    def clusters(self) -> List[List[SiteProfile]]:
+        """Profiles grouped by the site they belong to.
+
+        Spelling variants are merged first, then renames are looked for between the merged
+        groups, so a rename is judged on a site's whole history rather than one spelling of it.
+        Each profile's ``spelling`` records the spelling group it was in before renames joined them.
+        """
+        blocks: Dict[Tuple[str, str], List[int]] = {}
+        for i, profile in enumerate(self.profiles):
+            blocks.setdefault(profile.location, []).append(i)
+        linked = DisjointSet()
+        for i in range(len(self.profiles)):
+            linked.find(i)
+        for members in blocks.values():
+            for n, i in enumerate(members):
+                a = self.profiles[i].key
+                for j in members[n + 1:]:
+                    b = self.profiles[j].key
+                    if a == b or fuzz.ratio(a, b) >= self.threshold:
+                        linked.union(i, j)
+            spellings = {}
+            for i in members:
+                root = linked.find(i)
+                self.profiles[i].spelling = root
+                spellings.setdefault(root, []).append(self.profiles[i])
+            groups = list(spellings.items())
+            for n, (root_a, group_a) in enumerate(groups):
+                for root_b, group_b in groups[n + 1:]:
+                    if is_rename(group_a, group_b):
+                        linked.union(root_a, root_b)
+        return [[self.profiles[i] for i in members] for members in linked.groups().values()]
+
+    def sites(self) -> List[Site]:
+        """Consolidated sites with ids numbered in (country, state, name) order."""
+        sites = []
+        for members in self.clusters():
+            latest = max(members, key=lambda p: (max(p.years) if p.years else 0, p.entries, p.name))
+            years = [year for profile in members for year in profile.years]
+            sites.append(Site(0, latest.name, latest.state, latest.country,
+                              min(years, default=None), max(years, default=None), members, latest))
+        sites.sort(key=lambda site: (site.country, site.state, site.name))
+        for site_id, site in enumerate(sites, 1):
+            site.site_id = site_id
+        return sites
+
+def match_type(site: Site, profile: SiteProfile) -> Tuple[str, float]:
+    """How a raw name came to resolve to ``site`` and how confident that is.
+
+    CANONICAL and NORMALIZED names equal the site's name or its key; FUZZY ones match the key
+    directly. A TRANSITIVE name reached the site's spelling group through other spellings without
+    matching the site's own name; only a name from another spelling group, joined by is_rename, is
+    a RENAME. The confidence is always the similarity to the site's key.
+    """
+    if profile.name == site.name:
+        return "CANONICAL", 1.0
+    canonical = site_key(site.name)
+    if profile.key == canonical:
+        return "NORMALIZED", 1.0
+    score = fuzz.ratio(profile.key, canonical) / 100
+    if score * 100 >= SITE_MATCH_THRESHOLD:
+        return "FUZZY", round(score, 2)
+    if site.canonical is not None and profile.spelling == site.canonical.spelling:
+        return "TRANSITIVE", round(score, 2)
+    return "RENAME", round(score, 2)
@@ -0,0 +1,74 @@
+import codecs
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Sequence, Tuple
+
+from lxml import etree
+
+# Below this many pages a process pool costs more to start than it saves
+PARALLEL_THRESHOLD = 4
+
+Table = Tuple[List[str], List[List[str]]]
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be"))
+
+def _cell_text(element) -> str:
+    return ''.join(element.itertext())
+
+def detect_encoding(content: bytes) -> str:
+    """Encoding of an HTML page without an HTTP charset, picked the way BeautifulSoup picks it:
+    a byte-order mark, then a <meta> charset, then UTF-8 if the bytes decode, then windows-1252.
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    declared = _META_CHARSET.search(content[:8192])
+    if declared:
+        try:
+            return codecs.lookup(declared.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "windows-1252"
+
+def extract_first_table(content: bytes, encoding: Optional[str] = None) -> Optional[Table]:
+    """Extract the first <table> of an HTML page as (headers, rows).
+
+    ``encoding`` is the HTTP charset when the response had one; otherwise it is detected from
+    the page. Streams the document through lxml's C parser and stops as soon as the first table
+    closes, so the rest of the page is never parsed. Headers are every <th> in the table and rows
+    are the <td> texts of every <tr> after the first, both in document order and including
+    nested tables, as the BeautifulSoup path read them. Unclosed <th>, <td> and <tr> tags are
+    closed the way browsers close them, where html.parser nested each cell inside the previous one.
+    """
+    depth = 0
+    parser = etree.iterparse(
+        BytesIO(content),
+        events=("start", "end"),
+        tag="table",
+        html=True,
+        recover=True,
+        encoding=encoding or detect_encoding(content)
+    )
+    for event, element in parser:
+        depth += 1 if event == "start" else -1
+        if depth == 0:
+            headers = [_cell_text(th) for th in element.iter("th")]
+            rows = [[_cell_text(td) for td in tr.iter("td")] for tr in list(element.iter("tr"))[1:]]
+            return headers, rows
+    return None
+
+def extract_tables(pages: Sequence[bytes], max_workers: Optional[int] = None,
+                   encodings: Optional[Sequence[Optional[str]]] = None) -> List[Optional[Table]]:
+    """Extract the first table from many pages, fanning out to a process pool for large batches."""
+    encodings = list(encodings) if encodings is not None else [None] * len(pages)
+    if len(pages) < PARALLEL_THRESHOLD or max_workers == 1:
+        return [extract_first_table(content, encoding) for content, encoding in zip(pages, encodings)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(extract_first_table, pages, encodings, chunksize=4))